@@ -0,0 +1,153 @@
+"""Query latency, throughput, memory and agreement of embedding runtimes.
+
+Each backend runs in its own subprocess, so RSS and load time are not mixed
+up between models. Vectors are compared with the first backend's (keep
+"torch" first) using the same check as scripts/export_embedding.py.
+
+    python -m benchmarks.bench_embedding --onnx-path ./models/embedding-onnx \\
+        --backends torch torch-int8 onnx onnx:onnx/model_qint8_avx512_vnni.onnx
+
+Backends: "torch", "torch-int8" (dynamic quantization) and "onnx[:file]",
+loaded from --onnx-path (default EMBEDDING_ONNX_PATH, else the hub model).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.bench_pipeline import git_commit, peak_rss_mb, rss_mb
+from benchmarks.load_test import percentile
+from src.core.config import settings
+
+
+def load_backend(spec: str, onnx_path: str, threads: int):
+    from src.services.embedder import create_embedder
+
+    name, _, onnx_file = spec.partition(":")
+    if name == "torch":
+        return create_embedder("torch", quantize=False, threads=threads)
+    if name == "torch-int8":
+        return create_embedder("torch", quantize=True, threads=threads)
+    if name == "onnx":
+        return create_embedder("onnx", onnx_path or None, onnx_file=onnx_file, threads=threads)
+    raise ValueError(f"Unknown backend: {spec}")
+
+
+def run_worker(args) -> Dict:
+    from src.core.startup import configure_model_cache
+    from benchmarks.stubs import load_sample_texts
+
+    configure_model_cache()
+    texts = load_sample_texts(args.sample, args.sample_size)
+    rss_start = rss_mb()
+
+    start = time.perf_counter()
+    model = load_backend(args.worker, args.onnx_path, args.threads)
+    load_s = time.perf_counter() - start
+    rss_loaded = rss_mb()
+
+    encode = lambda batch, size: model.encode(
+        batch, batch_size=size, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+    )
+    for text in texts[:args.warmup]:
+        encode([text], 1)
+
+    # one query at a time, as the API sees them
+    latencies = []
+    for text in texts[:args.queries]:
+        start = time.perf_counter()
+        encode([text], 1)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    vectors = encode(texts, args.batch_size)
+    batch_s = time.perf_counter() - start
+    np.save(args.vectors, vectors)
+
+    return {
+        "backend": args.worker,
+        "load_s": round(load_s, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "texts_per_sec": round(len(texts) / batch_s, 1) if batch_s else 0.0,
+        "model_rss_mb": round(rss_loaded - rss_start, 1),
+        "rss_mb": rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_backend(spec: str, args, vectors_path: str) -> Dict:
+    command = [
+        sys.executable, "-m", "benchmarks.bench_embedding", "--worker", spec, "--vectors", vectors_path,
+        "--sample-size", str(args.sample_size), "--queries", str(args.queries), "--warmup", str(args.warmup),
+        "--batch-size", str(args.batch_size), "--threads", str(args.threads),
+    ]
+    if args.sample:
+        command += ["--sample", args.sample]
+    if args.onnx_path:
+        command += ["--onnx-path", args.onnx_path]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"backend": spec, "error": completed.stderr.strip().splitlines()[-1:] or ["failed"]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding runtime benchmark")
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx"])
+    parser.add_argument("--onnx-path", default=settings.EMBEDDING_ONNX_PATH or None)
+    parser.add_argument("--sample", default=None, help="JSONL/text file of texts (default: synthetic)")
+    parser.add_argument("--sample-size", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200, help="single-query encodes timed")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32, help="batch size for the throughput run")
+    parser.add_argument("--threads", type=int, default=settings.EMBEDDING_THREADS, help="0: library default")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--vectors", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    from src.services.embedder import embedding_agreement
+
+    results: List[Dict] = []
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, spec in enumerate(args.backends):
+            vectors_path = os.path.join(tmp, f"{i}.npy")
+            result = run_backend(spec, args, vectors_path)
+            if "error" not in result:
+                vectors = np.load(vectors_path)
+                if reference is None:
+                    reference = vectors
+                else:
+                    result.update(embedding_agreement(reference, vectors, args.k))
+            results.append(result)
+
+            if "error" in result:
+                print(f"{spec:>40} error: {result['error']}")
+                continue
+            print(
+                f"{spec:>40} load={result['load_s']:>5.1f}s p50={result['p50_ms']:>7.2f}ms "
+                f"p95={result['p95_ms']:>7.2f}ms {result['texts_per_sec']:>8.1f} texts/s "
+                f"model={result['model_rss_mb']:>6.0f}MB peak={result['peak_rss_mb']:>6.0f}MB"
+                + (f" cos={result['cosine_mean']:.4f}" if "cosine_mean" in result else "")
+            )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
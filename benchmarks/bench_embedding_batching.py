@@ -0,0 +1,106 @@
+"""Per-query encoding vs micro-batched encoding on CPU.
+
+    python -m benchmarks.bench_embedding_batching --concurrency 1 4 16 64 --requests 256
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from sentence_transformers import SentenceTransformer
+
+from benchmarks.load_test import DEFAULT_QUESTIONS, percentile
+from src.core.config import settings
+from src.services.embedding_batcher import EmbeddingBatcher
+
+
+def make_encode_fn(model: SentenceTransformer):
+    def encode(texts: List[str]) -> List[List[float]]:
+        return model.encode(texts, convert_to_numpy=True, normalize_embeddings=True).tolist()
+    return encode
+
+
+async def drive(encode_one, concurrency: int, total: int) -> Dict:
+    latencies: List[float] = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            text = f"{DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)]} ({i})"
+            start = time.perf_counter()
+            await encode_one(text)
+            latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_qps": round(total / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+    }
+
+
+async def run(args) -> Dict:
+    model = SentenceTransformer(args.model, trust_remote_code=True, device="cpu")
+    encode = make_encode_fn(model)
+    encode(["warm up"])
+
+    report = {"model": args.model, "workers": args.workers, "per_query": [], "batched": []}
+
+    for concurrency in args.concurrency:
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+        loop = asyncio.get_running_loop()
+
+        async def per_query(text):
+            return await loop.run_in_executor(executor, encode, [text])
+
+        result = await drive(per_query, concurrency, args.requests)
+        report["per_query"].append(result)
+        print(f"per-query c={concurrency:>3} qps={result['throughput_qps']:>8.2f} p95={result['p95_ms']:.1f}ms")
+
+        batcher = EmbeddingBatcher(
+            encode,
+            executor,
+            max_batch_size=args.max_batch_size,
+            max_wait_ms=args.max_wait_ms,
+            max_inflight=args.workers
+        )
+        result = await drive(batcher.encode, concurrency, args.requests)
+        result["batcher"] = batcher.stats.to_dict()
+        report["batched"].append(result)
+        print(
+            f"batched   c={concurrency:>3} qps={result['throughput_qps']:>8.2f} p95={result['p95_ms']:.1f}ms "
+            f"avg_batch={result['batcher']['avg_batch_size']} avg_wait={result['batcher']['avg_queue_wait_ms']}ms"
+        )
+        executor.shutdown(wait=True)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding micro-batching benchmark")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=settings.EMBEDDING_WORKERS)
+    parser.add_argument("--max-batch-size", type=int, default=settings.EMBEDDING_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_BATCH_MAX_WAIT_MS)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
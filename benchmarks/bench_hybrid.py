@@ -0,0 +1,92 @@
+"""Recall@k and latency of dense-only vs hybrid (dense + BM25) retrieval.
+
+The query file uses the same JSONL format as bench_reranker:
+
+    {"query": "thuốc metformin", "relevant_ids": [123, 456]}
+
+Queries are run against the configured collection. Each --weights pair
+"dense:sparse" is one hybrid configuration.
+
+    python -m benchmarks.bench_hybrid --queries heldout.jsonl --weights 1:0.5 1:1 1:2 --fusion rrf linear
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Dict, List
+
+from benchmarks.bench_reranker import load_queries, recall_at
+from benchmarks.load_test import percentile
+from src.core.config import settings
+from src.services.sparse_index import SparseIndex
+from src.services.vector_search import VectorSearchService
+
+
+def evaluate(name: str, service: VectorSearchService, queries: List[Dict], vectors: List, ks: List[int],
+             top_k: int, score_threshold: float) -> Dict:
+    latencies = []
+    recalls = {k: [] for k in ks}
+
+    for q, vector in zip(queries, vectors):
+        start = time.perf_counter()
+        documents = service.search(q["query"], top_k, score_threshold, query_vector=vector)
+        latencies.append(time.perf_counter() - start)
+
+        ranked_ids = [doc["id"] for doc in documents]
+        for k in ks:
+            recalls[k].append(recall_at(ranked_ids, q["relevant_ids"], k))
+
+    return {
+        "mode": name,
+        "queries": len(queries),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        **{f"recall@{k}": round(statistics.fmean(recalls[k]), 4) if recalls[k] else 0.0 for k in ks},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dense vs hybrid retrieval benchmark")
+    parser.add_argument("--queries", required=True)
+    parser.add_argument("--top-k", type=int, default=settings.DEFAULT_TOP_K)
+    parser.add_argument("--score-threshold", type=float, default=settings.DEFAULT_SCORE_THRESHOLD)
+    parser.add_argument("--weights", nargs="+", default=["1:1"], help="dense:sparse weight pairs")
+    parser.add_argument("--fusion", nargs="+", default=[settings.HYBRID_FUSION], choices=["rrf", "linear"])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    service = VectorSearchService()
+    sparse_index = service.sparse_index or SparseIndex.load_or_build(
+        service.client, service.collection_name, settings.SPARSE_INDEX_PATH
+    )
+
+    # encoding is the same for every mode, so keep it out of the timings
+    vectors = service.encode_queries([q["query"] for q in queries])
+
+    service.sparse_index = None
+    service.search(queries[0]["query"], args.top_k, args.score_threshold, query_vector=vectors[0])
+    results = [evaluate("dense", service, queries, vectors, args.k, args.top_k, args.score_threshold)]
+
+    service.sparse_index = sparse_index
+    for fusion in args.fusion:
+        settings.HYBRID_FUSION = fusion
+        for pair in args.weights:
+            dense_weight, sparse_weight = (float(w) for w in pair.split(":"))
+            service.dense_weight, service.sparse_weight = dense_weight, sparse_weight
+            name = f"hybrid-{fusion} {dense_weight:g}:{sparse_weight:g}"
+            results.append(evaluate(name, service, queries, vectors, args.k, args.top_k, args.score_threshold))
+
+    for r in results:
+        recalls = " ".join(f"R@{k}={r[f'recall@{k}']:.3f}" for k in args.k)
+        print(f"{r['mode']:>22} p50={r['p50_ms']:>7.1f}ms p95={r['p95_ms']:>7.1f}ms {recalls}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Latency and recall of the local memory-mapped index vs Qdrant on the same collection.
+
+Every backend answers the same queries; recall@k is measured against exact
+float32 search over the collection's own vectors, so Qdrant's HNSW is graded
+too. Queries are stored vectors with some noise added (--noise), or real
+questions encoded with the query model (--questions).
+
+    python -m benchmarks.bench_local_index --qdrant-url http://localhost:6333
+    python -m benchmarks.bench_local_index --qdrant-path ./qdrant_data --variants float16 int8-ivf --nprobe 16 64
+    python -m benchmarks.bench_local_index --stub 20000                          # synthetic, in-memory Qdrant
+
+Variants are "float16" / "int8", exact, or with "-ivf" (--ivf-lists, default
+4*sqrt(points)), searched with each --nprobe.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.bench_pipeline import git_commit, rss_mb
+from benchmarks.load_test import percentile
+from src.core.config import settings
+from src.services.ingestion import PAYLOAD_FIELDS
+
+
+def load_collection(client, collection_name: str, page_size: int = 1000):
+    ids, vectors, offset = [], [], None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name, limit=page_size, offset=offset, with_payload=False, with_vectors=True
+        )
+        ids += [point.id for point in points]
+        vectors += [point.vector for point in points]
+        if offset is None:
+            break
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return ids, vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(args, vectors: np.ndarray, embedder=None) -> np.ndarray:
+    if args.questions:
+        from benchmarks.stubs import load_sample_texts
+        texts = load_sample_texts(args.questions, args.queries)
+        return np.asarray(embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True), dtype=np.float32)
+
+    rng = np.random.default_rng(args.seed)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + rng.normal(0, args.noise / np.sqrt(vectors.shape[1]), queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def evaluate(name: str, client, collection_name: str, queries: np.ndarray, truth: List[List], args) -> Dict:
+    # single queries as the API sends them, then batches as /chat/batch does
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        points = client.query_points(
+            collection_name=collection_name, query=query.tolist(), limit=args.top_k,
+            with_payload=list(PAYLOAD_FIELDS), with_vectors=False
+        ).points
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({point.id for point in points} & set(expected)) / len(expected))
+
+    from qdrant_client import models
+    requests = [
+        models.QueryRequest(query=query.tolist(), limit=args.top_k, with_payload=list(PAYLOAD_FIELDS), with_vector=False)
+        for query in queries
+    ]
+    start = time.perf_counter()
+    for i in range(0, len(requests), args.batch_size):
+        client.query_batch_points(collection_name=collection_name, requests=requests[i:i + args.batch_size])
+    batch_s = time.perf_counter() - start
+
+    return {
+        "backend": name,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "batch_qps": round(len(requests) / batch_s, 1) if batch_s else 0.0,
+        f"recall@{args.top_k}": round(float(np.mean(recalls)), 4),
+    }
+
+
+def seed_stub_collection(num_chunks: int):
+    from benchmarks.stubs import ASPECT_TERMS, DISEASES, HashingEmbedder, offline_settings, seed_collection, synthetic_chunks
+    from src.services.vector_search import create_qdrant_client
+
+    offline_settings()
+    client = create_qdrant_client(url="", path="", local_index="")
+    embedder = HashingEmbedder(topics=DISEASES + ASPECT_TERMS)
+    seed_collection(client, settings.COLLECTION_NAME, embedder, synthetic_chunks(num_chunks))
+    return client, embedder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local index vs Qdrant benchmark")
+    parser.add_argument("--collection", default=settings.COLLECTION_NAME)
+    parser.add_argument("--qdrant-url", default=None, help="defaults to QDRANT_URL")
+    parser.add_argument("--qdrant-path", default=None, help="local on-disk Qdrant (defaults to QDRANT_PATH)")
+    parser.add_argument("--stub", type=int, default=None, help="seed an in-memory collection with this many synthetic chunks")
+    parser.add_argument("--variants", nargs="+", default=["float16", "int8", "float16-ivf", "int8-ivf"])
+    parser.add_argument("--ivf-lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[settings.LOCAL_INDEX_NPROBE])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--questions", default=None, help="JSONL/text file of questions to encode instead")
+    parser.add_argument("--noise", type=float, default=0.5, help="norm of the noise added to sampled vectors")
+    parser.add_argument("--top-k", type=int, default=settings.DEFAULT_TOP_K)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    from src.services.local_index import LocalVectorIndex
+    from src.services.vector_search import create_qdrant_client
+
+    embedder = None
+    if args.stub:
+        client, embedder = seed_stub_collection(args.stub)
+    else:
+        client = create_qdrant_client(url=args.qdrant_url, path=args.qdrant_path, local_index="")
+    if args.questions and embedder is None:
+        from src.core.startup import configure_model_cache
+        from src.services.embedder import create_embedder
+        configure_model_cache()
+        embedder = create_embedder()
+
+    ids, vectors = load_collection(client, args.collection)
+    queries = make_queries(args, vectors, embedder)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.top_k]
+    truth = [[ids[i] for i in row] for row in exact]
+    print(f"{len(ids)} points, dim {vectors.shape[1]}, {len(queries)} queries, top_k {args.top_k}")
+
+    results = [dict(evaluate("qdrant", client, args.collection, queries, truth, args), build_s=None, size_mb=None)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant in args.variants:
+            dtype, _, ivf = variant.partition("-")
+            path = os.path.join(tmp, variant)
+            # the build only picks IVF by itself from LOCAL_INDEX_IVF_MIN_POINTS up, force it here
+            ivf_lists = (args.ivf_lists or int(4 * np.sqrt(len(ids)))) if ivf else 0
+            start = time.perf_counter()
+            snapshot = LocalVectorIndex.build_from_qdrant(client, args.collection, path, dtype=dtype, ivf_lists=ivf_lists)
+            build_s = time.perf_counter() - start
+            size_mb = sum(entry.stat().st_size for entry in os.scandir(snapshot)) / 2**20
+
+            rss_before = rss_mb()
+            start = time.perf_counter()
+            index = LocalVectorIndex(path)
+            load_ms = (time.perf_counter() - start) * 1000
+            for nprobe in (args.nprobe if ivf else [None]):
+                index.nprobe = nprobe or index.nprobe
+                name = f"local:{variant}" + (f":nprobe={nprobe}" if ivf else "")
+                result = evaluate(name, index, args.collection, queries, truth, args)
+                results.append(dict(
+                    result, build_s=round(build_s, 2), size_mb=round(size_mb, 1), load_ms=round(load_ms, 1),
+                    rss_mb=round(rss_mb() - rss_before, 1), ivf_lists=index.snapshot.manifest["ivf_lists"]
+                ))
+
+    recall_key = f"recall@{args.top_k}"
+    for result in results:
+        print(
+            f"{result['backend']:>32} p50={result['p50_ms']:>8.3f}ms p95={result['p95_ms']:>8.3f}ms "
+            f"batch={result['batch_qps']:>8.1f} q/s {recall_key}={result[recall_key]:.4f}"
+            + (f" size={result['size_mb']:.1f}MB" if result.get("size_mb") is not None else "")
+        )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Memory and throughput of N API-like workers: one model each vs one shared model server.
+
+Every worker is a separate process that encodes queries the way the API
+does (EmbeddingBatcher over an executor), from `--concurrency` concurrent
+clients, for `--duration` seconds. "local" workers each load the embedding
+model; "shared" workers talk to one scripts/model_server-style process.
+Memory is reported as RSS and PSS (shared pages split between processes),
+summed over all workers plus the server.
+
+    python -m benchmarks.bench_model_server --workers 1 2 4 8
+    python -m benchmarks.bench_model_server --stub --stub-model-mb 500   # no model download
+
+With --stub the model is the hashing embedder from benchmarks/stubs.py
+with a fixed-size memory ballast, which checks the plumbing and memory
+accounting but not real CPU contention.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.bench_pipeline import git_commit
+from benchmarks.load_test import DEFAULT_QUESTIONS, percentile
+from src.core.config import settings
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    # RSS counts shared pages in every process; PSS splits them, so it sums correctly
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in ("Rss", "Pss"):
+                    values[name.lower()] = round(int(rest.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return values
+
+
+def load_model(args):
+    if not args.stub:
+        from src.services.embedder import create_embedder
+        return create_embedder()
+
+    from benchmarks.stubs import HashingEmbedder
+    model = HashingEmbedder(base_ms=args.stub_base_ms, per_text_ms=args.stub_per_text_ms)
+    # stands in for the weights: private, touched memory in every process that loads it
+    model.ballast = np.ones(int(args.stub_model_mb * 2**20 / 8))
+    return model
+
+
+def serve(args):
+    from src.services.model_server import ModelServer
+
+    server = ModelServer(load_model(args), model_name="stub" if args.stub else settings.EMBEDDING_MODEL)
+    asyncio.run(server.serve(args.serve))
+
+
+async def drive(args, embedder) -> Dict:
+    from src.services.embedding_batcher import EmbeddingBatcher
+
+    executor = ThreadPoolExecutor(max_workers=settings.EMBEDDING_WORKERS)
+    encode = lambda texts: embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    batcher = EmbeddingBatcher(
+        encode, executor,
+        max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+        max_inflight=settings.EMBEDDING_WORKERS
+    )
+    await batcher.encode("khởi động")
+
+    # wait for the parent, so all workers start measuring together
+    print("ready", flush=True)
+    await asyncio.get_running_loop().run_in_executor(None, sys.stdin.readline)
+
+    latencies: List[float] = []
+    deadline = time.perf_counter() + args.duration
+
+    async def client(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            # distinct texts, so nothing is served from a cache
+            text = f"{DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)]} ({os.getpid()}-{i})"
+            start = time.perf_counter()
+            await batcher.encode(text)
+            latencies.append(time.perf_counter() - start)
+            i += args.concurrency
+
+    await asyncio.gather(*[client(i) for i in range(args.concurrency)])
+    return {"queries": len(latencies), "latencies": latencies, **memory_mb(os.getpid())}
+
+
+def run_worker(args):
+    if args.worker == "shared":
+        from src.services.model_server import ModelServerClient, RemoteEmbedder
+        embedder = RemoteEmbedder(ModelServerClient(args.socket))
+    else:
+        embedder = load_model(args)
+    print(json.dumps(asyncio.run(drive(args, embedder))), flush=True)
+
+
+def model_command(args) -> List[str]:
+    command = [sys.executable, "-m", "benchmarks.bench_model_server"]
+    if args.stub:
+        command += ["--stub", "--stub-model-mb", str(args.stub_model_mb),
+                    "--stub-base-ms", str(args.stub_base_ms), "--stub-per-text-ms", str(args.stub_per_text_ms)]
+    return command
+
+
+def worker_command(args, mode: str, socket_path: str) -> List[str]:
+    return model_command(args) + [
+        "--worker", mode, "--socket", socket_path,
+        "--duration", str(args.duration), "--concurrency", str(args.concurrency),
+    ]
+
+
+def run_level(args, mode: str, workers: int, socket_path: str) -> Dict:
+    server = None
+    if mode == "shared":
+        server = subprocess.Popen(model_command(args) + ["--serve", socket_path])
+        deadline = time.monotonic() + args.startup_timeout
+        while not os.path.exists(socket_path):
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("model server did not start")
+            time.sleep(0.2)
+
+    procs = [
+        subprocess.Popen(worker_command(args, mode, socket_path), stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    try:
+        for proc in procs:
+            if proc.stdout.readline().strip() != "ready":
+                raise RuntimeError("worker failed to start")
+        for proc in procs:
+            proc.stdin.write("go\n")
+            proc.stdin.flush()
+
+        results = [json.loads(proc.stdout.readline()) for proc in procs]
+        server_memory = memory_mb(server.pid) if server is not None else {}
+    finally:
+        for proc in procs:
+            proc.wait()
+        if server is not None:
+            server.terminate()
+            server.wait()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+    latencies = [latency for r in results for latency in r["latencies"]]
+    queries = sum(r["queries"] for r in results)
+    return {
+        "mode": mode,
+        "workers": workers,
+        "queries": queries,
+        "throughput_qps": round(queries / args.duration, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "worker_rss_mb": round(sum(r.get("rss", 0.0) for r in results), 1),
+        "server_rss_mb": server_memory.get("rss", 0.0),
+        "total_rss_mb": round(sum(r.get("rss", 0.0) for r in results) + server_memory.get("rss", 0.0), 1),
+        "total_pss_mb": round(sum(r.get("pss", 0.0) for r in results) + server_memory.get("pss", 0.0), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker models vs a shared model server")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--modes", nargs="+", choices=["local", "shared"], default=["local", "shared"])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per level")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients per worker")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--stub", action="store_true", help="hashing embedder instead of the real model")
+    parser.add_argument("--stub-model-mb", type=float, default=400.0)
+    parser.add_argument("--stub-base-ms", type=float, default=4.0)
+    parser.add_argument("--stub-per-text-ms", type=float, default=1.0)
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--worker", choices=["local", "shared"], help=argparse.SUPPRESS)
+    parser.add_argument("--serve", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--socket", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+    if args.worker:
+        run_worker(args)
+        return
+
+    from src.core.startup import configure_model_cache
+    configure_model_cache()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "models.sock")
+        for workers in args.workers:
+            for mode in args.modes:
+                result = run_level(args, mode, workers, socket_path)
+                results.append(result)
+                print(
+                    f"{mode:>6} workers={workers:>3} qps={result['throughput_qps']:>8.1f} "
+                    f"p50={result['p50_ms']:>7.2f}ms p95={result['p95_ms']:>7.2f}ms "
+                    f"rss={result['total_rss_mb']:>7.0f}MB pss={result['total_pss_mb']:>7.0f}MB"
+                )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"commit": git_commit(), "config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
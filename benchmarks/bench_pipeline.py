@@ -0,0 +1,286 @@
+"""Offline pipeline benchmark with stub backends (no Gemini, Cohere or Qdrant server).
+
+Drives `MedicalRAGGenerator` directly and/or the FastAPI app in-process, using
+the deterministic stand-ins from benchmarks/stubs.py, across concurrency levels
+and top_k / rerank_top_n settings. Save a run per commit and compare them:
+
+    python -m benchmarks.bench_pipeline --label base --out base.json
+    python -m benchmarks.bench_pipeline --label head --out head.json
+    python -m benchmarks.bench_pipeline --compare base.json head.json
+
+Stub latencies are flags (--llm-latency-ms, --rerank-base-ms, ...), so the
+numbers measure the pipeline's own overhead and scheduling, not the APIs.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import resource
+import statistics
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.load_test import percentile
+from benchmarks.stubs import build_stub_generator, synthetic_questions
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * resource.getpagesize() / 2**20, 1)
+    except OSError:
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if platform.system() == "Darwin" else 2**10), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_generator_call(generator, stream: bool):
+    async def call(question: str, top_k: int, rerank_top_n: int, use_expansion: bool) -> Optional[float]:
+        kwargs = dict(query=question, top_k=top_k, rerank_top_n=rerank_top_n, use_query_expansion=use_expansion)
+        if not stream:
+            await generator.ask_async(**kwargs)
+            return None
+        ttft = None
+        async for item in generator.ask_stream(**kwargs):
+            if item["event"] == "done":
+                ttft = item["data"]["ttft_ms"] / 1000
+        return ttft
+    return call
+
+
+def make_api_call(client, stream: bool):
+    async def call(question: str, top_k: int, rerank_top_n: int, use_expansion: bool) -> Optional[float]:
+        body = {"message": question, "top_k": top_k, "rerank_top_n": rerank_top_n,
+                "use_query_expansion": use_expansion}
+        if not stream:
+            response = await client.post("/api/v1/chat", json=body)
+            response.raise_for_status()
+            return None
+
+        start = time.perf_counter()
+        ttft = None
+        async with client.stream("POST", "/api/v1/chat/stream", json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if ttft is None and line == "event: token":
+                    ttft = time.perf_counter() - start
+                if line == "event: error":
+                    raise RuntimeError("stream error")
+        return ttft
+    return call
+
+
+async def run_level(call, questions: List[str], concurrency: int, total: int,
+                    top_k: int, rerank_top_n: int, use_expansion: bool) -> Dict:
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ttft = await call(questions[i % len(questions)], top_k, rerank_top_n, use_expansion)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if ttft is not None:
+                ttfts.append(ttft)
+
+    rss_before = rss_mb()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - wall_start
+
+    ms = lambda seconds: round(seconds * 1000, 2)
+    result = {
+        "concurrency": concurrency,
+        "top_k": top_k,
+        "rerank_top_n": rerank_top_n,
+        "requests": total,
+        "errors": errors,
+        "wall_time_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(statistics.fmean(latencies)) if latencies else 0.0,
+        "rss_mb": rss_mb(),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if ttfts:
+        result.update(ttft_p50_ms=ms(percentile(ttfts, 50)), ttft_p95_ms=ms(percentile(ttfts, 95)))
+    return result
+
+
+def reset_caches(generator):
+    # every level starts cold, so results don't depend on the order they ran in
+    if generator.answer_cache is not None:
+        generator.answer_cache.invalidate()
+    generator.llm.expansion_cache.clear()
+    generator.vector_search.invalidate_results()
+    generator.reranker.clear_cache()
+
+
+async def run(args) -> Dict:
+    build_start = time.perf_counter()
+    generator = build_stub_generator(
+        num_chunks=args.chunks,
+        seed=args.seed,
+        embed_base_ms=args.embed_base_ms,
+        embed_per_text_ms=args.embed_per_text_ms,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_tokens_per_second=args.llm_tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        rerank_base_ms=args.rerank_base_ms,
+        rerank_per_document_ms=args.rerank_per_document_ms
+    )
+    if not args.answer_cache:
+        generator.answer_cache = None
+    build_s = time.perf_counter() - build_start
+
+    questions = synthetic_questions(args.questions, args.seed)
+    targets = ["generator", "api"] if args.target == "both" else [args.target]
+    report = {
+        "label": args.label,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "label")},
+        "build_s": round(build_s, 2),
+        "rss_after_build_mb": rss_mb(),
+        "results": [],
+    }
+
+    for target in targets:
+        if target == "api":
+            import httpx
+            import main
+            from src.core.startup import startup
+
+            # per-request logs would flood stdout and skew the timings
+            logging.getLogger("vimedbot").setLevel(logging.WARNING)
+
+            # skip the lifespan's model loading: the stub generator is the loaded pipeline
+            startup.generator, startup.ready = generator, True
+            # every request comes from this one client: keep the concurrency cap, not the per-client limit
+            from src.api.admission import admission
+            admission.rate_per_minute = 0
+            transport = httpx.ASGITransport(app=main.app)
+            client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout)
+            call = make_api_call(client, args.stream)
+        else:
+            client = None
+            call = make_generator_call(generator, args.stream)
+
+        try:
+            for top_k in args.top_k:
+                for rerank_top_n in args.rerank_top_n:
+                    for concurrency in args.concurrency:
+                        reset_caches(generator)
+                        total = max(concurrency, args.requests_per_client * concurrency)
+                        result = await run_level(
+                            call, questions, concurrency, total, top_k, rerank_top_n, not args.no_expansion
+                        )
+                        result["target"] = target
+                        report["results"].append(result)
+                        print(
+                            f"[{target:>9}] top_k={top_k:>3} rerank={rerank_top_n:>2} c={concurrency:>3} "
+                            f"rps={result['throughput_rps']:>7.2f} p50={result['p50_ms']:>8.1f}ms "
+                            f"p95={result['p95_ms']:>8.1f}ms p99={result['p99_ms']:>8.1f}ms "
+                            f"rss={result['rss_mb']:.0f}MB errors={result['errors']}"
+                        )
+        finally:
+            if client is not None:
+                await client.aclose()
+
+    return report
+
+
+def compare(base_path: str, head_path: str, threshold: float):
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(head_path, encoding="utf-8") as f:
+        head = json.load(f)
+
+    key = lambda r: (r["target"], r["top_k"], r["rerank_top_n"], r["concurrency"])
+    head_by_key = {key(r): r for r in head["results"]}
+    print(f"{base['label']} ({base.get('commit')}) -> {head['label']} ({head.get('commit')})")
+    print(f"{'target':>9} {'top_k':>5} {'rerank':>6} {'c':>4} | {'rps':>15} | {'p95 ms':>19} | note")
+
+    regressions = 0
+    for r in base["results"]:
+        other = head_by_key.get(key(r))
+        if other is None:
+            continue
+        rps_ratio = other["throughput_rps"] / r["throughput_rps"] if r["throughput_rps"] else float("inf")
+        p95_ratio = other["p95_ms"] / r["p95_ms"] if r["p95_ms"] else float("inf")
+        regressed = rps_ratio < 1 - threshold or p95_ratio > 1 + threshold
+        regressions += regressed
+        print(
+            f"{r['target']:>9} {r['top_k']:>5} {r['rerank_top_n']:>6} {r['concurrency']:>4} | "
+            f"{r['throughput_rps']:>6.1f} -> {other['throughput_rps']:>6.1f} | "
+            f"{r['p95_ms']:>8.1f} -> {other['p95_ms']:>8.1f} | {'REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAG pipeline benchmark with stub backends")
+    parser.add_argument("--target", choices=["generator", "api", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[12])
+    parser.add_argument("--rerank-top-n", type=int, nargs="+", default=[5])
+    parser.add_argument("--no-expansion", action="store_true")
+    parser.add_argument("--stream", action="store_true", help="use the streaming path and report TTFT")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache on")
+    parser.add_argument("--chunks", type=int, default=2000, help="synthetic chunks in the collection")
+    parser.add_argument("--questions", type=int, default=500, help="distinct synthetic questions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-base-ms", type=float, default=4.0)
+    parser.add_argument("--embed-per-text-ms", type=float, default=1.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="time to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--rerank-base-ms", type=float, default=50.0)
+    parser.add_argument("--rerank-per-document-ms", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"))
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative throughput/p95 change flagged as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        raise SystemExit(1 if regressions else 0)
+
+    report = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Latency and recall@k of reranker backends on a held-out query set.
+
+The query file is JSONL, one query per line:
+
+    {"query": "...", "relevant_ids": [123, 456]}
+    {"query": "...", "relevant_ids": [789], "candidates": [{"id": 789, "text": "..."}, ...]}
+
+Lines without "candidates" are retrieved from Qdrant with the configured
+embedding model. The "vector" row is the retrieval order without reranking.
+
+    python -m benchmarks.bench_reranker --queries heldout.jsonl --backends cohere cross-encoder
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Dict, List
+
+from benchmarks.load_test import percentile
+from src.core.config import settings
+from src.services.reranker import create_reranker_backend
+
+
+def load_queries(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def attach_candidates(queries: List[Dict], top_k: int, score_threshold: float):
+    missing = [q for q in queries if "candidates" not in q]
+    if not missing:
+        return
+
+    from src.services.vector_search import VectorSearchService
+    vector_search = VectorSearchService()
+    for q in missing:
+        q["candidates"] = vector_search.search(q["query"], top_k, score_threshold)
+
+
+def recall_at(ranked_ids: List, relevant_ids: List, k: int) -> float:
+    if not relevant_ids:
+        return 0.0
+    return len(set(ranked_ids[:k]) & set(relevant_ids)) / len(relevant_ids)
+
+
+def evaluate(name: str, rank_fn, queries: List[Dict], ks: List[int], rerank_top_n: int) -> Dict:
+    latencies = []
+    recalls = {k: [] for k in ks}
+
+    for q in queries:
+        candidates = q["candidates"]
+        start = time.perf_counter()
+        ranking = rank_fn(q["query"], candidates, min(rerank_top_n, len(candidates)))
+        latencies.append(time.perf_counter() - start)
+
+        ranked_ids = [candidates[index].get("id") for index, _ in ranking]
+        for k in ks:
+            recalls[k].append(recall_at(ranked_ids, q["relevant_ids"], k))
+
+    return {
+        "backend": name,
+        "queries": len(queries),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        **{f"recall@{k}": round(statistics.fmean(recalls[k]), 4) if recalls[k] else 0.0 for k in ks},
+    }
+
+
+def vector_order(query: str, candidates: List[Dict], top_n: int):
+    order = sorted(range(len(candidates)), key=lambda i: candidates[i].get("score", 0), reverse=True)
+    return [(i, candidates[i].get("score", 0)) for i in order[:top_n]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reranker backend benchmark")
+    parser.add_argument("--queries", required=True)
+    parser.add_argument("--backends", nargs="+", default=["cohere", "cross-encoder"])
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--score-threshold", type=float, default=settings.DEFAULT_SCORE_THRESHOLD)
+    parser.add_argument("--rerank-top-n", type=int, default=10)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    attach_candidates(queries, args.top_k, args.score_threshold)
+
+    results = [evaluate("vector", vector_order, queries, args.k, args.rerank_top_n)]
+    for name in args.backends:
+        backend = create_reranker_backend(name)
+        for q in queries[:args.warmup]:
+            backend.rank(q["query"], q["candidates"], 1)
+        # measure model latency, not score-cache hits from the warm-up
+        if hasattr(backend, "score_cache"):
+            backend.score_cache.clear()
+        results.append(evaluate(name, backend.rank, queries, args.k, args.rerank_top_n))
+
+    for r in results:
+        recalls = " ".join(f"R@{k}={r[f'recall@{k}']:.3f}" for k in args.k)
+        print(f"{r['backend']:>14} p50={r['p50_ms']:>8.1f}ms p95={r['p95_ms']:>8.1f}ms {recalls}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
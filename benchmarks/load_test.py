@@ -0,0 +1,155 @@
+"""Closed-loop load test for a running ViMedBot API.
+
+Run it against the old (blocking) build and the new (async) build, then
+compare the two result files:
+
+    python -m benchmarks.load_test --url http://localhost:8000 --label before --out before.json
+    python -m benchmarks.load_test --url http://localhost:8000 --label after --out after.json
+    python -m benchmarks.load_test --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+DEFAULT_QUESTIONS = [
+    "Bệnh COVID-19 có lây không?",
+    "Ung thư phổi có chữa được không?",
+    "Những ai có nguy cơ bị đột quỵ?",
+    "Triệu chứng của sốt xuất huyết là gì?",
+    "Tiểu đường type 2 nên ăn gì?",
+    "Làm sao để phòng ngừa cao huyết áp?",
+    "Trẻ em bị sốt cao thì phải làm gì?",
+    "Viêm gan B lây qua đường nào?",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    concurrency: int,
+    total_requests: int,
+    payload: Dict,
+) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    rejected = 0
+    counter = iter(range(total_requests))
+
+    async def worker():
+        nonlocal errors, rejected
+        for i in counter:
+            body = dict(payload)
+            body["message" if endpoint.endswith("chat") else "query"] = DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)]
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json=body)
+                if response.status_code == 429:
+                    # turned away by admission control; counted apart from failures
+                    rejected += 1
+                    continue
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "rejected": rejected,
+        "wall_time_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "mean_s": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+    }
+
+
+async def run(args) -> Dict:
+    payload = {"top_k": args.top_k, "rerank_top_n": args.rerank_top_n}
+    if args.endpoint == "chat":
+        payload["use_query_expansion"] = not args.no_expansion
+    else:
+        payload["use_rerank"] = True
+
+    endpoint = f"{args.url.rstrip('/')}/api/v1/{args.endpoint}"
+    results = []
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    # all requests come from one IP: without a key listed in ADMISSION_API_KEYS,
+    # the per-client limit (ADMISSION_RATE_PER_MINUTE) caps what this can measure
+    headers = {"X-API-Key": args.api_key} if args.api_key else None
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits, headers=headers) as client:
+        for concurrency in args.concurrency:
+            total = max(concurrency, args.requests_per_client * concurrency)
+            result = await run_level(client, endpoint, concurrency, total, payload)
+            print(
+                f"[{args.label}] c={concurrency:>3} rps={result['throughput_rps']:>7.2f} "
+                f"p50={result['p50_s']:.2f}s p95={result['p95_s']:.2f}s errors={result['errors']} "
+                f"rejected={result['rejected']}"
+            )
+            results.append(result)
+
+    return {"label": args.label, "endpoint": args.endpoint, "results": results}
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)
+
+    after_by_level = {r["concurrency"]: r for r in after["results"]}
+    print(f"{'clients':>7} | {before['label']:>12} rps | {after['label']:>12} rps | speedup")
+    for r in before["results"]:
+        other = after_by_level.get(r["concurrency"])
+        if other is None:
+            continue
+        speedup = other["throughput_rps"] / r["throughput_rps"] if r["throughput_rps"] else float("inf")
+        print(f"{r['concurrency']:>7} | {r['throughput_rps']:>16.2f} | {other['throughput_rps']:>16.2f} | {speedup:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ViMedBot API load test")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=["chat", "search"], default="chat")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=12)
+    parser.add_argument("--rerank-top-n", type=int, default=5)
+    parser.add_argument("--no-expansion", action="store_true")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--api-key", default=None, help="sent as X-API-Key, for a key in ADMISSION_API_KEYS")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""Deterministic local stand-ins for the models and APIs behind the pipeline.
+
+Nothing here touches the network or loads model weights: the embedder hashes
+tokens into a fixed-size vector, the Gemini model and the reranker answer from
+the prompt/documents they are given, and each sleeps for a configurable time
+to imitate the real thing. `build_stub_generator` wires them into a real
+`MedicalRAGGenerator` over an in-memory Qdrant seeded with synthetic
+Vietnamese medical chunks, so everything between the stubs (caches, batching,
+fusion, context building, the FastAPI app) is the production code.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import time
+import zlib
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.client_pool import ClientPool
+from src.core.config import settings
+from src.core.text import normalize_query, tokenize
+
+DISEASES = [
+    "tiểu đường type 2", "tăng huyết áp", "hen phế quản", "viêm gan B", "sốt xuất huyết", "cúm mùa",
+    "đột quỵ", "ung thư phổi", "viêm dạ dày", "trào ngược dạ dày thực quản", "gout", "loãng xương",
+    "thoái hóa khớp gối", "viêm phổi", "sỏi thận", "thiếu máu thiếu sắt", "rối loạn tiền đình",
+    "mất ngủ kéo dài", "trầm cảm", "suy giáp", "cường giáp", "viêm xoang", "tay chân miệng", "thủy đậu",
+    "sởi", "COVID-19", "viêm da cơ địa", "zona thần kinh", "bệnh trĩ", "hội chứng ruột kích thích",
+]
+ASPECTS = {
+    "Triệu chứng": [
+        "Người bệnh {d} thường gặp {a}, {b} và đôi khi {c}.",
+        "Dấu hiệu sớm của {d} là {a}; khi bệnh tiến triển có thể xuất hiện {b}.",
+        "Nhiều trường hợp {d} không có biểu hiện rõ, một số người thấy {c} hoặc {a}.",
+    ],
+    "Nguyên nhân": [
+        "{d} có liên quan đến {e}, {f} và yếu tố di truyền.",
+        "Nguy cơ mắc {d} tăng ở người {g}, đặc biệt khi kèm theo {e}.",
+        "Các yếu tố như {f} và {e} góp phần làm bệnh {d} nặng hơn.",
+    ],
+    "Điều trị": [
+        "Điều trị {d} cần theo chỉ định của bác sĩ, kết hợp {h} và theo dõi định kỳ.",
+        "Người bệnh {d} nên {h}, tránh tự ý dùng thuốc khi chưa có chỉ định.",
+        "Phác đồ điều trị {d} thường gồm dùng thuốc, {h} và tái khám đúng hẹn.",
+    ],
+    "Phòng ngừa": [
+        "Để phòng ngừa {d}, nên {h}, ngủ đủ giấc và hạn chế {f}.",
+        "Tiêm phòng đầy đủ, {h} và khám sức khỏe định kỳ giúp giảm nguy cơ {d}.",
+        "Người {g} nên chủ động tầm soát {d} và duy trì {h}.",
+    ],
+    "Khi nào cần đi khám": [
+        "Cần đến cơ sở y tế ngay nếu người bệnh {d} có {c} hoặc {b} kéo dài.",
+        "Trẻ em và người cao tuổi mắc {d} cần được thăm khám sớm khi xuất hiện {a}.",
+        "Nếu {b} không cải thiện sau vài ngày, người bệnh {d} nên đi khám chuyên khoa.",
+    ],
+}
+SYMPTOMS = ["mệt mỏi", "sốt cao", "đau đầu", "khó thở", "chóng mặt", "buồn nôn", "đau ngực", "ho kéo dài",
+            "phát ban", "sụt cân", "khát nước nhiều", "tiểu nhiều", "đau bụng", "ngứa", "mất ngủ"]
+CAUSES = ["chế độ ăn nhiều đường", "ít vận động", "hút thuốc lá", "uống rượu bia", "căng thẳng kéo dài",
+          "nhiễm virus", "nhiễm khuẩn", "thừa cân", "ô nhiễm không khí", "tuổi cao"]
+GROUPS = ["trên 40 tuổi", "thừa cân", "có bệnh nền", "mang thai", "làm việc văn phòng", "cao tuổi"]
+CARE = ["ăn uống cân bằng", "tập thể dục đều đặn", "uống đủ nước", "kiểm soát cân nặng",
+        "giữ vệ sinh cá nhân", "giảm muối trong khẩu phần", "nghỉ ngơi hợp lý"]
+# phrases the stub embedder treats as "meaning", so questions land near the right chunks
+ASPECT_TERMS = ["triệu chứng", "dấu hiệu", "nhận biết", "nguyên nhân", "nguy cơ", "điều trị", "chữa",
+                "phòng ngừa", "phòng", "tránh", "đi khám", "nguy hiểm"]
+QUESTION_TEMPLATES = {
+    "Triệu chứng": ["Triệu chứng của {d} là gì?", "Làm sao nhận biết {d}?", "Dấu hiệu sớm của {d}?"],
+    "Nguyên nhân": ["Nguyên nhân gây {d}?", "Ai có nguy cơ mắc {d}?", "Vì sao bị {d}?"],
+    "Điều trị": ["{d} điều trị như thế nào?", "{d} có chữa được không?", "Bị {d} nên làm gì?"],
+    "Phòng ngừa": ["Cách phòng ngừa {d}?", "Làm sao để tránh {d}?", "Phòng {d} thế nào?"],
+    "Khi nào cần đi khám": ["Khi nào {d} cần đi khám?", "{d} nguy hiểm khi nào?"],
+}
+
+
+def synthetic_chunks(num_chunks: int, seed: int = 0) -> List[Dict]:
+    """Pre-chunked records (one paragraph each) in the ingestion input format."""
+    rng = random.Random(seed)
+    records = []
+    article = 0
+    while len(records) < num_chunks:
+        disease = DISEASES[article % len(DISEASES)]
+        aspect = list(ASPECTS)[(article // len(DISEASES)) % len(ASPECTS)]
+        for paragraph in range(rng.randint(2, 5)):
+            sentences = [
+                template.format(
+                    d=disease,
+                    a=rng.choice(SYMPTOMS), b=rng.choice(SYMPTOMS), c=rng.choice(SYMPTOMS),
+                    e=rng.choice(CAUSES), f=rng.choice(CAUSES), g=rng.choice(GROUPS), h=rng.choice(CARE)
+                )
+                for template in rng.sample(ASPECTS[aspect], k=rng.randint(2, 3))
+            ]
+            records.append({
+                "article_id": f"syn-{article}",
+                "paragraph_id": paragraph,
+                "title": f"{aspect} bệnh {disease}",
+                "category": "Bệnh thường gặp",
+                "header": aspect,
+                "text": " ".join(sentences),
+            })
+        article += 1
+    return records[:num_chunks]
+
+
+def synthetic_questions(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed + 1)
+    questions = []
+    for _ in range(count):
+        aspect = rng.choice(list(QUESTION_TEMPLATES))
+        questions.append(rng.choice(QUESTION_TEMPLATES[aspect]).format(d=rng.choice(DISEASES)))
+    return questions
+
+
+def load_sample_texts(path: Optional[str] = None, limit: int = 500) -> List[str]:
+    """Texts for agreement checks and benchmarks.
+
+    `path` is a JSONL file (a "question", "query", "message" or "text" field per
+    line) or plain text, one item per line. Without it, synthetic questions and
+    passages are used.
+    """
+    if path is None:
+        half = limit // 2
+        return synthetic_questions(half) + [chunk["text"] for chunk in synthetic_chunks(limit - half)]
+
+    texts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                line = next((record[k] for k in ("question", "query", "message", "text") if record.get(k)), "")
+            if line:
+                texts.append(line)
+            if len(texts) >= limit:
+                break
+    return texts
+
+
+def _sleep_ms(ms: float):
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+async def _async_sleep_ms(ms: float):
+    if ms > 0:
+        await asyncio.sleep(ms / 1000)
+
+
+class HashingTokenizer:
+    # stands in for the Hugging Face tokenizer the context builder counts with
+    def encode(self, text: str, add_special_tokens: bool = False, verbose: bool = False) -> List[int]:
+        return [zlib.crc32(word.encode("utf-8")) for word in text.split()]
+
+
+class HashingEmbedder:
+    """Signed feature hashing of `tokenize` terms, plus a topic component.
+
+    Lexical overlap alone gives a short question and a long chunk a low cosine,
+    so phrases from `topics` found in the text (diseases, aspects) add a second
+    unit vector weighted by `topic_weight`; texts about the same disease and
+    aspect then score well above the default threshold, as with a real model.
+    Each `encode` call sleeps `base_ms + per_text_ms * len(texts)` (outside the
+    GIL, like a torch forward pass), so batching still pays off.
+    """
+
+    def __init__(self, dim: int = 384, base_ms: float = 0.0, per_text_ms: float = 0.0,
+                 topics: Sequence[str] = (), topic_weight: float = 2.0):
+        self.dim = dim
+        self.base_ms = base_ms
+        self.per_text_ms = per_text_ms
+        self.topics = [f" {normalize_query(topic)} " for topic in topics]
+        self.topic_weight = topic_weight
+        self.tokenizer = HashingTokenizer()
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _bucket(self, term: str) -> Tuple[int, float]:
+        bucket = self._buckets.get(term)
+        if bucket is None:
+            h = zlib.crc32(term.encode("utf-8"))
+            bucket = self._buckets[term] = (h % self.dim, 1.0 if (h >> 16) & 1 else -1.0)
+        return bucket
+
+    def encode(self, texts, convert_to_numpy: bool = True, normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        _sleep_ms(self.base_ms + self.per_text_ms * len(texts))
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                index, sign = self._bucket(term)
+                vectors[row, index] += sign
+            vectors[row] /= np.linalg.norm(vectors[row]) or 1.0
+
+            padded = f" {normalize_query(text)} "
+            found = [topic for topic in self.topics if topic in padded]
+            if found:
+                topic_vector = np.zeros(self.dim, dtype=np.float32)
+                for topic in found:
+                    index, sign = self._bucket(f"topic:{topic}")
+                    topic_vector[index] += sign
+                vectors[row] += self.topic_weight * topic_vector / np.linalg.norm(topic_vector)
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1.0, norms)
+        return vectors[0] if single else vectors
+
+
+class FakeReranker:
+    """Reranker backend scoring by query-term overlap, with API-like latency."""
+    name = "fake"
+
+    def __init__(self, base_ms: float = 0.0, per_document_ms: float = 0.0):
+        self.base_ms = base_ms
+        self.per_document_ms = per_document_ms
+
+    def _rank(self, query: str, documents: List[Dict], top_n: int) -> List[Tuple[int, float]]:
+        query_terms = set(tokenize(query))
+        scores = []
+        for doc in documents:
+            terms = set(tokenize(doc.get("text", "")))
+            scores.append(len(query_terms & terms) / (len(query_terms) or 1))
+        order = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+        return [(i, scores[i]) for i in order[:top_n]]
+
+    def rank(self, query: str, documents: List[Dict], top_n: int) -> List[Tuple[int, float]]:
+        _sleep_ms(self.base_ms + self.per_document_ms * len(documents))
+        return self._rank(query, documents, top_n)
+
+    async def rank_async(self, query: str, documents: List[Dict], top_n: int) -> List[Tuple[int, float]]:
+        await _async_sleep_ms(self.base_ms + self.per_document_ms * len(documents))
+        return self._rank(query, documents, top_n)
+
+
+_ORIGINAL_QUERY = re.compile(r"Câu hỏi gốc: (.+)")
+_NUM_QUERIES = re.compile(r"tạo ra (\d+) câu hỏi")
+_REWRITE_QUERY = re.compile(r"CÂU HỎI MỚI: (.+)")
+_ANSWER_QUERY = re.compile(r"CÂU HỎI: (.+)")
+_CONTEXT = re.compile(r"<<<\n(.*?)\n>>>", re.S)
+
+
+class FakeGeminiModel:
+    """Answers the three prompts LLMService sends, with configurable timing.
+
+    `latency_ms` is the time to the first token and `tokens_per_second` the
+    decode rate, so a non-streamed answer of n tokens takes
+    latency_ms + n / tokens_per_second.
+    """
+
+    def __init__(self, latency_ms: float = 200.0, tokens_per_second: float = 200.0,
+                 answer_tokens: int = 120, chunk_tokens: int = 8):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.chunk_tokens = chunk_tokens
+
+    def _reply(self, prompt: str) -> str:
+        if _ORIGINAL_QUERY.search(prompt):
+            query = _ORIGINAL_QUERY.search(prompt).group(1).strip()
+            count = int(_NUM_QUERIES.search(prompt).group(1)) if _NUM_QUERIES.search(prompt) else 2
+            variants = [f"Thông tin về {query}", f"{query} cần lưu ý gì", f"Giải thích giúp tôi: {query}"]
+            return "\n".join(variants[:count])
+        if _REWRITE_QUERY.search(prompt):
+            return _REWRITE_QUERY.search(prompt).group(1).strip()
+
+        match = _CONTEXT.search(prompt)
+        words = (match.group(1) if match else prompt).split()
+        question = _ANSWER_QUERY.search(prompt)
+        opening = f"Về câu hỏi \"{question.group(1).strip() if question else ''}\":"
+        body = [words[i % len(words)] for i in range(self.answer_tokens)] if words else []
+        return " ".join([opening] + body)
+
+    def _usage(self, prompt: str, text: str):
+        prompt_tokens, output_tokens = len(prompt.split()), len(text.split())
+        return SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens
+        )
+
+    def _duration_ms(self, text: str) -> float:
+        return self.latency_ms + 1000 * len(text.split()) / self.tokens_per_second
+
+    def generate_content(self, prompt: str):
+        text = self._reply(prompt)
+        _sleep_ms(self._duration_ms(text))
+        return SimpleNamespace(text=text, usage_metadata=self._usage(prompt, text))
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        text = self._reply(prompt)
+        if not stream:
+            await _async_sleep_ms(self._duration_ms(text))
+            return SimpleNamespace(text=text, usage_metadata=self._usage(prompt, text))
+
+        await _async_sleep_ms(self.latency_ms)
+        return self._stream(prompt, text)
+
+    async def _stream(self, prompt: str, text: str) -> AsyncIterator:
+        words = text.split()
+        for start in range(0, len(words), self.chunk_tokens):
+            if start:
+                await _async_sleep_ms(1000 * self.chunk_tokens / self.tokens_per_second)
+            last = start + self.chunk_tokens >= len(words)
+            yield SimpleNamespace(
+                text=" ".join(words[start:start + self.chunk_tokens]) + ("" if last else " "),
+                usage_metadata=self._usage(prompt, text) if last else None
+            )
+
+
+def fake_gemini_pool(model: FakeGeminiModel, keys: int = 1) -> ClientPool:
+    # the real pool (rotation, retries) around fake clients
+    return ClientPool("gemini", [f"fake-key-{i}" for i in range(keys)], lambda key: model)
+
+
+def offline_settings():
+    # keep benchmark runs away from real servers, on-disk stores and HF downloads
+    settings.QDRANT_URL = ""
+    settings.QDRANT_PATH = ""
+    settings.SPARSE_INDEX_PATH = ""
+    settings.EXPANSION_CACHE_PATH = ""
+    settings.CONVERSATION_DB_PATH = ""
+    settings.CONTEXT_TOKENIZER = ""
+
+
+def seed_collection(client, collection_name: str, embedder: HashingEmbedder, records: List[Dict]):
+    # through the real ingestion path, so payloads match what production stores
+    from src.services.ingestion import QdrantIngestor
+
+    base_ms, per_text_ms = embedder.base_ms, embedder.per_text_ms
+    embedder.base_ms = embedder.per_text_ms = 0.0
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        ingestor = QdrantIngestor(client, collection_name, embedder, "hashing-embedder")
+        ingestor.ensure_collection(recreate=True)
+        ingestor.run(path)
+    finally:
+        os.remove(path)
+        embedder.base_ms, embedder.per_text_ms = base_ms, per_text_ms
+
+
+def build_stub_generator(
+    num_chunks: int = 2000,
+    seed: int = 0,
+    embed_base_ms: float = 4.0,
+    embed_per_text_ms: float = 1.0,
+    llm_latency_ms: float = 200.0,
+    llm_tokens_per_second: float = 200.0,
+    answer_tokens: int = 120,
+    rerank_base_ms: float = 50.0,
+    rerank_per_document_ms: float = 0.2
+):
+    """A real MedicalRAGGenerator over stub models and a seeded in-memory Qdrant."""
+    offline_settings()
+
+    from src.services.generator import MedicalRAGGenerator
+    from src.services.llm_service import LLMService
+    from src.services.reranker import RerankerService
+    from src.services.vector_search import VectorSearchService, create_qdrant_client
+
+    client = create_qdrant_client(url="", path="", local_index="")
+    embedder = HashingEmbedder(
+        base_ms=embed_base_ms, per_text_ms=embed_per_text_ms, topics=DISEASES + ASPECT_TERMS
+    )
+    seed_collection(client, settings.COLLECTION_NAME, embedder, synthetic_chunks(num_chunks, seed))
+
+    model = FakeGeminiModel(llm_latency_ms, llm_tokens_per_second, answer_tokens)
+    return MedicalRAGGenerator(
+        vector_search=VectorSearchService(client=client, embedder=embedder),
+        llm=LLMService(pool=fake_gemini_pool(model)),
+        reranker=RerankerService(backend=FakeReranker(rerank_base_ms, rerank_per_document_ms))
+    )
@@ -1,17 +1,47 @@
-from fastapi import FastAPI
+import time
+
+_import_start = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from src.api.admission import AdmissionMiddleware, admission
 from src.api.routes import router
+from src.core.config import settings
+from src.core.observability import REQUEST_SECONDS, REQUESTS_TOTAL, metrics, setup_logging, stats_to_gauges
+from src.core.startup import startup
+import asyncio
 import os
 import mimetypes
 
+setup_logging()
+
+async def load_models():
+    try:
+        await asyncio.to_thread(startup.load)
+    except Exception:
+        pass  # kept in startup.error and reported by /ready
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load models in the background so the server binds (and /health answers) immediately
+    loader = asyncio.create_task(load_models())
+    yield
+    loader.cancel()
+
 app = FastAPI(
     title="ViMedBot API",
     description="Hỏi đáp sức khỏe AI cho người Việt",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+if settings.ADMISSION_ENABLED:
+    # added before CORS so it runs inside it: 429s still carry the CORS headers
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -20,6 +50,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # label by endpoint name, not raw path, to keep the series count bounded
+        handler = getattr(request.scope.get("route"), "name", None) or "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, handler=handler)
+        REQUESTS_TOTAL.inc(method=request.method, handler=handler, status=str(status))
+
 app.include_router(router, prefix="/api/v1", tags=["chat"])
 
 BASE_DIR = os.path.dirname(__file__)
@@ -50,8 +94,45 @@ async def favicon():
 
 @app.get("/health")
 async def health():
+    # liveness: the process is up, models may still be loading
     return {"status": "healthy", "service": "ViMedBot"}
 
+@app.get("/ready")
+async def ready():
+    # readiness: models loaded and warmed, safe to route traffic here
+    report = startup.report()
+    return JSONResponse(report, status_code=200 if startup.ready else 503)
+
+def service_metrics():
+    lines = stats_to_gauges("vimedbot", {"ready": int(startup.ready)})
+    if settings.ADMISSION_ENABLED:
+        lines += stats_to_gauges("vimedbot_admission", admission.stats())
+    generator = startup.generator
+    if generator is None:
+        return lines
+    if generator.answer_cache is not None:
+        lines += stats_to_gauges("vimedbot_answer_cache", generator.answer_cache.stats())
+    if generator.vector_search.batcher is not None:
+        lines += stats_to_gauges("vimedbot_embedding_batcher", generator.vector_search.batcher.stats.to_dict())
+    if generator.conversations is not None:
+        lines += stats_to_gauges("vimedbot_conversations", generator.conversations.stats())
+    if generator.vector_search.result_cache is not None:
+        lines += stats_to_gauges("vimedbot_retrieval_cache", generator.vector_search.result_cache.stats())
+    lines += stats_to_gauges("vimedbot_reranker", generator.reranker.stats())
+    for stage, stats in generator.coalescing_stats().items():
+        lines += stats_to_gauges(f"vimedbot_coalescing_{stage}", stats)
+    return lines
+
+metrics.register_collector(service_metrics)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+startup.timings["app_import_ms"] = round((time.perf_counter() - _import_start) * 1000, 1)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
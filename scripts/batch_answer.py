@@ -0,0 +1,109 @@
+"""Answer a JSONL file of questions in bulk (nightly evaluations, FAQ pre-generation).
+
+    python -m scripts.batch_answer questions.jsonl --out answers.jsonl
+    python -m scripts.batch_answer questions.jsonl --out answers.jsonl --no-expansion --top-k 20
+
+Each input line is {"id": ..., "question": ...} ("message"/"query" and
+"request_id" work too) with optional per-line top_k, rerank_top_n,
+score_threshold and use_query_expansion. Results are appended to --out as
+they finish, one JSON line each; re-running the same command skips ids that
+already have a result there, so an interrupted or partly failed run resumes
+where it stopped. Failed items are retried and get a new line, so when
+reading the output the last line for an id wins.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from src.core.config import settings
+from src.core.observability import setup_logging
+from src.core.startup import configure_model_cache
+
+
+def drop_partial_line(path: str):
+    # a crash can leave half a record at the end; appending after it would corrupt the next one
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+async def run(args) -> dict:
+    from src.core.startup import get_generator
+    from src.services.batch_runner import BatchRunner, completed_ids, iter_jsonl_items
+
+    if not args.restart:
+        drop_partial_line(args.out)
+    done = set() if args.restart else completed_ids(args.out)
+    if done:
+        print(f"Resuming: {len(done)} questions already answered in {args.out}")
+
+    generator = get_generator()
+    runner = BatchRunner(generator, chunk_size=args.chunk_size, requests_per_minute=args.rpm_per_key)
+    for name in ("top_k", "rerank_top_n", "score_threshold"):
+        if getattr(args, name) is not None:
+            runner.defaults[name] = getattr(args, name)
+    if args.no_expansion:
+        runner.defaults["use_query_expansion"] = False
+
+    counts = {"ok": 0, "empty": 0, "error": 0}
+    start = time.perf_counter()
+    last_report = start
+    with open(args.input, encoding="utf-8") as source, open(args.out, "w" if args.restart else "a", encoding="utf-8") as out:
+        items = (item for item in iter_jsonl_items(source) if item["id"] not in done)
+        async for result in runner.run(items):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[result["status"]] += 1
+
+            if time.perf_counter() - last_report >= args.report_every:
+                last_report = time.perf_counter()
+                total = sum(counts.values())
+                print(f"{total} answered ({counts['error']} errors), "
+                      f"{total / (last_report - start):.2f} questions/s")
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    return dict(
+        counts,
+        answered=total,
+        skipped=len(done),
+        elapsed_s=round(elapsed, 2),
+        questions_per_sec=round(total / elapsed, 2) if elapsed else 0.0,
+        gemini=runner.scheduler.stats()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch question answering over the RAG pipeline")
+    parser.add_argument("input", help="JSONL file of questions")
+    parser.add_argument("--out", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--restart", action="store_true", help="overwrite --out instead of resuming")
+    parser.add_argument("--chunk-size", type=int, default=settings.BATCH_CHUNK_SIZE,
+                        help="questions embedded and searched together")
+    parser.add_argument("--rpm-per-key", type=float, default=settings.GEMINI_RPM_PER_KEY,
+                        help="Gemini requests per minute allowed per API key")
+    parser.add_argument("--top-k", type=int, default=None, help="default for lines without top_k")
+    parser.add_argument("--rerank-top-n", type=int, default=None)
+    parser.add_argument("--score-threshold", type=float, default=None)
+    parser.add_argument("--no-expansion", action="store_true", help="default use_query_expansion to false")
+    parser.add_argument("--report-every", type=float, default=30.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    configure_model_cache()
+    setup_logging()
+
+    stats = asyncio.run(run(args))
+    print(f"Done: {stats['answered']} answered ({stats['ok']} ok, {stats['empty']} without documents, "
+          f"{stats['error']} errors), {stats['skipped']} skipped, "
+          f"{stats['elapsed_s']}s -> {stats['questions_per_sec']} questions/s")
+    if stats["error"]:
+        print("Re-run the same command to retry the failed questions.")
+
+
+if __name__ == "__main__":
+    main()
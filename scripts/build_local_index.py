@@ -0,0 +1,63 @@
+"""Snapshot a Qdrant collection into a memory-mapped local index for edge/offline serving.
+
+    python -m scripts.build_local_index --out ./local_index                      # from QDRANT_URL
+    python -m scripts.build_local_index --qdrant-path ./qdrant_data --out ./local_index --dtype int8
+    python -m scripts.build_local_index --out ./local_index --ivf-lists 2048     # force IVF
+
+Each run writes a new versioned snapshot (v1, v2, ...) under --out and points
+CURRENT at it once it is complete; --keep older ones stay for rollback. Serve
+it with QDRANT_URL empty and LOCAL_INDEX_PATH=./local_index. A running API
+switches to the new snapshot on POST /api/v1/cache/invalidate (--invalidate-url).
+"""
+import argparse
+import json
+import os
+
+from src.core.config import settings
+from src.core.observability import setup_logging
+
+
+def directory_mb(path: str) -> float:
+    return round(sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file()) / 2**20, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a local vector index snapshot from Qdrant")
+    parser.add_argument("--out", default=settings.LOCAL_INDEX_PATH or None, help="defaults to LOCAL_INDEX_PATH")
+    parser.add_argument("--collection", default=settings.COLLECTION_NAME)
+    parser.add_argument("--qdrant-url", default=None, help="defaults to QDRANT_URL")
+    parser.add_argument("--qdrant-path", default=None, help="local on-disk Qdrant (defaults to QDRANT_PATH)")
+    parser.add_argument("--dtype", default="float16", choices=["float16", "int8"])
+    parser.add_argument("--ivf-lists", type=int, default=None,
+                        help="IVF lists (0: exact search only; default: 4*sqrt(points) from LOCAL_INDEX_IVF_MIN_POINTS up)")
+    parser.add_argument("--keep", type=int, default=3, help="snapshots kept, including the new one")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--invalidate-url", default=None,
+                        help="e.g. http://localhost:8000/api/v1/cache/invalidate")
+    args = parser.parse_args()
+    if not args.out:
+        parser.error("--out is required when LOCAL_INDEX_PATH is not set")
+
+    setup_logging()
+
+    from src.services.local_index import LocalVectorIndex
+    from src.services.vector_search import create_qdrant_client
+
+    client = create_qdrant_client(url=args.qdrant_url, path=args.qdrant_path, local_index="")
+    snapshot = LocalVectorIndex.build_from_qdrant(
+        client, args.collection, args.out,
+        page_size=args.page_size, dtype=args.dtype, ivf_lists=args.ivf_lists, keep=args.keep,
+        source=args.qdrant_url or args.qdrant_path or settings.QDRANT_URL or settings.QDRANT_PATH
+    )
+
+    index = LocalVectorIndex(args.out)
+    manifest = index.snapshot.manifest
+    print(json.dumps(dict(manifest, snapshot=snapshot, size_mb=directory_mb(snapshot)), ensure_ascii=False, indent=2))
+
+    if args.invalidate_url:
+        from scripts.ingest import invalidate_api_cache
+        invalidate_api_cache(args.invalidate_url, settings.ADMIN_TOKEN)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Download the embedding (and optionally cross-encoder) models into MODEL_CACHE_DIR.
+
+Run at image build time so the container can start with MODELS_OFFLINE=true:
+
+    MODEL_CACHE_DIR=/models python -m scripts.download_models --cross-encoder
+"""
+import argparse
+
+from src.core.config import settings
+from src.core.startup import configure_model_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-download models into the local cache")
+    parser.add_argument("--cache-dir", default=settings.MODEL_CACHE_DIR or None)
+    parser.add_argument("--cross-encoder", action="store_true",
+                        help="also fetch CROSS_ENCODER_MODEL (default: only when RERANKER_BACKEND=cross-encoder)")
+    args = parser.parse_args()
+
+    if args.cache_dir:
+        settings.MODEL_CACHE_DIR = args.cache_dir
+    settings.MODELS_OFFLINE = False
+    configure_model_cache()
+
+    from huggingface_hub import snapshot_download
+
+    models = [settings.EMBEDDING_MODEL]
+    if args.cross_encoder or settings.RERANKER_BACKEND == "cross-encoder":
+        models.append(settings.CROSS_ENCODER_MODEL)
+
+    for model in models:
+        path = snapshot_download(model, cache_dir=settings.MODEL_CACHE_DIR or None)
+        print(f"{model} -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Export the embedding model to ONNX (optionally int8) and check it against the original.
+
+    python -m scripts.export_embedding --out ./models/embedding-onnx --quantize avx512_vnni
+    python -m scripts.export_embedding --out ./models/embedding-onnx --optimize O3 --sample questions.jsonl
+
+Needs `pip install -r requirements-onnx.txt` (onnxruntime + optimum). Every
+exported file is compared with the PyTorch model on a sample set (cosine per
+text and top-k neighbour overlap); the command fails when a file falls below
+--min-cosine / --min-overlap. Serve the result with
+
+    EMBEDDING_RUNTIME=onnx EMBEDDING_ONNX_PATH=./models/embedding-onnx EMBEDDING_ONNX_FILE=<file>
+
+The collection does not need re-indexing: documents stay embedded with the
+original model, only queries go through the exported one.
+"""
+import argparse
+import glob
+import json
+import os
+
+from src.core.config import settings
+from src.core.startup import configure_model_cache
+
+
+def encode(model, texts):
+    return model.encode(texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX and verify it")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--out", required=True, help="directory for the exported model")
+    parser.add_argument("--quantize", default="avx512_vnni",
+                        choices=["none", "arm64", "avx2", "avx512", "avx512_vnni"],
+                        help="dynamic int8 quantization target (none: fp32 only)")
+    parser.add_argument("--optimize", default=None, choices=["O1", "O2", "O3", "O4"],
+                        help="also write a graph-optimized fp32 file (O4 is fp16, GPU only)")
+    parser.add_argument("--sample", default=None, help="JSONL/text file of sample texts (default: synthetic)")
+    parser.add_argument("--sample-size", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5, help="neighbours compared per text")
+    parser.add_argument("--min-cosine", type=float, default=0.95, help="lowest acceptable per-text cosine")
+    parser.add_argument("--min-overlap", type=float, default=0.9, help="lowest acceptable mean neighbour overlap")
+    parser.add_argument("--report", default=None, help="write the check results as JSON")
+    args = parser.parse_args()
+
+    configure_model_cache()
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model, export_optimized_onnx_model
+    from benchmarks.stubs import load_sample_texts
+    from src.services.embedder import create_embedder, embedding_agreement
+
+    texts = load_sample_texts(args.sample, args.sample_size)
+    print(f"Encoding {len(texts)} sample texts with the original model")
+    reference = encode(create_embedder("torch", args.model, quantize=False), texts)
+
+    # loading with the onnx backend exports the model; save_pretrained writes it out
+    onnx_model = create_embedder("onnx", args.model, onnx_file="")
+    onnx_model.save_pretrained(args.out)
+    if args.optimize:
+        export_optimized_onnx_model(onnx_model, args.optimize, args.out)
+    if args.quantize != "none":
+        export_dynamic_quantized_onnx_model(onnx_model, args.quantize, args.out)
+
+    results, failed = [], []
+    for path in sorted(glob.glob(os.path.join(args.out, "**", "*.onnx"), recursive=True)):
+        onnx_file = os.path.relpath(path, args.out)
+        model = create_embedder("onnx", args.out, onnx_file=onnx_file)
+        agreement = embedding_agreement(reference, encode(model, texts), args.k)
+        overlap = agreement.get(f"neighbour_overlap@{min(args.k, len(texts) - 1)}", 1.0)
+        ok = agreement["cosine_min"] >= args.min_cosine and overlap >= args.min_overlap
+        results.append(dict(agreement, file=onnx_file, size_mb=round(os.path.getsize(path) / 2**20, 1), ok=ok))
+        if not ok:
+            failed.append(onnx_file)
+        print(f"{onnx_file:>40} {results[-1]['size_mb']:>7.1f}MB cos mean={agreement['cosine_mean']:.4f} "
+              f"min={agreement['cosine_min']:.4f} overlap={overlap:.3f} {'ok' if ok else 'FAILED'}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if failed:
+        raise SystemExit(f"Below the agreement thresholds: {', '.join(failed)}")
+    print(f"Use: EMBEDDING_RUNTIME=onnx EMBEDDING_ONNX_PATH={args.out} EMBEDDING_ONNX_FILE=<file above>")
+
+
+if __name__ == "__main__":
+    main()
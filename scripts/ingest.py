@@ -0,0 +1,113 @@
+"""Build (or refresh) the Qdrant collection from a local JSONL/Parquet dump.
+
+    python -m scripts.ingest data/articles.jsonl --state .ingest_state.json
+    python -m scripts.ingest data/articles.parquet --processes 4 --upload-workers 8
+    python -m scripts.ingest data/sample.jsonl --qdrant-path ./qdrant_data   # local, no server
+    python -m scripts.ingest data/sample.jsonl --memory --limit 200          # throughput smoke test
+    python -m scripts.ingest data/articles.jsonl --memory --local-index ./local_index   # edge build, no Qdrant kept
+
+Unchanged chunks are skipped via their content hash, so re-running on an
+updated dump only embeds what changed. Pass --invalidate-url to clear the
+running API's answer and retrieval caches afterwards.
+"""
+import argparse
+import json
+import os
+import urllib.request
+
+from src.core.config import settings
+from src.core.observability import setup_logging
+from src.core.startup import configure_model_cache
+
+
+def invalidate_api_cache(url: str, admin_token: str):
+    request = urllib.request.Request(url, method="POST", headers={"X-Admin-Token": admin_token})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        print(f"Cache invalidation: {response.status} {response.read().decode('utf-8')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingestion into Qdrant")
+    parser.add_argument("input", help="JSONL or .parquet file of articles")
+    parser.add_argument("--collection", default=settings.COLLECTION_NAME)
+    parser.add_argument("--qdrant-url", default=None, help="defaults to QDRANT_URL")
+    parser.add_argument("--qdrant-path", default=None, help="local on-disk Qdrant (defaults to QDRANT_PATH)")
+    parser.add_argument("--memory", action="store_true", help="in-memory Qdrant, for smoke tests")
+    parser.add_argument("--recreate", action="store_true", help="drop and recreate the collection")
+    parser.add_argument("--batch-size", type=int, default=256, help="chunks embedded per batch")
+    parser.add_argument("--upload-batch-size", type=int, default=128)
+    parser.add_argument("--upload-workers", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=1, help="embedding processes (CPU)")
+    parser.add_argument("--max-chars", type=int, default=1200, help="max characters per chunk")
+    parser.add_argument("--state", default=None, help="checkpoint file for resuming")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many records")
+    parser.add_argument("--report", default=None, help="write the final stats as JSON")
+    parser.add_argument("--sparse-index", default=settings.SPARSE_INDEX_PATH or None,
+                        help="rebuild the BM25 index for hybrid search at this path afterwards")
+    parser.add_argument("--local-index", default=None,
+                        help="also write a memory-mapped local index snapshot here (see scripts/build_local_index.py)")
+    parser.add_argument("--local-index-dtype", default="float16", choices=["float16", "int8"])
+    parser.add_argument("--invalidate-url", default=None,
+                        help="e.g. http://localhost:8000/api/v1/cache/invalidate")
+    args = parser.parse_args()
+
+    configure_model_cache()
+    setup_logging()
+
+    from sentence_transformers import SentenceTransformer
+    from src.services.ingestion import QdrantIngestor
+    from src.services.vector_search import create_qdrant_client
+
+    # always a Qdrant store: the local index is read-only and built from it afterwards
+    if args.memory:
+        client = create_qdrant_client(url="", path="", local_index="")
+    else:
+        client = create_qdrant_client(url=args.qdrant_url, path=args.qdrant_path, local_index="")
+
+    # documents always get the full-precision model; EMBEDDING_RUNTIME only changes the query side
+    embedder = SentenceTransformer(
+        settings.EMBEDDING_MODEL,
+        trust_remote_code=True,
+        cache_folder=settings.MODEL_CACHE_DIR or None
+    )
+
+    ingestor = QdrantIngestor(
+        client,
+        args.collection,
+        embedder,
+        settings.EMBEDDING_MODEL,
+        batch_size=args.batch_size,
+        upload_batch_size=args.upload_batch_size,
+        upload_workers=args.upload_workers,
+        processes=args.processes,
+        max_chars=args.max_chars
+    )
+    ingestor.ensure_collection(recreate=args.recreate)
+    stats = ingestor.run(args.input, state_path=args.state, limit=args.limit)
+
+    print(f"Done: {stats['records']} records, {stats['chunks']} chunks "
+          f"({stats['unchanged']} unchanged, {stats['upserted']} upserted, {stats['deleted']} stale deleted) "
+          f"in {stats['elapsed_s']}s -> {stats['docs_per_sec']} docs/s, {stats['chunks_per_sec']} chunks/s")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+
+    changed = stats["upserted"] or stats["deleted"]
+    if args.sparse_index and (changed or not os.path.exists(args.sparse_index)):
+        from src.services.sparse_index import SparseIndex
+        SparseIndex.build_from_qdrant(client, args.collection).save(args.sparse_index)
+
+    if args.local_index:
+        from src.services.local_index import LocalVectorIndex
+        snapshot = LocalVectorIndex.build_from_qdrant(
+            client, args.collection, args.local_index, dtype=args.local_index_dtype, source="scripts.ingest"
+        )
+        print(f"Local index snapshot: {snapshot}")
+
+    if args.invalidate_url and changed:
+        invalidate_api_cache(args.invalidate_url, settings.ADMIN_TOKEN)
+
+
+if __name__ == "__main__":
+    main()
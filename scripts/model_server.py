@@ -0,0 +1,48 @@
+"""Serve the embedding model (and the cross-encoder reranker) to all API workers on this host.
+
+    python -m scripts.model_server --socket /run/vimedbot/models.sock
+    MODEL_SERVER_SOCKET=/run/vimedbot/models.sock uvicorn main:app --workers 8
+
+Each uvicorn worker otherwise loads its own copy of the models. With
+MODEL_SERVER_SOCKET set, workers keep only a socket client (and the
+tokenizer), and this process batches their queries together. The cross-encoder
+is loaded when RERANKER_BACKEND=cross-encoder or with --cross-encoder.
+"""
+import argparse
+import asyncio
+
+from src.core.config import settings
+from src.core.observability import setup_logging
+from src.core.startup import configure_model_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding / rerank model server")
+    parser.add_argument("--socket", default=settings.MODEL_SERVER_SOCKET or "/tmp/vimedbot-models.sock")
+    parser.add_argument("--cross-encoder", action="store_true",
+                        help="also serve CROSS_ENCODER_MODEL (default: only when RERANKER_BACKEND=cross-encoder)")
+    args = parser.parse_args()
+
+    configure_model_cache()
+    setup_logging()
+
+    from src.services.embedder import create_embedder
+    from src.services.model_server import ModelServer
+    from src.services.reranker import CrossEncoderReranker
+
+    embedder = create_embedder()
+    embedder.encode(["khởi động hệ thống"], normalize_embeddings=True)
+    reranker = None
+    if args.cross_encoder or settings.RERANKER_BACKEND == "cross-encoder":
+        reranker = CrossEncoderReranker()
+        reranker.rank("khởi động hệ thống", [{"id": None, "text": "Tài liệu khởi động."}], 1)
+
+    server = ModelServer(embedder, reranker, model_name=settings.EMBEDDING_MODEL)
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
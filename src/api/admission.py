@@ -0,0 +1,96 @@
+import time
+from typing import FrozenSet, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from src.core.admission import AdmissionController, AdmissionRejected
+from src.core.config import settings
+from src.core.observability import get_logger, log_event
+
+logger = get_logger("admission")
+
+# routes that run the pipeline; /chat/batch is admin-only and paced by its own scheduler
+ADMITTED_PATHS = ("/api/v1/chat", "/api/v1/chat/stream", "/api/v1/search")
+
+REJECTED_DETAIL = {
+    "rate_limited": "Bạn gửi quá nhiều yêu cầu, vui lòng thử lại sau",
+    "queue_full": "Hệ thống đang quá tải, vui lòng thử lại sau",
+    "queue_timeout": "Hệ thống đang quá tải, vui lòng thử lại sau",
+}
+
+admission = AdmissionController()
+
+
+def client_id(scope) -> str:
+    # a listed API key gets its own budget; anyone else is limited per IP
+    # (behind a proxy, run uvicorn with --proxy-headers so the IP is the client's)
+    for name, value in scope.get("headers", ()):
+        if name == b"x-api-key":
+            key = value.decode("latin-1")
+            if key in settings.ADMISSION_API_KEYS:
+                # the key's position, not the key: client ids end up in logs
+                return f"key:{settings.ADMISSION_API_KEYS.index(key)}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying `AdmissionController` to the pipeline routes.
+
+    Plain ASGI rather than @app.middleware("http"): the slot is released when
+    the first body chunk goes out. For /chat and /search that is the finished
+    response; for /chat/stream it is the first event, sent once retrieval is
+    done. A slow SSE reader then holds no slot, and the time clients take to
+    read does not count toward the service time that drives degradation.
+    """
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None, paths=ADMITTED_PATHS):
+        self.app = app
+        self.controller = controller or admission
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        client = client_id(scope)
+        try:
+            ticket = await self.controller.acquire(client)
+        except AdmissionRejected as e:
+            log_event(logger, "request_rejected", reason=e.reason, client=client, path=scope["path"],
+                      retry_after=e.retry_after)
+            response = JSONResponse(
+                {"detail": REJECTED_DETAIL[e.reason], "reason": e.reason},
+                status_code=429,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["degraded"] = ticket.degraded
+        start = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.controller.release(time.monotonic() - start)
+
+        async def send_releasing(message):
+            if message["type"] == "http.response.body" and (message.get("body") or not message.get("more_body")):
+                release()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_releasing)
+        finally:
+            release()
+
+
+def degraded_stages(request: Request) -> FrozenSet[str]:
+    # dependency: pipeline stages the admission middleware asked this request to skip
+    return getattr(request.state, "degraded", frozenset())
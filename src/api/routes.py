@@ -1,14 +1,32 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from src.services.generator import rag_generator
+from typing import TYPE_CHECKING, FrozenSet, List, Optional, Dict, Any
+from src.api.admission import admission, degraded_stages
+from src.core.config import settings
+from src.core.observability import get_logger
+from src.core.startup import startup
+import asyncio
+import json
 import time
+import uuid
+
+if TYPE_CHECKING:
+    from src.services.batch_runner import BatchRunner
 
 router = APIRouter()
+logger = get_logger("api")
+
+# one runner per loaded generator, so concurrent batch jobs share the Gemini rate budget
+_batch_runner: Optional["BatchRunner"] = None
+
+# conversation ids key the conversation memory, so only random ones are accepted:
+# a UUID (with or without dashes) from the web client, or one new_conversation_id() issued
+CONVERSATION_ID_PATTERN = r"^(conv_)?[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}$"
 
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=1000, description="Câu hỏi của người dùng")
-    conversation_id: Optional[str] = None
+    conversation_id: Optional[str] = Field(default=None, pattern=CONVERSATION_ID_PATTERN)
     use_query_expansion: bool = True
     top_k: int = Field(default=12, ge=1, le=50)
     rerank_top_n: int = Field(default=5, ge=1, le=20)
@@ -25,6 +43,9 @@ class SearchRequest(BaseModel):
     use_rerank: bool = True
     rerank_top_n: int = Field(default=5, ge=1, le=20)
 
+# payload fields /search returns; the rest stay in Qdrant
+SEARCH_FIELDS = ("title", "category", "text")
+
 class DocumentResult(BaseModel):
     title: str
     category: str
@@ -32,20 +53,56 @@ class DocumentResult(BaseModel):
     score: float
     rerank_score: Optional[float] = None
 
+def build_metadata(result: Dict[str, Any], degraded: FrozenSet[str] = frozenset()) -> Dict[str, Any]:
+    return {
+        "num_documents_found": result['num_documents'],
+        "num_documents_used": result['num_reranked'],
+        "queries_generated": len(result.get('queries_used', [])),
+        "cache": result.get('cache', 'miss'),
+        "expansion": result.get('expansion'),
+        "tokens": result.get('tokens'),
+        "conversation": result.get('conversation'),
+        "timings": result.get('timings'),
+        "degraded": sorted(degraded),
+    }
+
+def require_generator():
+    # models load in the background after startup; until then pipeline routes are unavailable
+    if not startup.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Hệ thống đang khởi động, vui lòng thử lại sau",
+            headers={"Retry-After": "5"}
+        )
+    return startup.generator
+
+def new_conversation_id() -> str:
+    # keys the conversation memory: must be unguessable and never shared between clients
+    return f"conv_{uuid.uuid4().hex}"
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    rag_generator=Depends(require_generator),
+    degraded: FrozenSet[str] = Depends(degraded_stages)
+):
     try:
         start_time = time.time()
 
         # generate conversation_id (if not provided)
-        conversation_id = request.conversation_id or f"conv_{int(time.time() * 1000)}"
+        conversation_id = request.conversation_id or new_conversation_id()
         
         # call RAG system
-        result = rag_generator.ask(
+        result = await rag_generator.ask_async(
             query=request.message,
             top_k=request.top_k,
-            use_query_expansion=request.use_query_expansion,
-            rerank_top_n=request.rerank_top_n
+            use_query_expansion=request.use_query_expansion and "expansion" not in degraded,
+            rerank_top_n=request.rerank_top_n,
+            conversation_id=conversation_id,
+            use_rerank="rerank" not in degraded
         )
         
         processing_time = time.time() - start_time
@@ -54,24 +111,110 @@ async def chat(request: ChatRequest):
             answer=result['answer'],
             conversation_id=conversation_id,
             processing_time=round(processing_time, 2),
-            metadata={
-                "num_documents_found": result['num_documents'],
-                "num_documents_used": result['num_reranked'],
-                "queries_generated": len(result.get('queries_used', [])),
-            }
+            metadata=build_metadata(result, degraded)
         )
         
     except Exception as e:
+        logger.exception("Chat request failed")
         raise HTTPException(status_code=500, detail=f"Lỗi xử lý: {str(e)}")
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    rag_generator=Depends(require_generator),
+    degraded: FrozenSet[str] = Depends(degraded_stages)
+):
+    conversation_id = request.conversation_id or new_conversation_id()
+
+    async def event_stream():
+        try:
+            async for item in rag_generator.ask_stream(
+                query=request.message,
+                top_k=request.top_k,
+                use_query_expansion=request.use_query_expansion and "expansion" not in degraded,
+                rerank_top_n=request.rerank_top_n,
+                conversation_id=conversation_id,
+                use_rerank="rerank" not in degraded
+            ):
+                if item["event"] != "done":
+                    yield sse_event(item["event"], item["data"])
+                    continue
+
+                # time-to-first-token is tracked separately from total time
+                data = item["data"]
+                yield sse_event("done", {
+                    "conversation_id": conversation_id,
+                    "ttft": round(data["ttft_ms"] / 1000, 3),
+                    "processing_time": round(data["total_ms"] / 1000, 2),
+                    "metadata": build_metadata(data["result"], degraded)
+                })
+        except Exception as e:
+            logger.exception("Chat stream failed")
+            yield sse_event("error", {"detail": f"Lỗi xử lý: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def get_batch_runner(rag_generator) -> "BatchRunner":
+    # imported here: the API module must not pull in the model/LLM stack before startup loads it
+    from src.services.batch_runner import BatchRunner
+
+    global _batch_runner
+    if _batch_runner is None or _batch_runner.generator is not rag_generator:
+        _batch_runner = BatchRunner(rag_generator)
+    return _batch_runner
+
+@router.post("/chat/batch")
+async def chat_batch(
+    request: Request,
+    x_admin_token: Optional[str] = Header(default=None),
+    rag_generator=Depends(require_generator)
+):
+    # body: JSONL, one {"id", "question", ...options} per line; response: JSONL results as they finish.
+    # Results are not in input order; to resume, resend only the ids missing from the output.
+    if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Không có quyền truy cập")
+
+    from src.services.batch_runner import iter_jsonl_items
+
+    body = (await request.body()).decode("utf-8")
+    try:
+        items = list(iter_jsonl_items(body.splitlines()))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"JSONL không hợp lệ: {e}")
+    if not items:
+        raise HTTPException(status_code=400, detail="Không có câu hỏi nào")
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Tối đa {settings.BATCH_MAX_ITEMS} câu hỏi mỗi lần")
+
+    runner = get_batch_runner(rag_generator)
+
+    async def result_lines():
+        async for result in runner.run(items):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        result_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/search", response_model=List[DocumentResult])
-async def search(request: SearchRequest):
+async def search(
+    request: SearchRequest,
+    rag_generator=Depends(require_generator),
+    degraded: FrozenSet[str] = Depends(degraded_stages)
+):
     try:
-        documents = rag_generator.search_only(
+        documents = await rag_generator.search_only_async(
             query=request.query,
             top_k=request.top_k,
-            use_rerank=request.use_rerank,
-            rerank_top_n=request.rerank_top_n
+            use_rerank=request.use_rerank and "rerank" not in degraded,
+            rerank_top_n=request.rerank_top_n,
+            fields=SEARCH_FIELDS
         )
         
         return [
@@ -86,6 +229,7 @@ async def search(request: SearchRequest):
         ]
         
     except Exception as e:
+        logger.exception("Search request failed")
         raise HTTPException(status_code=500, detail=f"Lỗi search: {str(e)}")
 
 @router.get("/health")
@@ -97,22 +241,46 @@ async def health_check():
     }
 
 @router.get("/stats")
-async def get_stats():
+async def get_stats(rag_generator=Depends(require_generator)):
     try:
         # Test a simple query to check system status
-        test_result = rag_generator.search_only("test", top_k=1, use_rerank=False)
+        test_result = await rag_generator.search_only_async("test", top_k=1, use_rerank=False)
         
+        batcher = rag_generator.vector_search.batcher
+        answer_cache = rag_generator.answer_cache
+
         return {
             "status": "operational",
             "vector_search": "ok" if test_result is not None else "error",
             "services": {
                 "qdrant": "connected",
                 "gemini": "configured",
-                "cohere": "configured"
-            }
+                "reranker": rag_generator.reranker.backend.name
+            },
+            "embedding_batcher": batcher.stats.to_dict() if batcher else None,
+            "retrieval": rag_generator.vector_search.stats(),
+            "answer_cache": answer_cache.stats() if answer_cache else None,
+            "reranker": rag_generator.reranker.stats(),
+            "coalescing": rag_generator.coalescing_stats(),
+            "admission": admission.stats() if settings.ADMISSION_ENABLED else None,
+            "gemini_clients": rag_generator.llm.pool.stats(),
+            "conversations": rag_generator.conversations.stats() if rag_generator.conversations else None,
+            "startup": startup.report()
         }
     except Exception as e:
         return {
             "status": "degraded",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(
+    x_admin_token: Optional[str] = Header(default=None),
+    rag_generator=Depends(require_generator)
+):
+    if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Không có quyền truy cập")
+
+    # reloads the sparse index / local index snapshot: keep that off the event loop
+    await asyncio.to_thread(rag_generator.invalidate_cache)
+    return {"status": "invalidated"}
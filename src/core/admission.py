@@ -0,0 +1,186 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, FrozenSet, Optional
+
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.core.observability import ADMISSION_WAIT_SECONDS
+from src.core.rate_limit import TokenBucket
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Admission:
+    __slots__ = ("waited", "degraded")
+
+    def __init__(self, waited: float = 0.0, degraded: FrozenSet[str] = frozenset()):
+        self.waited = waited
+        # pipeline stages to skip for this request: "expansion", "rerank"
+        self.degraded = degraded
+
+
+class AdmissionController:
+    """Decides which requests enter the pipeline, and how much of it they get.
+
+    At most `max_active` requests run at once; later ones wait in a FIFO queue
+    of `max_queue` for up to `queue_timeout` seconds. With `rate_per_minute`
+    set, each client also has a token bucket (bursts of `burst`), so one
+    client can't use up the Gemini/Cohere keys shared by everyone. Requests
+    over a limit are rejected with a Retry-After estimate instead of piling up;
+    only requests that run or queue use a token.
+
+    Under load, requests that find the queue `degrade_expansion_depth` deep
+    skip query expansion (one Gemini call less), and from
+    `degrade_rerank_depth` they skip reranking too, keeping vector-score order.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float = None,
+        burst: int = None,
+        max_active: int = None,
+        max_queue: int = None,
+        queue_timeout: float = None,
+        degrade_expansion_depth: int = None,
+        degrade_rerank_depth: int = None,
+        max_clients: int = 10000
+    ):
+        self.rate_per_minute = settings.ADMISSION_RATE_PER_MINUTE if rate_per_minute is None else rate_per_minute
+        self.burst = burst or settings.ADMISSION_BURST
+        self.max_active = max_active or settings.ADMISSION_MAX_ACTIVE
+        self.max_queue = settings.ADMISSION_MAX_QUEUE if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout or settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+        self.degrade_expansion_depth = (
+            settings.ADMISSION_DEGRADE_EXPANSION_DEPTH if degrade_expansion_depth is None else degrade_expansion_depth
+        )
+        self.degrade_rerank_depth = (
+            settings.ADMISSION_DEGRADE_RERANK_DEPTH if degrade_rerank_depth is None else degrade_rerank_depth
+        )
+
+        # idle clients are dropped once their bucket would be full again anyway
+        refill_seconds = 60 * self.burst / self.rate_per_minute if self.rate_per_minute > 0 else 3600
+        self._buckets = TTLCache(max_entries=max_clients, ttl_seconds=max(60.0, refill_seconds))
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.active = 0
+        # moving average of how long an admitted request holds its slot, for Retry-After
+        self.service_seconds = 1.0
+
+        self.admitted = 0
+        self.queued = 0
+        self.admitted_from_queue = 0
+        self.wait_seconds = 0.0
+        self.rejected_rate_limited = 0
+        self.rejected_queue_full = 0
+        self.rejected_queue_timeout = 0
+        self.degraded_expansion = 0
+        self.degraded_rerank = 0
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.rate_per_minute / 60, capacity=self.burst)
+        # re-set on every use, so the TTL counts from the client's last request
+        self._buckets.set(client, bucket)
+        return bucket
+
+    def _queue_retry_after(self) -> int:
+        return max(1, math.ceil(self.service_seconds * (len(self._waiters) + 1) / self.max_active))
+
+    def _degrade(self, depth: int) -> FrozenSet[str]:
+        degraded = set()
+        if self.degrade_expansion_depth and depth >= self.degrade_expansion_depth:
+            degraded.add("expansion")
+        if self.degrade_rerank_depth and depth >= self.degrade_rerank_depth:
+            degraded.add("rerank")
+        return frozenset(degraded)
+
+    async def acquire(self, client: str) -> Admission:
+        # raises AdmissionRejected; otherwise the caller must release() when done
+        depth = len(self._waiters)
+        runs_now = self.active < self.max_active and not depth
+        if not runs_now and depth >= self.max_queue:
+            # checked before the client's bucket: turned away for our load, it keeps its token
+            self.rejected_queue_full += 1
+            raise AdmissionRejected("queue_full", self._queue_retry_after())
+
+        delay = self._bucket(client).try_acquire() if self.rate_per_minute > 0 else 0.0
+        if delay > 0:
+            self.rejected_rate_limited += 1
+            raise AdmissionRejected("rate_limited", max(1, math.ceil(min(delay, 3600))))
+
+        if runs_now:
+            self.active += 1
+            self.admitted += 1
+            return Admission()
+
+        degraded = self._degrade(depth)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected_queue_timeout += 1
+                raise AdmissionRejected("queue_timeout", self._queue_retry_after()) from None
+            raise
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.admitted_from_queue += 1
+        self.wait_seconds += waited
+        self.degraded_expansion += "expansion" in degraded
+        self.degraded_rerank += "rerank" in degraded
+        ADMISSION_WAIT_SECONDS.observe(waited)
+        return Admission(waited, degraded)
+
+    def _remove(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, held_seconds: Optional[float] = None):
+        if held_seconds is not None:
+            self.service_seconds = 0.9 * self.service_seconds + 0.1 * held_seconds
+        # hand the slot straight to the oldest waiter, so newcomers can't overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "max_active": self.max_active,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "avg_wait_ms": (
+                round(self.wait_seconds / self.admitted_from_queue * 1000, 1) if self.admitted_from_queue else 0.0
+            ),
+            "rejected_rate_limited": self.rejected_rate_limited,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_queue_timeout": self.rejected_queue_timeout,
+            "degraded_expansion": self.degraded_expansion,
+            "degraded_rerank": self.degraded_rerank,
+            "clients": len(self._buckets),
+            "service_ms": round(self.service_seconds * 1000, 1),
+        }
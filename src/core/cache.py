@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry TTL and an optional size budget.
+
+    `sizeof` estimates an entry's footprint in bytes; when given together with
+    `max_bytes`, least recently used entries are evicted until the total fits.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, expires_at: float, now: float) -> bool:
+        return bool(expires_at) and now >= expires_at
+
+    def _drop(self, key: Hashable):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, expires_at, _ = item
+            if self._expired(expires_at, time.monotonic()):
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        size = self.sizeof(value) if self.sizeof else 0
+
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            if self.max_bytes and size > self.max_bytes:
+                return
+
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+
+            while len(self._data) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key][0]
+            self._drop(key)
+            return value
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        # snapshot of live entries, oldest first; does not touch LRU order
+        now = time.monotonic()
+        with self._lock:
+            return iter([
+                (key, value)
+                for key, (value, expires_at, _) in self._data.items()
+                if not self._expired(expires_at, now)
+            ])
+
+    def dump(self, path: str, encode_key: Callable[[Hashable], str] = str):
+        # TTLs are stored as wall-clock expiry so they survive a restart
+        now, wall_now = time.monotonic(), time.time()
+        with self._lock:
+            rows = [
+                [encode_key(key), value, wall_now + (expires_at - now) if expires_at else 0.0]
+                for key, (value, expires_at, _) in self._data.items()
+                if not self._expired(expires_at, now)
+            ]
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str, decode_key: Callable[[str], Hashable] = str) -> int:
+        if not os.path.exists(path):
+            return 0
+
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+
+        loaded = 0
+        wall_now = time.time()
+        for key, value, wall_expires_at in rows:
+            if wall_expires_at and wall_expires_at <= wall_now:
+                continue
+            ttl = wall_expires_at - wall_now if wall_expires_at else 0
+            self.set(decode_key(key), value, ttl_seconds=ttl)
+            loaded += 1
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and not self._expired(item[1], time.monotonic())
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,324 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+KEY_REJECTED_STATUS = {401, 403}
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    # cohere ApiError has .status_code, google api_core errors have an int .code
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(exc, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class KeyState:
+    def __init__(self, key: str):
+        self.key = key
+        self.client = None
+        self.async_client = None
+
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.latency_ms = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.circuit_open_until = 0.0
+        # half-open: the one call testing whether the key has recovered
+        self.trial_in_flight = False
+        self.last_error: Optional[str] = None
+
+    def available_at(self) -> float:
+        if self.trial_in_flight:
+            return float("inf")
+        return max(self.cooldown_until, self.circuit_open_until)
+
+    def circuit_blocks(self, now: float) -> bool:
+        return self.trial_in_flight or self.circuit_open_until > now
+
+    def circuit_state(self, now: float) -> str:
+        if self.circuit_open_until > now:
+            return "open"
+        if self.circuit_open_until:
+            return "half-open"
+        return "closed"
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            "key": f"...{self.key[-4:]}" if len(self.key) > 4 else "***",
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "in_flight": self.in_flight,
+            "latency_ms": round(self.latency_ms, 1),
+            "cooldown_s": round(max(0.0, self.cooldown_until - now), 1),
+            "circuit": self.circuit_state(now),
+            "last_error": self.last_error,
+        }
+
+
+class ClientPool:
+    """One long-lived client per API key, with health-aware rotation.
+
+    Keys that return 429 cool down (for Retry-After when given), keys that keep
+    failing trip a per-key circuit breaker, and calls are retried on the next
+    healthy key. Once a circuit's reset time has passed, a single trial call
+    goes to the key; it closes the circuit or opens it again. With every
+    circuit open, calls fail with `CircuitOpenError` instead of being sent. `call_async` can also hedge: if the first attempt has not
+    finished after `hedge_delay_ms`, a second one starts on another key and the
+    first response wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keys: List[str],
+        client_factory: Callable[[str], Any],
+        async_client_factory: Optional[Callable[[str], Any]] = None,
+        max_attempts: int = 3,
+        cooldown_seconds: float = 30.0,
+        failure_threshold: int = 3,
+        circuit_reset_seconds: float = 60.0,
+        hedge_delay_ms: float = 0.0,
+        retry_backoff_seconds: float = 0.2
+    ):
+        self.name = name
+        self.states = [KeyState(key) for key in dict.fromkeys(keys)]
+        self.client_factory = client_factory
+        self.async_client_factory = async_client_factory or client_factory
+        self.max_attempts = max(1, max_attempts)
+        self.cooldown_seconds = cooldown_seconds
+        self.failure_threshold = failure_threshold
+        self.circuit_reset_seconds = circuit_reset_seconds
+        self.hedge_delay = hedge_delay_ms / 1000 if hedge_delay_ms else None
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self.retries = 0
+        self.hedges = 0
+
+    def _acquire(self, exclude: Set[str]) -> KeyState:
+        if not self.states:
+            raise ValueError(f"No API keys available for {self.name}")
+
+        now = time.monotonic()
+        with self._lock:
+            count = len(self.states)
+            candidates = [s for s in self.states if s.key not in exclude] or self.states
+
+            chosen = None
+            for offset in range(count):
+                state = self.states[(self._next + offset) % count]
+                if state in candidates and state.available_at() <= now:
+                    chosen = state
+                    self._next = (self._next + offset + 1) % count
+                    break
+
+            if chosen is None:
+                # everything is cooling down: use whichever key recovers first,
+                # but never one whose circuit is open or already has its trial call
+                usable = [s for s in candidates if not s.circuit_blocks(now)]
+                if not usable:
+                    raise CircuitOpenError(f"Every {self.name} key has an open circuit")
+                chosen = min(usable, key=lambda s: s.available_at())
+
+            if chosen.circuit_open_until:
+                chosen.trial_in_flight = True
+            chosen.in_flight += 1
+            chosen.requests += 1
+            return chosen
+
+    def _get_client(self, state: KeyState, use_async: bool):
+        if use_async:
+            if state.async_client is None:
+                state.async_client = self.async_client_factory(state.key)
+            return state.async_client
+        if state.client is None:
+            state.client = self.client_factory(state.key)
+        return state.client
+
+    def _record_success(self, state: KeyState, latency_ms: float):
+        with self._lock:
+            state.in_flight -= 1
+            state.consecutive_failures = 0
+            state.circuit_open_until = 0.0
+            state.trial_in_flight = False
+            state.latency_ms = latency_ms if not state.latency_ms else 0.8 * state.latency_ms + 0.2 * latency_ms
+
+    def _record_failure(self, state: KeyState, exc: BaseException) -> bool:
+        # returns True when the call is worth retrying on another key
+        code = status_code(exc)
+        now = time.monotonic()
+        with self._lock:
+            state.in_flight -= 1
+            # a trial that ends any other way than success leaves the circuit half-open
+            # (or re-opens it below); the next call is the new trial
+            state.trial_in_flight = False
+            if isinstance(exc, asyncio.CancelledError):
+                return False
+
+            state.errors += 1
+            state.last_error = f"{type(exc).__name__}: {str(exc)[:200]}"
+
+            if code == 429:
+                state.rate_limited += 1
+                state.cooldown_until = now + (retry_after(exc) or self.cooldown_seconds)
+                return True
+
+            if code in KEY_REJECTED_STATUS:
+                state.circuit_open_until = now + self.circuit_reset_seconds
+                return True
+
+            transient = code in RETRYABLE_STATUS or (
+                code is None and isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError))
+            ) or "Timeout" in type(exc).__name__ or "Connect" in type(exc).__name__
+            if not transient:
+                return False
+
+            state.consecutive_failures += 1
+            if state.consecutive_failures >= self.failure_threshold or state.circuit_open_until:
+                state.circuit_open_until = now + self.circuit_reset_seconds
+            return True
+
+    def call(self, fn: Callable[[Any], Any]) -> Any:
+        tried: Set[str] = set()
+        last_exc = None
+        for attempt in range(self.max_attempts):
+            try:
+                state = self._acquire(tried)
+            except CircuitOpenError:
+                # a retry with nowhere to go reports the real failure
+                if last_exc is not None:
+                    raise last_exc
+                raise
+            tried.add(state.key)
+            start = time.perf_counter()
+            try:
+                result = fn(self._get_client(state, use_async=False))
+            except Exception as e:
+                last_exc = e
+                if not self._record_failure(state, e) or attempt == self.max_attempts - 1:
+                    raise
+                self.retries += 1
+                time.sleep(self.retry_backoff_seconds * (attempt + 1))
+                continue
+            self._record_success(state, (time.perf_counter() - start) * 1000)
+            return result
+        raise last_exc
+
+    async def _attempt_async(self, state: KeyState, fn: Callable[[Any], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await fn(self._get_client(state, use_async=True))
+        except BaseException as e:
+            e._pool_retryable = self._record_failure(state, e)
+            raise
+        self._record_success(state, (time.perf_counter() - start) * 1000)
+        return result
+
+    async def call_async(self, fn: Callable[[Any], Awaitable[Any]], hedge: bool = True) -> Any:
+        tried: Set[str] = set()
+        pending: Set[asyncio.Task] = set()
+        attempts = 0
+        last_exc = None
+
+        def launch() -> bool:
+            # False when a hedge or retry finds every other key's circuit open
+            nonlocal attempts
+            try:
+                state = self._acquire(tried)
+            except CircuitOpenError:
+                if attempts:
+                    return False
+                raise
+            tried.add(state.key)
+            pending.add(asyncio.ensure_future(self._attempt_async(state, fn)))
+            attempts += 1
+            return True
+
+        launch()
+        try:
+            while pending:
+                can_hedge = (
+                    hedge and self.hedge_delay is not None
+                    and attempts < self.max_attempts and len(tried) < len(self.states)
+                )
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if launch():
+                        self.hedges += 1
+                    else:
+                        hedge = False
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    exc = task.exception()
+                    if exc is None:
+                        return task.result()
+                    last_exc = exc
+                    if not getattr(exc, "_pool_retryable", False):
+                        raise exc
+
+                if not pending and attempts < self.max_attempts:
+                    self.retries += 1
+                    await asyncio.sleep(self.retry_backoff_seconds * attempts)
+                    launch()
+
+            raise last_exc
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "keys": [state.to_dict(now) for state in self.states],
+            "retries": self.retries,
+            "hedges": self.hedges,
+        }
+
+
+def build_pool(
+    name: str,
+    keys: List[str],
+    client_factory: Callable[[str], Any],
+    async_client_factory: Optional[Callable[[str], Any]] = None,
+    hedge_delay_ms: float = 0.0
+) -> ClientPool:
+    from src.core.config import settings
+
+    return ClientPool(
+        name,
+        [key for key in keys if key],
+        client_factory,
+        async_client_factory,
+        max_attempts=settings.API_MAX_ATTEMPTS,
+        cooldown_seconds=settings.API_KEY_COOLDOWN_SECONDS,
+        failure_threshold=settings.API_CIRCUIT_FAILURE_THRESHOLD,
+        circuit_reset_seconds=settings.API_CIRCUIT_RESET_SECONDS,
+        hedge_delay_ms=hedge_delay_ms
+    )
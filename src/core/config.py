@@ -1,4 +1,5 @@
 import os
+import threading
 from dotenv import load_dotenv
 from typing import List
 
@@ -7,6 +8,12 @@ load_dotenv()
 class Settings:
     QDRANT_URL: str = os.getenv("QDRANT_URL", "").strip()
     QDRANT_API_KEY: str = os.getenv("QDRANT_API_KEY", "").strip()
+    # local on-disk Qdrant, used when QDRANT_URL is empty (in-memory if both are empty)
+    QDRANT_PATH: str = os.getenv("QDRANT_PATH", "").strip()
+    # memory-mapped local index (scripts/build_local_index.py), used instead of Qdrant when QDRANT_URL is empty
+    LOCAL_INDEX_PATH: str = os.getenv("LOCAL_INDEX_PATH", "").strip()
+    LOCAL_INDEX_NPROBE: int = int(os.getenv("LOCAL_INDEX_NPROBE", "32")) # IVF lists searched per query
+    LOCAL_INDEX_IVF_MIN_POINTS: int = int(os.getenv("LOCAL_INDEX_IVF_MIN_POINTS", "50000")) # exact search below
     COLLECTION_NAME: str = os.getenv("COLLECTION_NAME", "med_vn_rag")
     
     GEMINI_MODEL: str = os.getenv("LLM_MODEL", "gemini-2.0-flash")
@@ -14,28 +21,176 @@ class Settings:
     GEMINI_APIS_LIST: List[str] = os.getenv('APIS_GEMINI_LIST', '').split(',')
     
     RERANKER_MODEL: str = os.getenv("MODEL_RERANKER", "rerank-multilingual-v3.0")
+    # "cohere" (API) or "cross-encoder" (local, CPU)
+    RERANKER_BACKEND: str = os.getenv("RERANKER_BACKEND", "cohere").strip().lower()
+    CROSS_ENCODER_MODEL: str = os.getenv(
+        "CROSS_ENCODER_MODEL",
+        "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    )
+    CROSS_ENCODER_RUNTIME: str = os.getenv("CROSS_ENCODER_RUNTIME", "torch").strip().lower() # torch | onnx
+    CROSS_ENCODER_ONNX_FILE: str = os.getenv("CROSS_ENCODER_ONNX_FILE", "").strip()
+    CROSS_ENCODER_QUANTIZE: bool = os.getenv("CROSS_ENCODER_QUANTIZE", "false").strip().lower() == "true"
+    CROSS_ENCODER_MAX_LENGTH: int = int(os.getenv("CROSS_ENCODER_MAX_LENGTH", "256"))
+    CROSS_ENCODER_BATCH_SIZE: int = int(os.getenv("CROSS_ENCODER_BATCH_SIZE", "16"))
+    CROSS_ENCODER_WORKERS: int = int(os.getenv("CROSS_ENCODER_WORKERS", "1"))
+    RERANK_SCORE_CACHE_SIZE: int = int(os.getenv("RERANK_SCORE_CACHE_SIZE", "20000"))
+    RERANK_SCORE_CACHE_TTL_SECONDS: float = float(os.getenv("RERANK_SCORE_CACHE_TTL_SECONDS", "21600"))
     COHERE_API_KEYS: List[str] = os.getenv('APIS_COHERE_LIST', '').split(',')
     
     EMBEDDING_MODEL: str = os.getenv(
         "MODEL_EMBEDDING", 
         "Dqdung205/medical_vietnamese_embedding"
     )
+    # query embedding runtime: "torch" or "onnx" (CPU); see scripts/export_embedding.py
+    EMBEDDING_RUNTIME: str = os.getenv("EMBEDDING_RUNTIME", "torch").strip().lower()
+    # exported model directory for the onnx runtime; empty exports MODEL_EMBEDDING on load
+    EMBEDDING_ONNX_PATH: str = os.getenv("EMBEDDING_ONNX_PATH", "").strip()
+    EMBEDDING_ONNX_FILE: str = os.getenv("EMBEDDING_ONNX_FILE", "").strip() # e.g. onnx/model_qint8_avx512_vnni.onnx
+    EMBEDDING_QUANTIZE: bool = os.getenv("EMBEDDING_QUANTIZE", "false").strip().lower() == "true" # torch int8
+    EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", "0")) # 0: library default
+
+    # shared model server (scripts/model_server.py): when set, API workers load no model weights
+    MODEL_SERVER_SOCKET: str = os.getenv("MODEL_SERVER_SOCKET", "").strip()
+    MODEL_SERVER_TIMEOUT: float = float(os.getenv("MODEL_SERVER_TIMEOUT", "30"))
+    MODEL_SERVER_CONNECT_TIMEOUT: float = float(os.getenv("MODEL_SERVER_CONNECT_TIMEOUT", "120")) # startup only
     
     DEFAULT_TOP_K: int = 20
     DEFAULT_SCORE_THRESHOLD: float = 0.5
     RERANK_TOP_N: int = 5
 
+    # search hits per (query vector, top_k, threshold); cleared by /cache/invalidate
+    RETRIEVAL_CACHE_ENABLED: bool = os.getenv("RETRIEVAL_CACHE_ENABLED", "true").strip().lower() == "true"
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "5000"))
+    RETRIEVAL_CACHE_TTL_SECONDS: float = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+
+    # how results of expanded queries are merged: "rrf" or "max"
+    MULTI_QUERY_FUSION: str = os.getenv("MULTI_QUERY_FUSION", "rrf").strip().lower()
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+
+    # hybrid dense + BM25 retrieval
+    HYBRID_SEARCH: bool = os.getenv("HYBRID_SEARCH", "false").strip().lower() == "true"
+    SPARSE_INDEX_PATH: str = os.getenv("SPARSE_INDEX_PATH", "").strip()
+    HYBRID_FUSION: str = os.getenv("HYBRID_FUSION", "rrf").strip().lower() # rrf | linear
+    HYBRID_DENSE_WEIGHT: float = float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0"))
+    HYBRID_SPARSE_WEIGHT: float = float(os.getenv("HYBRID_SPARSE_WEIGHT", "1.0"))
+    # BM25 candidates per query; 0 means the same as top_k
+    HYBRID_SPARSE_TOP_K: int = int(os.getenv("HYBRID_SPARSE_TOP_K", "0"))
+
+    # prompt context: token budget, near-duplicate removal, merging, sentence extraction
+    CONTEXT_MAX_TOKENS: int = int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+    # Hugging Face tokenizer used for counting; empty reuses the embedding model's
+    CONTEXT_TOKENIZER: str = os.getenv("CONTEXT_TOKENIZER", "").strip()
+    CONTEXT_DEDUP_THRESHOLD: float = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+    CONTEXT_MERGE_ADJACENT: bool = os.getenv("CONTEXT_MERGE_ADJACENT", "true").strip().lower() == "true"
+    CONTEXT_SENTENCE_EXTRACTION: bool = os.getenv("CONTEXT_SENTENCE_EXTRACTION", "false").strip().lower() == "true"
+    CONTEXT_MAX_SENTENCES: int = int(os.getenv("CONTEXT_MAX_SENTENCES", "6"))
+
+    # concurrency limits for the async pipeline
+    MAX_CONCURRENT_REQUESTS: int = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+    EMBEDDING_WORKERS: int = int(os.getenv("EMBEDDING_WORKERS", "2"))
+    QDRANT_MAX_CONCURRENCY: int = int(os.getenv("QDRANT_MAX_CONCURRENCY", "16"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    RERANK_MAX_CONCURRENCY: int = int(os.getenv("RERANK_MAX_CONCURRENCY", "8"))
+    # streamed answer chunks read ahead of the client, so a slow reader doesn't hold an LLM slot
+    LLM_STREAM_BUFFER_CHUNKS: int = int(os.getenv("LLM_STREAM_BUFFER_CHUNKS", "256"))
+
+    # admission control in front of /chat, /chat/stream and /search
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").strip().lower() == "true"
+    # per client (IP, or a listed X-API-Key): sustained rate and burst; off (0) unless set.
+    # Behind a proxy, only with uvicorn --proxy-headers, or every user shares the proxy's bucket
+    ADMISSION_RATE_PER_MINUTE: float = float(os.getenv("ADMISSION_RATE_PER_MINUTE", "0"))
+    ADMISSION_BURST: int = int(os.getenv("ADMISSION_BURST", "5"))
+    ADMISSION_API_KEYS: List[str] = [
+        key.strip() for key in os.getenv("ADMISSION_API_KEYS", "").split(",") if key.strip()
+    ]
+    # requests in the pipeline at once; further ones wait in a bounded queue
+    ADMISSION_MAX_ACTIVE: int = int(os.getenv("ADMISSION_MAX_ACTIVE", os.getenv("MAX_CONCURRENT_REQUESTS", "32")))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+    # queue depth on arrival from which query expansion / reranking are skipped (0: never)
+    ADMISSION_DEGRADE_EXPANSION_DEPTH: int = int(os.getenv("ADMISSION_DEGRADE_EXPANSION_DEPTH", "8"))
+    ADMISSION_DEGRADE_RERANK_DEPTH: int = int(os.getenv("ADMISSION_DEGRADE_RERANK_DEPTH", "32"))
+
+    # micro-batching of concurrent query encodes
+    EMBEDDING_BATCHING: bool = os.getenv("EMBEDDING_BATCHING", "true").strip().lower() == "true"
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+    # answer cache in front of the full pipeline
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").strip().lower() == "true"
+    ANSWER_CACHE_SEMANTIC: bool = os.getenv("ANSWER_CACHE_SEMANTIC", "true").strip().lower() == "true"
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+    ANSWER_CACHE_MAX_MB: float = float(os.getenv("ANSWER_CACHE_MAX_MB", "64"))
+    ANSWER_CACHE_TTL_SECONDS: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "21600"))
+    ANSWER_CACHE_SIMILARITY: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+    # identical in-flight questions (and their expansion, search, rerank) share one computation
+    REQUEST_COALESCING: bool = os.getenv("REQUEST_COALESCING", "true").strip().lower() == "true"
+
+    # query expansion cache and adaptive skipping
+    EXPANSION_CACHE_MAX_ENTRIES: int = int(os.getenv("EXPANSION_CACHE_MAX_ENTRIES", "10000"))
+    EXPANSION_CACHE_TTL_SECONDS: float = float(os.getenv("EXPANSION_CACHE_TTL_SECONDS", "604800"))
+    EXPANSION_CACHE_PATH: str = os.getenv("EXPANSION_CACHE_PATH", "").strip()
+    EXPANSION_CACHE_SAVE_EVERY: int = int(os.getenv("EXPANSION_CACHE_SAVE_EVERY", "20"))
+    ADAPTIVE_EXPANSION: bool = os.getenv("ADAPTIVE_EXPANSION", "true").strip().lower() == "true"
+    ADAPTIVE_EXPANSION_MIN_HITS: int = int(os.getenv("ADAPTIVE_EXPANSION_MIN_HITS", "5"))
+    ADAPTIVE_EXPANSION_MIN_SCORE: float = float(os.getenv("ADAPTIVE_EXPANSION_MIN_SCORE", "0.75"))
+
+    # multi-turn conversation memory
+    CONVERSATION_ENABLED: bool = os.getenv("CONVERSATION_ENABLED", "true").strip().lower() == "true"
+    CONVERSATION_DB_PATH: str = os.getenv("CONVERSATION_DB_PATH", "").strip() # empty: memory only
+    CONVERSATION_MAX_ENTRIES: int = int(os.getenv("CONVERSATION_MAX_ENTRIES", "5000"))
+    CONVERSATION_TTL_SECONDS: float = float(os.getenv("CONVERSATION_TTL_SECONDS", "7200"))
+    CONVERSATION_MAX_TURNS: int = int(os.getenv("CONVERSATION_MAX_TURNS", "10"))
+    CONVERSATION_MAX_KB: int = int(os.getenv("CONVERSATION_MAX_KB", "64"))
+    CONVERSATION_MAX_DOCUMENTS: int = int(os.getenv("CONVERSATION_MAX_DOCUMENTS", "20"))
+    CONVERSATION_ANSWER_CHARS: int = int(os.getenv("CONVERSATION_ANSWER_CHARS", "600"))
+    CONVERSATION_HISTORY_TURNS: int = int(os.getenv("CONVERSATION_HISTORY_TURNS", "3"))
+    CONVERSATION_REWRITE: bool = os.getenv("CONVERSATION_REWRITE", "true").strip().lower() == "true"
+    # reuse the previous turn's documents when the rewritten query is this close to it
+    CONVERSATION_REUSE_SIMILARITY: float = float(os.getenv("CONVERSATION_REUSE_SIMILARITY", "0.8"))
+
+    # shared API client pools (Gemini, Cohere)
+    API_MAX_ATTEMPTS: int = int(os.getenv("API_MAX_ATTEMPTS", "3"))
+    API_KEY_COOLDOWN_SECONDS: float = float(os.getenv("API_KEY_COOLDOWN_SECONDS", "30"))
+    API_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("API_CIRCUIT_FAILURE_THRESHOLD", "3"))
+    API_CIRCUIT_RESET_SECONDS: float = float(os.getenv("API_CIRCUIT_RESET_SECONDS", "60"))
+    # 0 disables hedging; answers are not hedged by default since they cost tokens
+    GEMINI_HEDGE_DELAY_MS: float = float(os.getenv("GEMINI_HEDGE_DELAY_MS", "0"))
+    COHERE_HEDGE_DELAY_MS: float = float(os.getenv("COHERE_HEDGE_DELAY_MS", "1500"))
+
+    # bulk jobs (/chat/batch, scripts/batch_answer.py): Gemini quota per key and chunking
+    GEMINI_RPM_PER_KEY: float = float(os.getenv("GEMINI_RPM_PER_KEY", "60"))
+    BATCH_CHUNK_SIZE: int = int(os.getenv("BATCH_CHUNK_SIZE", "64"))
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "").strip()
+
+    # startup: local model cache (e.g. baked into the image) and warm-up
+    MODEL_CACHE_DIR: str = os.getenv("MODEL_CACHE_DIR", "").strip()
+    MODELS_OFFLINE: bool = os.getenv("MODELS_OFFLINE", "false").strip().lower() == "true"
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").strip().lower() == "true"
+
+    # observability: structured logs, /metrics and optional OpenTelemetry spans
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json").strip().lower() # json | text
+    # share of requests whose info logs are kept; warnings and errors are always logged
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").strip().lower() == "true"
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").strip().lower() == "true"
+
 class APIKeyManager:
     def __init__(self, api_keys: List[str]):
         self.api_keys = [key.strip() for key in api_keys if key.strip()]
         self.current_index = 0
+        self._lock = threading.Lock()
         
     def get_next_key(self) -> str:
         if not self.api_keys:
             raise ValueError("No API keys available")
         
-        key = self.api_keys[self.current_index]
-        self.current_index = (self.current_index + 1) % len(self.api_keys)
+        with self._lock:
+            key = self.api_keys[self.current_index]
+            self.current_index = (self.current_index + 1) % len(self.api_keys)
         return key
     
     def get_all_keys(self) -> List[str]:
@@ -0,0 +1,310 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from src.core.config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in seconds, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> ([count per bucket], sum, count)
+        self._series: Dict[Tuple, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._series[key] = (counts, total + value, count + 1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_label_str(self.label_names, key, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_str(self.label_names, key, inf)} {count}")
+            lines.append(f"{self.name}_sum{_label_str(self.label_names, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_label_str(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        # callables returning extra exposition lines, e.g. gauges read from service stats
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[str]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                get_logger("metrics").warning(f"Metrics collector failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+def stats_to_gauges(prefix: str, stats: Dict) -> List[str]:
+    # exposes the numeric fields of a service's stats() dict, e.g. answer cache hits
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = f"{prefix}_{key}"
+            lines += [f"# TYPE {name} gauge", f"{name} {value:g}"]
+    return lines
+
+
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.histogram(
+    "vimedbot_stage_duration_seconds", "Time spent in each pipeline stage", ("stage",)
+)
+TTFT_SECONDS = metrics.histogram(
+    "vimedbot_time_to_first_token_seconds", "Time from request start to the first streamed answer token"
+)
+REQUEST_SECONDS = metrics.histogram(
+    "vimedbot_http_request_duration_seconds", "HTTP request latency until response headers", ("method", "handler")
+)
+REQUESTS_TOTAL = metrics.counter(
+    "vimedbot_http_requests_total", "HTTP requests by handler and status", ("method", "handler", "status")
+)
+ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "vimedbot_admission_wait_seconds", "Time admitted requests spent in the admission queue"
+)
+
+
+class Trace:
+    """Per-request stage timings; also decides whether the request's info logs are kept."""
+
+    def __init__(self, name: str, sampled: bool):
+        self.name = name
+        self.sampled = sampled
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.timings: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    def add(self, stage: str, ms: float):
+        # stages that run more than once (e.g. embed) accumulate
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + ms, 1)
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_tracer = None
+
+
+def _otel_span(name: str, attributes: Optional[Dict] = None):
+    # OpenTelemetry is optional: spans are only emitted when TRACING_ENABLED and the SDK is installed
+    global _tracer
+    if not settings.TRACING_ENABLED:
+        return nullcontext()
+    if _tracer is None:
+        try:
+            from opentelemetry import trace as otel_trace
+            _tracer = otel_trace.get_tracer("vimedbot")
+        except ImportError:
+            get_logger("tracing").warning("TRACING_ENABLED is set but opentelemetry is not installed")
+            _tracer = False
+    if not _tracer:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes or None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str) -> Iterator[Trace]:
+    trace = Trace(name, sampled=random.random() < settings.LOG_SAMPLE_RATE)
+    token = _current_trace.set(trace)
+    try:
+        with _otel_span(name, {"trace_id": trace.trace_id}):
+            yield trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # an abandoned stream can be closed (and this run) from another context
+            pass
+
+
+def record_stage(stage: str, seconds: float):
+    # time-to-first-token is a point in time, not a stage, so it gets its own histogram
+    if stage == "ttft":
+        TTFT_SECONDS.observe(seconds)
+    else:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds * 1000)
+
+
+class span:
+    """Times one pipeline stage; works with both `with` and `async with`."""
+
+    def __init__(self, stage: str, **attributes):
+        self.stage = stage
+        self.attributes = attributes
+
+    def __enter__(self):
+        self._otel = _otel_span(self.stage, self.attributes)
+        self._otel.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_stage(self.stage, time.perf_counter() - self._start)
+        return self._otel.__exit__(*exc_info)
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        return self.__exit__(*exc_info)
+
+
+class _SamplingFilter(logging.Filter):
+    # runs on the calling thread, where the request's trace is visible
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = _current_trace.get()
+        if trace is not None:
+            record.trace_id = trace.trace_id
+        if record.levelno >= logging.WARNING or trace is None:
+            return True
+        return trace.sampled
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            data["trace_id"] = record.trace_id
+        data.update(getattr(record, "fields", None) or {})
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging():
+    """Route `vimedbot.*` loggers through a queue so request threads never block on stdout."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(_JsonFormatter() if settings.LOG_FORMAT == "json" else _TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(_SamplingFilter())
+
+    logger = logging.getLogger("vimedbot")
+    logger.handlers = [queue_handler]
+    logger.setLevel(settings.LOG_LEVEL)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"vimedbot.{name}")
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    logger.log(level, event, extra={"fields": fields})
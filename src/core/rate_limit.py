@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate: float, capacity: Optional[float] = None):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            if capacity is not None:
+                self.capacity = capacity
+                self._tokens = min(self._tokens, capacity)
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        # 0.0 when the tokens were taken, otherwise the seconds until they would be there
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return (tokens - self._tokens) / self.rate
+
+
+class KeyRateScheduler:
+    """Paces calls through a `ClientPool` to the combined rate limit of its keys.
+
+    Each key may make `requests_per_minute` calls; the budget follows the keys
+    that are currently usable, so a key cooling down after a 429 (or with an
+    open circuit) stops counting until it recovers. The pool still picks the
+    key per call, this only decides when the next call may start, which keeps
+    bulk jobs under the quota instead of running into 429s.
+    """
+
+    def __init__(self, pool, requests_per_minute: float):
+        self.pool = pool
+        self.requests_per_minute = requests_per_minute
+        keys = max(1, len(pool.states))
+        self.bucket = TokenBucket(keys * requests_per_minute / 60, capacity=keys)
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _usable_keys(self, now: float) -> int:
+        return sum(1 for state in self.pool.states if state.available_at() <= now)
+
+    async def wait(self):
+        start = time.monotonic()
+        while True:
+            now = time.monotonic()
+            usable = self._usable_keys(now)
+            if not usable:
+                # every key is rate limited or broken: sleep until the first one is back
+                # (a key with a half-open trial in flight has no known recovery time)
+                recovers_at = min((state.available_at() for state in self.pool.states), default=now)
+                await asyncio.sleep(min(max(0.05, recovers_at - now), 1.0))
+                continue
+
+            self.bucket.set_rate(usable * self.requests_per_minute / 60, capacity=usable)
+            delay = self.bucket.try_acquire()
+            if delay <= 0:
+                break
+            await asyncio.sleep(min(delay, 1.0))
+
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            self.waits += 1
+            self.wait_seconds += waited
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "keys": len(self.pool.states),
+            "usable_keys": self._usable_keys(now),
+            "requests_per_minute_per_key": self.requests_per_minute,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 2),
+        }
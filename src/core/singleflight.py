@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    __slots__ = ("task", "callers", "waiting")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.callers = 1
+        self.waiting = 0
+
+
+class SingleFlight:
+    """Shares one in-flight computation between concurrent callers with the same key.
+
+    The computation runs in its own task (in the first caller's context, so
+    its stage timings land in that request's trace). Callers only wait on it:
+    one that is cancelled, e.g. by a client disconnect, stops waiting without
+    affecting the others, and the task is cancelled only once nobody is
+    waiting. An exception reaches every caller of that flight but is not kept:
+    the next call with the key starts afresh. Nothing is cached here either,
+    a finished flight is forgotten at once.
+
+    Callers of a shared flight each get `copy(result)`, since they usually
+    go on to modify what they receive.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights: Dict[Hashable, _Flight] = {}
+
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.abandoned = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finished(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        self._forget(key, flight)
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        copy: Optional[Callable[[Any], Any]] = None
+    ) -> Any:
+        if not self.enabled:
+            return await fn()
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finished(key, flight, task))
+            self.calls += 1
+        else:
+            flight.callers += 1
+            self.coalesced += 1
+
+        flight.waiting += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiting -= 1
+            if not flight.waiting and not flight.task.done():
+                # every caller gave up: stop the work, and don't let a new caller join a dying flight
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+
+        if copy is not None and flight.callers > 1:
+            return copy(result)
+        return result
+
+    def stats(self) -> Dict:
+        requests = self.calls + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / requests, 4) if requests else 0.0,
+            "errors": self.errors,
+            "abandoned": self.abandoned,
+        }
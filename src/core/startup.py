@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+from src.core.config import settings
+from src.core.observability import get_logger, log_event
+
+logger = get_logger("startup")
+
+
+def configure_model_cache():
+    # must run before transformers / sentence_transformers are imported
+    if settings.MODEL_CACHE_DIR:
+        os.environ.setdefault("HF_HUB_CACHE", settings.MODEL_CACHE_DIR)
+        os.environ.setdefault("SENTENCE_TRANSFORMERS_HOME", settings.MODEL_CACHE_DIR)
+    if settings.MODELS_OFFLINE:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+
+class StartupState:
+    """Builds the RAG pipeline once, off the request path, and records how long it took.
+
+    `load()` is safe to call from several threads; the first caller does the
+    work and the others wait for it. The API only serves pipeline routes once
+    `ready` is set, so uvicorn can bind and answer liveness checks right away.
+    """
+
+    def __init__(self):
+        self.generator = None
+        self.ready = False
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _record(self, name: str, start: float) -> float:
+        now = time.perf_counter()
+        self.timings[name] = round((now - start) * 1000, 1)
+        return now
+
+    def load(self):
+        with self._lock:
+            if self.generator is not None:
+                return self.generator
+
+            self.error = None
+            self._started_at = self._started_at or time.perf_counter()
+            try:
+                configure_model_cache()
+
+                start = time.perf_counter()
+                # torch, sentence_transformers and the API SDKs come in with this import
+                from src.services.generator import MedicalRAGGenerator
+                start = self._record("import_ms", start)
+
+                generator = MedicalRAGGenerator()
+                start = self._record("model_load_ms", start)
+
+                if settings.WARMUP_ON_STARTUP:
+                    generator.warm_up()
+                    self._record("first_inference_ms", start)
+
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                logger.error(f"Startup failed: {self.error}")
+                raise
+
+            self.generator = generator
+            self.ready = True
+            self._record("time_to_ready_ms", self._started_at)
+            log_event(logger, "startup_ready", **self.timings)
+            return generator
+
+    def report(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "timings": dict(self.timings),
+            "model_cache_dir": settings.MODEL_CACHE_DIR or None,
+            "offline": settings.MODELS_OFFLINE,
+        }
+
+
+startup = StartupState()
+
+
+def get_generator():
+    # for scripts and benchmarks; the API uses `startup.generator` once ready
+    return startup.load()
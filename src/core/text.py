@@ -0,0 +1,53 @@
+import re
+import unicodedata
+from typing import List
+
+# start of the answer given when the LLM call fails; such answers are not cached or remembered
+ANSWER_ERROR_PREFIX = "Xin lỗi, có lỗi xảy ra khi tạo câu trả lời"
+
+# old-style ("hòa", "khỏe", "thủy") vs new-style ("hoà", "khoẻ", "thuỷ") tone
+# placement; both spellings are common, so map them to one form
+_TONE_PLACEMENT = {
+    "òa": "oà", "óa": "oá", "ỏa": "oả", "õa": "oã", "ọa": "oạ",
+    "òe": "oè", "óe": "oé", "ỏe": "oẻ", "õe": "oẽ", "ọe": "oẹ",
+    "ùy": "uỳ", "úy": "uý", "ủy": "uỷ", "ũy": "uỹ", "ụy": "uỵ",
+}
+_TONE_PATTERN = re.compile(
+    "(" + "|".join(_TONE_PLACEMENT) + r")(?![a-zà-ỹđ])"
+)
+_PUNCTUATION = re.compile(r"[^\w\s-]|_")
+_WHITESPACE = re.compile(r"\s+")
+# syllables, plus codes such as "E11.9", "J45-0" or "covid-19" kept whole
+_TOKEN = re.compile(r"[^\W_]+(?:[.\-][^\W_]+)*")
+
+
+def normalize_spelling(text: str) -> str:
+    text = unicodedata.normalize("NFC", text or "").lower()
+    return _TONE_PATTERN.sub(lambda m: _TONE_PLACEMENT[m.group(1)], text)
+
+
+def normalize_query(text: str) -> str:
+    text = normalize_spelling(text)
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip(" -")
+
+
+def strip_diacritics(text: str) -> str:
+    text = unicodedata.normalize("NFD", text).replace("đ", "d").replace("Đ", "D")
+    return unicodedata.normalize("NFC", "".join(c for c in text if not unicodedata.combining(c)))
+
+
+def tokenize(text: str) -> List[str]:
+    """Sparse-retrieval terms for Vietnamese text.
+
+    Vietnamese words are mostly one to three syllables separated by spaces, so
+    syllables and adjacent-syllable bigrams ("tiểu_đường") stand in for word
+    segmentation. Every term is also emitted without diacritics, which lets
+    queries typed without accents match and gives exact spellings a higher score.
+    """
+    syllables = _TOKEN.findall(normalize_spelling(text))
+    terms = syllables + [f"{a}_{b}" for a, b in zip(syllables, syllables[1:])]
+    # parts of codes too, so "E11" still matches "E11.9"
+    terms += [part for token in syllables if "." in token or "-" in token for part in re.split(r"[.\-]", token)]
+    plain = [strip_diacritics(term) for term in terms]
+    return terms + [term for term, original in zip(plain, terms) if term != original]
@@ -0,0 +1,166 @@
+import json
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.core.text import normalize_query
+
+CacheKey = Tuple[str, Tuple]
+
+
+def _entry_size(entry: Dict) -> int:
+    size = len(json.dumps(entry["result"], ensure_ascii=False, default=str).encode("utf-8"))
+    if entry["vector"] is not None:
+        size += entry["vector"].nbytes
+    return size
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = None,
+        ttl_seconds: float = None,
+        max_mb: float = None,
+        similarity_threshold: float = None,
+        semantic: bool = None
+    ):
+        self.entries = TTLCache(
+            max_entries=max_entries or settings.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=ttl_seconds or settings.ANSWER_CACHE_TTL_SECONDS,
+            max_bytes=int((max_mb or settings.ANSWER_CACHE_MAX_MB) * 1024 * 1024),
+            sizeof=_entry_size
+        )
+        self.similarity_threshold = similarity_threshold or settings.ANSWER_CACHE_SIMILARITY
+        self.semantic_enabled = settings.ANSWER_CACHE_SEMANTIC if semantic is None else semantic
+
+        # one row per cached question vector, updated in place on writes; rows of
+        # entries the LRU dropped are reclaimed when found, or by compaction
+        self._matrix: Optional[np.ndarray] = None
+        self._row_keys: List[Optional[CacheKey]] = []
+        self._rows: Dict[CacheKey, int] = {}
+        self._free_rows: List[int] = []
+        self._matrix_lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def make_key(self, query: str, **params) -> CacheKey:
+        return normalize_query(query), tuple(sorted(params.items()))
+
+    def get_exact(self, key: CacheKey) -> Optional[Dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        self.exact_hits += 1
+        return dict(entry["result"], cache="exact")
+
+    def _free_row(self, key: CacheKey):
+        row = self._rows.pop(key, None)
+        if row is not None:
+            # a zero row scores 0, below any useful threshold
+            self._matrix[row] = 0.0
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+
+    def _compact(self):
+        # rebuild from live entries once dropped rows outnumber them
+        live = [(key, entry["vector"]) for key, entry in self.entries.items() if entry["vector"] is not None]
+        self._matrix = np.stack([vector for _, vector in live]) if live else None
+        self._row_keys = [key for key, _ in live]
+        self._rows = {key: row for row, key in enumerate(self._row_keys)}
+        self._free_rows = []
+
+    def _put_row(self, key: CacheKey, vector: np.ndarray):
+        if self._matrix is None or self._matrix.shape[1] != len(vector):
+            self._matrix = np.zeros((0, len(vector)), dtype=np.float32)
+            self._row_keys, self._rows, self._free_rows = [], {}, []
+
+        row = self._rows.get(key)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = len(self._row_keys)
+                if row == len(self._matrix):
+                    # amortized growth: double the capacity, unused rows stay zero
+                    grown = np.zeros((max(64, 2 * len(self._matrix)), self._matrix.shape[1]), dtype=np.float32)
+                    grown[:row] = self._matrix
+                    self._matrix = grown
+                self._row_keys.append(None)
+            self._rows[key] = row
+        self._matrix[row] = vector
+        self._row_keys[row] = key
+
+        if len(self._rows) > 2 * len(self.entries) + 64:
+            self._compact()
+
+    def get_semantic(self, key: CacheKey, query_vector: List[float]) -> Optional[Dict]:
+        with self._matrix_lock:
+            if not self._rows:
+                return None
+            # vectors are L2-normalized, so the dot product is the cosine similarity
+            similarities = self._matrix[:len(self._row_keys)] @ np.asarray(query_vector, dtype=np.float32)
+            keys = list(self._row_keys)
+
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.similarity_threshold:
+                break
+            candidate = keys[index]
+            if candidate is None or candidate[1] != key[1]:
+                continue
+            entry = self.entries.get(candidate)
+            if entry is None:
+                # evicted or expired from the LRU since it was written
+                with self._matrix_lock:
+                    if self._rows.get(candidate) == index:
+                        self._free_row(candidate)
+                continue
+
+            self.semantic_hits += 1
+            return dict(
+                entry["result"],
+                cache="semantic",
+                cache_similarity=round(float(similarities[index]), 4)
+            )
+
+        return None
+
+    def record_miss(self):
+        self.misses += 1
+
+    def set(self, key: CacheKey, result: Dict, query_vector: Optional[List[float]] = None):
+        # the full candidate list, per-request timings and conversation state don't belong in the cache
+        stored = {k: v for k, v in result.items() if k not in ("all_documents", "expansion", "conversation", "timings")}
+        vector = np.asarray(query_vector, dtype=np.float32) if query_vector is not None else None
+        self.entries.set(key, {"result": stored, "vector": vector})
+        with self._matrix_lock:
+            if vector is None:
+                self._free_row(key)
+            else:
+                self._put_row(key, vector)
+
+    def invalidate(self):
+        self.entries.clear()
+        with self._matrix_lock:
+            self._matrix = None
+            self._row_keys, self._rows, self._free_rows = [], {}, []
+        self.invalidations += 1
+
+    def stats(self) -> Dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        entry_stats = self.entries.stats()
+        return {
+            "entries": entry_stats["entries"],
+            "bytes": entry_stats["bytes"],
+            "evictions": entry_stats["evictions"],
+            "expirations": entry_stats["expirations"],
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set
+from src.core.config import settings
+from src.core.observability import get_logger, log_event
+from src.core.rate_limit import KeyRateScheduler
+from src.core.text import ANSWER_ERROR_PREFIX
+
+logger = get_logger("batch")
+
+QUESTION_FIELDS = ("question", "message", "query")
+ID_FIELDS = ("id", "request_id")
+# per-item options and their bounds, as for a single /chat request
+OPTION_FIELDS = {
+    "top_k": (int, 1, 50),
+    "rerank_top_n": (int, 1, 20),
+    "score_threshold": (float, 0.0, 1.0),
+    "use_query_expansion": (bool, None, None),
+}
+
+
+def parse_item(raw: Dict, index: int) -> Dict:
+    """Normalise one input record to {"id", "question", options...}.
+
+    The question may be under "question", "message" or "query"; records without
+    an "id" (or "request_id") get their line number, which is what resuming
+    matches on, so give ids when the input file can change between runs.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("expected a JSON object")
+    question = next((raw[f] for f in QUESTION_FIELDS if isinstance(raw.get(f), str) and raw[f].strip()), None)
+    if question is None:
+        raise ValueError(f"missing question (one of {', '.join(QUESTION_FIELDS)})")
+
+    item_id = next((raw[f] for f in ID_FIELDS if raw.get(f) not in (None, "")), index)
+    item = {"id": str(item_id), "question": question.strip()}
+    for name, (kind, low, high) in OPTION_FIELDS.items():
+        value = raw.get(name)
+        if value is None:
+            continue
+        if kind is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"{name} must be true or false")
+        else:
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+                raise ValueError(f"{name} must be a number between {low} and {high}")
+            value = kind(value)
+        item[name] = value
+    if len(item["question"]) > 1000:
+        raise ValueError("question is longer than 1000 characters")
+    return item
+
+
+def iter_jsonl_items(lines: Iterable[str]) -> Iterator[Dict]:
+    # blank lines are skipped but still counted, so default ids are line numbers
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield parse_item(json.loads(line), number)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from e
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already answered in a previous run's output (errors are retried)."""
+    done = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by the crash we are resuming from
+                if record.get("status") != "error":
+                    done.add(str(record.get("id")))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _chunks(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BatchRunner:
+    """Answers many questions through the RAG pipeline as a bulk job.
+
+    Questions are taken `chunk_size` at a time: query expansions for the chunk
+    run first, then every query of the chunk is embedded in one call and
+    searched in batched Qdrant requests. Reranking and generation run per
+    question as tasks (bounded by the reranker and LLM semaphores), with Gemini
+    calls paced by a `KeyRateScheduler` over all configured keys. The next
+    chunk is retrieved while the previous one is still generating.
+
+    Results are yielded as they finish, not in input order; each carries the
+    item's id and a status ("ok", "empty" or "error"). A failing question only
+    fails its own record. Answers go into the answer cache like live requests,
+    so pre-generated FAQs are served from it afterwards.
+    """
+
+    def __init__(
+        self,
+        generator,
+        chunk_size: int = None,
+        requests_per_minute: float = None,
+        scheduler: Optional[KeyRateScheduler] = None
+    ):
+        self.generator = generator
+        self.chunk_size = max(1, chunk_size or settings.BATCH_CHUNK_SIZE)
+        self.scheduler = scheduler or KeyRateScheduler(
+            generator.llm.pool, requests_per_minute or settings.GEMINI_RPM_PER_KEY
+        )
+        self.defaults = {
+            "top_k": 12,
+            "rerank_top_n": 5,
+            "use_query_expansion": True,
+            "score_threshold": settings.DEFAULT_SCORE_THRESHOLD,
+        }
+
+    def _options(self, item: Dict) -> Dict:
+        return {name: item.get(name, default) for name, default in self.defaults.items()}
+
+    def _error(self, item: Dict, exc: BaseException) -> Dict:
+        return {
+            "id": item["id"],
+            "question": item["question"],
+            "status": "error",
+            "error": f"{type(exc).__name__}: {exc}",
+        }
+
+    def _output(self, item: Dict, result: Dict) -> Dict:
+        answer = result["answer"]
+        if answer.startswith(ANSWER_ERROR_PREFIX):
+            status = "error"
+        else:
+            status = "ok" if result["documents"] else "empty"
+        return {
+            "id": item["id"],
+            "question": item["question"],
+            "status": status,
+            "answer": answer,
+            "cache": result.get("cache", "miss"),
+            "queries_used": result.get("queries_used", [item["question"]]),
+            "num_documents": result["num_documents"],
+            "num_reranked": result["num_reranked"],
+            "sources": [
+                {
+                    "id": doc.get("id"),
+                    "title": doc.get("title"),
+                    "header": doc.get("header"),
+                    "article_id": doc.get("article_id"),
+                    "paragraph_id": doc.get("paragraph_id"),
+                    "score": doc.get("original_score", doc.get("score")),
+                    "rerank_score": doc.get("rerank_score"),
+                }
+                for doc in result["documents"]
+            ],
+            "tokens": result.get("tokens"),
+        }
+
+    async def _expand(self, item: Dict) -> List[str]:
+        question = item["question"]
+        if not item["options"]["use_query_expansion"]:
+            return [question]
+        llm = self.generator.llm
+        cached = llm.cached_similar_queries(question, num_queries=3)
+        if cached is not None:
+            return cached
+        await self.scheduler.wait()
+        return await llm.generate_similar_queries_async(question, num_queries=3)
+
+    async def _retrieve(self, chunk: List[Dict]) -> List[Dict]:
+        # fills item["queries"], ["vector"], ["documents"] or ["cached"] for the whole chunk at once
+        generator = self.generator
+        cache = generator.answer_cache
+        for item in chunk:
+            item["options"] = self._options(item)
+            item["cache_key"] = generator._cache_key(item["question"], **item["options"])
+            if item["cache_key"] is not None:
+                item["cached"] = cache.get_exact(item["cache_key"])
+
+        todo = [item for item in chunk if item.get("cached") is None]
+        expansions = await asyncio.gather(*[self._expand(item) for item in todo])
+
+        queries = []
+        for item, item_queries in zip(todo, expansions):
+            # the question itself always comes first: its vector is the cache's
+            item["queries"] = [item["question"]] + [q for q in item_queries if q != item["question"]]
+            queries += item["queries"]
+        vectors = await generator.vector_search.encode_queries_async(queries) if queries else []
+
+        offset = 0
+        for item in todo:
+            item["vectors"] = vectors[offset:offset + len(item["queries"])]
+            offset += len(item["queries"])
+            item["vector"] = item["vectors"][0]
+            if item["cache_key"] is not None and cache.semantic_enabled:
+                item["cached"] = cache.get_semantic(item["cache_key"], item["vector"])
+            if item.get("cached") is None and item["cache_key"] is not None:
+                cache.record_miss()
+
+        # one batched search per distinct (top_k, threshold) in the chunk
+        groups: Dict[tuple, List[Dict]] = {}
+        for item in todo:
+            if item.get("cached") is None:
+                options = item["options"]
+                groups.setdefault((options["top_k"], options["score_threshold"]), []).append(item)
+        for (top_k, score_threshold), items in groups.items():
+            results = await generator.vector_search.search_vectors_async(
+                [q for item in items for q in item["queries"]],
+                [v for item in items for v in item["vectors"]],
+                top_k,
+                score_threshold
+            )
+            offset = 0
+            for item in items:
+                per_query = results[offset:offset + len(item["queries"])]
+                offset += len(item["queries"])
+                item["documents"] = (
+                    generator.vector_search.merge_results(per_query) if len(per_query) > 1 else per_query[0]
+                )
+        return chunk
+
+    async def _answer(self, item: Dict) -> Dict:
+        generator = self.generator
+        try:
+            if item.get("cached") is not None:
+                return self._output(item, item["cached"])
+
+            query, documents, options = item["question"], item["documents"], item["options"]
+            if not documents:
+                return self._output(item, dict(generator._empty_result(query), queries_used=item["queries"]))
+
+            reranked = await generator.reranker.rerank_with_fallback_async(
+                query, documents, top_n=options["rerank_top_n"]
+            )
+            context, context_stats = generator.build_context(query, reranked)
+
+            usage = {}
+            await self.scheduler.wait()
+            answer = await generator.llm.generate_answer_async(query, context, usage=usage)
+
+            result = {
+                "query": query,
+                "answer": answer,
+                "documents": reranked,
+                "all_documents": documents,
+                "context": context,
+                "num_documents": len(documents),
+                "num_reranked": len(reranked),
+                "queries_used": item["queries"],
+                "tokens": dict(usage, **context_stats)
+            }
+            generator._cache_store(item["cache_key"], result, item["vector"])
+            return self._output(item, result)
+        except Exception as e:
+            logger.warning(f"Batch item {item['id']} failed: {e}")
+            return self._error(item, e)
+
+    async def run(self, items: Iterable[Dict]) -> AsyncIterator[Dict]:
+        start = time.perf_counter()
+        counts = {"ok": 0, "empty": 0, "error": 0}
+        pending: Set[asyncio.Task] = set()
+
+        async def drain(limit: int) -> AsyncIterator[Dict]:
+            nonlocal pending
+            while len(pending) > limit:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+
+        try:
+            for chunk in _chunks(items, self.chunk_size):
+                try:
+                    await self._retrieve(chunk)
+                    answers = [self._answer(item) for item in chunk]
+                except Exception as e:
+                    logger.warning(f"Batch retrieval failed for {len(chunk)} items: {e}")
+                    answers = [asyncio.sleep(0, result=self._error(item, e)) for item in chunk]
+                pending.update(asyncio.ensure_future(answer) for answer in answers)
+
+                # at most one chunk generating while the next one is retrieved
+                async for output in drain(self.chunk_size):
+                    counts[output["status"]] += 1
+                    yield output
+
+            async for output in drain(0):
+                counts[output["status"]] += 1
+                yield output
+        finally:
+            for task in pending:
+                task.cancel()
+            log_event(
+                logger, "batch_completed",
+                items=sum(counts.values()),
+                elapsed_s=round(time.perf_counter() - start, 2),
+                scheduler=self.scheduler.stats(),
+                **counts
+            )
@@ -0,0 +1,179 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from src.core.config import settings
+from src.core.text import normalize_query, tokenize
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
+NO_CONTEXT = "Không tìm thấy thông tin liên quan."
+
+
+def _paragraph_number(doc: Dict) -> Optional[int]:
+    try:
+        return int(doc.get('paragraph_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = normalize_query(text).split()
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def hf_token_counter(tokenizer) -> Callable[[str], int]:
+    # verbose=False: long passages exceed the tokenizer's model max length, which is fine for counting
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False, verbose=False))
+
+
+class ContextBuilder:
+    """Turns reranked chunks into the prompt context, within a token budget.
+
+    Chunks keep their rerank order. Near-duplicates within an article are
+    dropped, neighbouring paragraphs of the same article are merged into one
+    passage, and (optionally) each passage is cut down to the sentences that
+    share terms with the question. Passages are added until `max_tokens`, as
+    counted by `count_tokens`, is reached; the last one may be truncated.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        max_tokens: int = None,
+        dedup_threshold: float = None,
+        merge_adjacent: bool = None,
+        extract_sentences: bool = None,
+        max_sentences: int = None
+    ):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens or settings.CONTEXT_MAX_TOKENS
+        self.dedup_threshold = dedup_threshold or settings.CONTEXT_DEDUP_THRESHOLD
+        self.merge_adjacent = settings.CONTEXT_MERGE_ADJACENT if merge_adjacent is None else merge_adjacent
+        self.extract_sentences = settings.CONTEXT_SENTENCE_EXTRACTION if extract_sentences is None else extract_sentences
+        self.max_sentences = max_sentences or settings.CONTEXT_MAX_SENTENCES
+
+    def _dedupe(self, documents: List[Dict]) -> List[Dict]:
+        kept = []
+        seen: Dict[str, List[set]] = {}
+        for doc in documents:
+            shingles = _shingles(doc.get('text', ''))
+            previous = seen.setdefault(str(doc.get('article_id', '')), [])
+            if any(len(shingles & other) / (len(shingles | other) or 1) >= self.dedup_threshold for other in previous):
+                continue
+            previous.append(shingles)
+            kept.append(doc)
+        return kept
+
+    def _passages(self, documents: List[Dict]) -> List[Dict]:
+        # one passage per run of consecutive paragraph_ids within an article, in rank order
+        passages = []
+        for doc in documents:
+            number = _paragraph_number(doc)
+            if self.merge_adjacent and number is not None and doc.get('article_id') not in (None, ""):
+                merged = next((
+                    p for p in passages
+                    if p['article_id'] == doc['article_id']
+                    and (number == p['first'] - 1 or number == p['last'] + 1)
+                ), None)
+                if merged is not None:
+                    if number < merged['first']:
+                        merged['first'] = number
+                        merged['parts'].insert(0, doc.get('text', ''))
+                    else:
+                        merged['last'] = number
+                        merged['parts'].append(doc.get('text', ''))
+                    continue
+
+            passages.append({
+                'article_id': doc.get('article_id'),
+                'title': doc.get('title', ''),
+                'header': doc.get('header', ''),
+                'first': number,
+                'last': number,
+                'parts': [doc.get('text', '')],
+            })
+        return passages
+
+    def _relevant_sentences(self, query_terms: set, text: str) -> str:
+        sentences = _split_sentences(text)
+        if len(sentences) <= self.max_sentences:
+            return text
+
+        scored = [(len(query_terms & set(tokenize(s))), i) for i, s in enumerate(sentences)]
+        best = sorted((item for item in scored if item[0] > 0), reverse=True)[:self.max_sentences]
+        if not best:
+            return text
+        return " ".join(sentences[i] for i in sorted(i for _, i in best))
+
+    def _truncate(self, text: str, budget: int) -> str:
+        kept = []
+        for sentence in _split_sentences(text):
+            if self.count_tokens(" ".join(kept + [sentence])) > budget:
+                if not kept:
+                    # a single sentence over the budget: keep as many of its words as fit
+                    return self._truncate_words(sentence, budget)
+                break
+            kept.append(sentence)
+        return " ".join(kept)
+
+    def _truncate_words(self, sentence: str, budget: int) -> str:
+        words = sentence.split()
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(" ".join(words[:middle]) + " …") <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return " ".join(words[:low]) + " …" if low else ""
+
+    def build(self, query: str, documents: List[Dict]) -> Tuple[str, Dict]:
+        if not documents:
+            return NO_CONTEXT, {"passages": 0, "context_tokens": 0}
+
+        unique = self._dedupe(documents)
+        passages = self._passages(unique)
+        query_terms = set(tokenize(query)) if self.extract_sentences else None
+
+        parts = []
+        used_tokens = 0
+        truncated = 0
+        for passage in passages:
+            text = "\n".join(passage['parts'])
+            if query_terms:
+                text = self._relevant_sentences(query_terms, text)
+
+            heading = " - ".join(x for x in (passage['title'], passage['header']) if x)
+            part = f"[{len(parts) + 1}] {heading}\n{text}" if heading else f"[{len(parts) + 1}] {text}"
+            tokens = self.count_tokens(part)
+
+            if used_tokens + tokens > self.max_tokens:
+                remaining = self.max_tokens - used_tokens - self.count_tokens(heading) - 4
+                text = self._truncate(text, remaining) if remaining > 32 else ""
+                if not text:
+                    break
+                part = f"[{len(parts) + 1}] {heading}\n{text}" if heading else f"[{len(parts) + 1}] {text}"
+                tokens = self.count_tokens(part)
+                truncated += 1
+
+            parts.append(part)
+            used_tokens += tokens
+            if truncated:
+                break
+
+        if not parts:
+            # nothing fit the budget: take the no-context path rather than send an empty block
+            return NO_CONTEXT, {"chunks": len(documents), "passages": 0, "context_tokens": 0}
+
+        return "\n\n".join(parts), {
+            "chunks": len(documents),
+            "duplicates_removed": len(documents) - len(unique),
+            "passages": len(parts),
+            "merged": len(unique) - len(passages),
+            "truncated": truncated,
+            "context_tokens": used_tokens,
+        }
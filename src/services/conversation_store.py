@@ -0,0 +1,242 @@
+import asyncio
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.core.observability import get_logger
+from src.core.text import normalize_query
+
+logger = get_logger("conversations")
+
+# phrases that usually lean on the previous turn ("thế còn trẻ em thì sao?")
+_FOLLOWUP_MARKERS = (
+    "thế còn", "còn với", "vậy thì", "vậy còn", "thì sao", "thì thế nào", "như vậy",
+    "bệnh này", "bệnh đó", "thuốc này", "thuốc đó", "cái này", "cái đó", "điều này", "điều đó",
+    "trường hợp này", "trường hợp đó", "nó", "họ", "ấy",
+)
+# fields of a retrieved document worth keeping for reuse (not rerank or fusion scores)
+_DOCUMENT_FIELDS = ("id", "score", "text", "title", "category", "header", "article_id", "paragraph_id")
+
+
+def looks_like_followup(query: str) -> bool:
+    words = normalize_query(query).split()
+    if len(words) <= 3:
+        return True
+    padded = f" {' '.join(words)} "
+    return any(f" {marker} " in padded for marker in _FOLLOWUP_MARKERS)
+
+
+def _compact_document(doc: Dict) -> Dict:
+    return {field: doc[field] for field in _DOCUMENT_FIELDS if field in doc}
+
+
+def _size(turns: List[Dict]) -> int:
+    return len(json.dumps(turns, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class ConversationStore:
+    """Recent turns per conversation_id, in an LRU with TTL and optionally SQLite.
+
+    Only the latest turn keeps its query vector and retrieved documents (that is
+    all follow-up reuse needs); older turns keep the question and a clipped
+    answer for query rewriting. Each conversation is capped at `max_turns` and
+    `max_bytes`. With `sqlite_path` the LRU sits in front of a table, so
+    conversations survive restarts. Writes go to it from a background thread,
+    batched into one commit; reads that miss the LRU use their own connection,
+    off the event loop (`get_async`), so requests never wait on SQLite.
+    """
+
+    def __init__(
+        self,
+        max_conversations: int = None,
+        ttl_seconds: float = None,
+        max_turns: int = None,
+        max_bytes: int = None,
+        sqlite_path: str = None
+    ):
+        self.ttl_seconds = ttl_seconds or settings.CONVERSATION_TTL_SECONDS
+        self.max_turns = max_turns or settings.CONVERSATION_MAX_TURNS
+        self.max_bytes = max_bytes or settings.CONVERSATION_MAX_KB * 1024
+        self.max_conversations = max_conversations or settings.CONVERSATION_MAX_ENTRIES
+        self.cache = TTLCache(max_entries=self.max_conversations, ttl_seconds=self.ttl_seconds)
+
+        sqlite_path = settings.CONVERSATION_DB_PATH if sqlite_path is None else sqlite_path
+        self._db = None
+        self._db_lock = threading.Lock()
+        # reads have their own connection: with WAL they never wait for the writer's commits
+        self._reader = None
+        self._read_lock = threading.Lock()
+        self._writes = 0
+        # conversation_id -> (turns, updated_at) not yet written; the writer thread drains it
+        self._pending: Dict[str, Tuple[List[Dict], float]] = {}
+        self._pending_ready = threading.Condition()
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "id TEXT PRIMARY KEY, turns TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated_at)")
+            self._db.commit()
+            self._reader = sqlite3.connect(sqlite_path, check_same_thread=False)
+            threading.Thread(target=self._write_loop, name="conversation-writer", daemon=True).start()
+            atexit.register(self.flush)
+
+    def get(self, conversation_id: str) -> List[Dict]:
+        turns = self.cache.get(conversation_id)
+        if turns is not None or self._db is None:
+            return list(turns or [])
+
+        with self._pending_ready:
+            pending = self._pending.get(conversation_id)
+        if pending is not None:
+            return list(pending[0])
+        # flush() drops a write from _pending only after its commit, so it is either still pending or readable
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT turns FROM conversations WHERE id = ? AND updated_at >= ?",
+                (conversation_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        if row is None:
+            return []
+        turns = json.loads(row[0])
+        self.cache.set(conversation_id, turns)
+        return list(turns)
+
+    async def get_async(self, conversation_id: str) -> List[Dict]:
+        turns = self.cache.get(conversation_id)
+        if turns is not None or self._db is None:
+            return list(turns or [])
+        # a miss (every new conversation) may read SQLite: not on the event loop
+        return await asyncio.to_thread(self.get, conversation_id)
+
+    def append(
+        self,
+        conversation_id: str,
+        query: str,
+        standalone_query: str,
+        answer: str,
+        documents: List[Dict],
+        query_vector: Optional[List[float]] = None
+    ):
+        self._append(self.get(conversation_id), conversation_id, query, standalone_query, answer, documents, query_vector)
+
+    async def append_async(
+        self,
+        conversation_id: str,
+        query: str,
+        standalone_query: str,
+        answer: str,
+        documents: List[Dict],
+        query_vector: Optional[List[float]] = None
+    ):
+        previous = await self.get_async(conversation_id)
+        self._append(previous, conversation_id, query, standalone_query, answer, documents, query_vector)
+
+    def _append(
+        self,
+        previous: List[Dict],
+        conversation_id: str,
+        query: str,
+        standalone_query: str,
+        answer: str,
+        documents: List[Dict],
+        query_vector: Optional[List[float]]
+    ):
+        turns = [
+            {k: v for k, v in turn.items() if k not in ("documents", "vector")}
+            for turn in previous
+        ]
+        turns.append({
+            "query": query,
+            "standalone_query": standalone_query,
+            "answer": answer[:settings.CONVERSATION_ANSWER_CHARS],
+            "documents": [_compact_document(doc) for doc in documents[:settings.CONVERSATION_MAX_DOCUMENTS]],
+            "vector": [round(float(x), 5) for x in query_vector] if query_vector is not None else None,
+            "ts": time.time(),
+        })
+
+        turns = turns[-self.max_turns:]
+        while len(turns) > 1 and _size(turns) > self.max_bytes:
+            turns.pop(0)
+        if _size(turns) > self.max_bytes:
+            turns[-1]["documents"] = turns[-1]["documents"][:len(turns[-1]["documents"]) // 2]
+
+        self.cache.set(conversation_id, turns)
+        if self._db is not None:
+            self._persist(conversation_id, turns)
+
+    def _persist(self, conversation_id: str, turns: List[Dict]):
+        # only queued here; a conversation written again before the flush is stored once
+        with self._pending_ready:
+            self._pending[conversation_id] = (turns, time.time())
+            self._pending_ready.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._pending_ready:
+                while not self._pending:
+                    self._pending_ready.wait()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Error writing conversations: {e}")
+                time.sleep(1.0)
+
+    def flush(self):
+        # writes every pending conversation in one transaction; also called at exit
+        if self._db is None:
+            return
+        with self._db_lock:
+            with self._pending_ready:
+                batch = dict(self._pending)
+            if not batch:
+                return
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO conversations (id, turns, updated_at) VALUES (?, ?, ?)",
+                    [
+                        (conversation_id, json.dumps(turns, ensure_ascii=False), updated_at)
+                        for conversation_id, (turns, updated_at) in batch.items()
+                    ]
+                )
+            except Exception:
+                # the batch stays pending and is retried with the next flush
+                self._db.rollback()
+                raise
+            writes, self._writes = self._writes, self._writes + len(batch)
+            if writes // 100 != self._writes // 100:
+                # TTL and count limits for the table, checked every 100 writes
+                self._db.execute("DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+                self._db.execute(
+                    "DELETE FROM conversations WHERE id NOT IN "
+                    "(SELECT id FROM conversations ORDER BY updated_at DESC LIMIT ?)",
+                    (self.max_conversations,)
+                )
+            self._db.commit()
+            # committed, so readers find it in the table; unless it was written again meanwhile
+            with self._pending_ready:
+                for conversation_id, entry in batch.items():
+                    if self._pending.get(conversation_id) is entry:
+                        del self._pending[conversation_id]
+
+    def delete(self, conversation_id: str):
+        self.cache.pop(conversation_id)
+        if self._db is not None:
+            with self._db_lock:
+                with self._pending_ready:
+                    self._pending.pop(conversation_id, None)
+                self._db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        stats = self.cache.stats()
+        stats["backend"] = "sqlite" if self._db is not None else "memory"
+        if self._db is not None:
+            stats["pending_writes"] = len(self._pending)
+        return stats
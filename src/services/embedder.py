@@ -0,0 +1,89 @@
+from typing import Dict
+import numpy as np
+from src.core.config import settings
+
+EMBEDDING_RUNTIMES = ("torch", "onnx")
+
+
+def create_embedder(
+    runtime: str = None,
+    model_name: str = None,
+    quantize: bool = None,
+    onnx_file: str = None,
+    threads: int = None
+):
+    """The query embedding model on the configured runtime.
+
+    "torch" is the stock SentenceTransformer, optionally with its Linear layers
+    quantized to int8 (EMBEDDING_QUANTIZE). "onnx" runs ONNX Runtime on CPU:
+    `model_name` is then usually a directory written by scripts/export_embedding
+    (EMBEDDING_ONNX_PATH), and `onnx_file` picks e.g. its int8 file. Pointed at
+    the hub model instead, sentence-transformers exports it on load.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    runtime = runtime or settings.EMBEDDING_RUNTIME
+    if runtime not in EMBEDDING_RUNTIMES:
+        raise ValueError(f"Unknown embedding runtime: {runtime}")
+    quantize = settings.EMBEDDING_QUANTIZE if quantize is None else quantize
+    onnx_file = settings.EMBEDDING_ONNX_FILE if onnx_file is None else onnx_file
+    threads = settings.EMBEDDING_THREADS if threads is None else threads
+
+    kwargs = dict(trust_remote_code=True, cache_folder=settings.MODEL_CACHE_DIR or None)
+    if runtime == "onnx":
+        model_name = model_name or settings.EMBEDDING_ONNX_PATH or settings.EMBEDDING_MODEL
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if onnx_file:
+            model_kwargs["file_name"] = onnx_file
+        if threads:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = options
+        return SentenceTransformer(model_name, backend="onnx", device="cpu", model_kwargs=model_kwargs, **kwargs)
+
+    model = SentenceTransformer(model_name or settings.EMBEDDING_MODEL, **kwargs)
+    if threads or quantize:
+        import torch
+        if threads:
+            torch.set_num_threads(threads)
+        if quantize:
+            # dynamic int8 only pays off on CPU, where the API nodes run
+            model.to("cpu")
+            model[0].auto_model = torch.quantization.quantize_dynamic(
+                model[0].auto_model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+    return model
+
+
+def embedding_agreement(reference: np.ndarray, candidate: np.ndarray, k: int = 5) -> Dict:
+    """How closely `candidate` vectors track `reference` ones for the same texts.
+
+    Besides the per-text cosine, each candidate vector is used as a query
+    against the *reference* vectors of the other texts, the way a converted
+    query model meets a collection indexed with the original one;
+    neighbour_overlap is the share of the reference top-k it still finds.
+    """
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = np.sum(reference * candidate, axis=1)
+
+    result = {
+        "texts": len(cosine),
+        "cosine_mean": round(float(cosine.mean()), 5),
+        "cosine_p5": round(float(np.percentile(cosine, 5)), 5),
+        "cosine_min": round(float(cosine.min()), 5),
+    }
+    k = min(k, len(cosine) - 1)
+    if k < 1:
+        return result
+
+    expected = reference @ reference.T
+    found = candidate @ reference.T
+    np.fill_diagonal(expected, -np.inf)
+    np.fill_diagonal(found, -np.inf)
+    expected_top = np.argpartition(-expected, k, axis=1)[:, :k]
+    found_top = np.argpartition(-found, k, axis=1)[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(expected_top, found_top)]
+    result[f"neighbour_overlap@{k}"] = round(float(np.mean(overlap)), 4)
+    return result
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Sequence
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class BatcherStats:
+    def __init__(self):
+        self.requests = 0
+        self.batches = 0
+        self.items_encoded = 0
+        self.max_batch_size = 0
+        self.batch_size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.queue_wait_total_ms = 0.0
+        self.queue_wait_max_ms = 0.0
+        self.encode_total_ms = 0.0
+        self.errors = 0
+
+    def record_batch(self, size: int, waits_ms: Sequence[float], encode_ms: float):
+        self.batches += 1
+        self.items_encoded += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self.batch_size_histogram[bucket] += 1
+                break
+        self.queue_wait_total_ms += sum(waits_ms)
+        self.queue_wait_max_ms = max(self.queue_wait_max_ms, max(waits_ms, default=0.0))
+        self.encode_total_ms += encode_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.items_encoded / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "batch_size_histogram": {f"<={k}": v for k, v in self.batch_size_histogram.items()},
+            "avg_queue_wait_ms": round(self.queue_wait_total_ms / self.items_encoded, 3) if self.items_encoded else 0.0,
+            "max_queue_wait_ms": round(self.queue_wait_max_ms, 3),
+            "avg_encode_ms": round(self.encode_total_ms / self.batches, 3) if self.batches else 0.0,
+            "errors": self.errors,
+        }
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent encode calls into batched forward passes.
+
+    Callers await `encode`; a background task collects requests for up to
+    `max_wait_ms` (or until `max_batch_size` is reached) and runs them through
+    `encode_fn` on `executor`. At most `max_inflight` batches run at once, so
+    requests arriving while all workers are busy pile up into the next batch.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], List[List[float]]],
+        executor: Executor,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_inflight: int = 1
+    ):
+        self.encode_fn = encode_fn
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_inflight = max(1, max_inflight)
+        self.stats = BatcherStats()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._arrived: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight = set()
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker is not None and not self._worker.done():
+            return
+
+        # (re)bind to the current loop, e.g. after a reload or in a new asyncio.run
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        self._arrived = asyncio.Event()
+        self._worker = loop.create_task(self._run())
+
+    async def encode(self, text: str) -> List[float]:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self.stats.requests += 1
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        self._arrived.set()
+        return await future
+
+    async def encode_many(self, texts: List[str]) -> List[List[float]]:
+        return list(await asyncio.gather(*[self.encode(text) for text in texts]))
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+
+            # drain with get_nowait and wait on an event between drains: a wait_for
+            # around queue.get() can drop an item when its timeout races a put (bpo-42130)
+            while True:
+                self._arrived.clear()
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                remaining = deadline - self._loop.time()
+                if len(batch) >= self.max_batch_size or remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+
+            # top up with whatever queued while we waited for a free worker
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            task = self._loop.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            # skip callers that gave up while queued
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                return
+
+            dispatched_at = time.perf_counter()
+            waits_ms = [(dispatched_at - enqueued_at) * 1000 for _, _, enqueued_at in batch]
+            texts = [text for text, _, _ in batch]
+
+            try:
+                vectors = await self._loop.run_in_executor(self.executor, self.encode_fn, texts)
+            except Exception as e:
+                self.stats.errors += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.stats.record_batch(len(batch), waits_ms, (time.perf_counter() - dispatched_at) * 1000)
+            for (_, future, _), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        finally:
+            self._slots.release()
@@ -1,38 +1,227 @@
-from typing import List, Dict, Optional
+import asyncio
+import copy
+import time
+import numpy as np
+from typing import AsyncIterator, List, Dict, Optional, Sequence, Tuple
+from src.services.ingestion import PAYLOAD_FIELDS
 from src.services.vector_search import VectorSearchService
 from src.services.llm_service import LLMService
 from src.services.reranker import RerankerService
+from src.services.answer_cache import AnswerCache
+from src.services.context_builder import ContextBuilder, hf_token_counter
+from src.services.conversation_store import ConversationStore, looks_like_followup
 from src.core.config import settings
+from src.core.observability import Trace, get_logger, log_event, record_stage, span, start_trace
+from src.core.singleflight import SingleFlight
+from src.core.text import ANSWER_ERROR_PREFIX, normalize_query
+
+logger = get_logger("generator")
 
 class MedicalRAGGenerator:
-    def __init__(self):
-        self.vector_search = VectorSearchService()
-        self.llm = LLMService()
-        self.reranker = RerankerService()
-    
-    def format_context(self, documents: List[Dict]) -> str:
-        if not documents:
-            return "Không tìm thấy thông tin liên quan."
-        
-        context_parts = []
-        for i, doc in enumerate(documents, 1):
-            rerank_score = doc.get('rerank_score', 0)
-            original_score = doc.get('original_score', doc.get('score', 0))
-            
-            context_part = f"""
-=== Tài liệu {i} ===
-Điểm Rerank: {rerank_score:.3f} | Điểm gốc: {original_score:.3f}
-Tiêu đề: {doc.get('title', 'N/A')}
-Danh mục: {doc.get('category', 'N/A')}
-Đề mục: {doc.get('header', 'N/A')}
-
-Nội dung:
-{doc.get('text', '')}
-"""
-            context_parts.append(context_part.strip())
-        
-        return "\n\n".join(context_parts)
+    def __init__(
+        self,
+        vector_search: VectorSearchService = None,
+        llm: LLMService = None,
+        reranker: RerankerService = None
+    ):
+        # services can be passed in, e.g. the stand-ins in benchmarks/stubs.py
+        self.vector_search = vector_search or VectorSearchService()
+        self.llm = llm or LLMService()
+        self.reranker = reranker or RerankerService()
+        self._request_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_REQUESTS)
+        self.answer_cache = AnswerCache() if settings.ANSWER_CACHE_ENABLED else None
+        self.conversations = ConversationStore() if settings.CONVERSATION_ENABLED else None
+        # identical questions in flight at the same time get one pipeline run
+        self.flights = SingleFlight(settings.REQUEST_COALESCING)
+
+        if settings.CONTEXT_TOKENIZER:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(settings.CONTEXT_TOKENIZER)
+        else:
+            # not Gemini's tokenizer, but a real subword count for Vietnamese text
+            tokenizer = self.vector_search.embedder.tokenizer
+        self.context_builder = ContextBuilder(hf_token_counter(tokenizer))
+
+    def warm_up(self):
+        # the first forward pass pays for lazy weight init and kernel selection
+        self.vector_search.encode_query("khởi động hệ thống")
+        if hasattr(self.reranker.backend, 'model'):
+            self.reranker.backend.rank(
+                "khởi động hệ thống",
+                [{"id": None, "text": "Tài liệu khởi động."}],
+                1
+            )
     
+    def build_context(self, query: str, documents: List[Dict]) -> Tuple[str, Dict]:
+        with span("context"):
+            return self.context_builder.build(query, documents)
+
+    def format_context(self, documents: List[Dict], query: str = "") -> str:
+        return self.build_context(query, documents)[0]
+
+    async def _rerank_async(self, query: str, documents: List[Dict], top_n: int, use_rerank: bool) -> List[Dict]:
+        if not use_rerank:
+            # documents come in search (or fusion) order already
+            return documents[:top_n]
+        return await self.reranker.rerank_with_fallback_async(query, documents, top_n=top_n)
+
+    def _finish(self, trace: Trace, result: Dict) -> Dict:
+        # one structured line per request instead of progress prints; sampled with the trace
+        timings = dict(trace.timings, total=trace.elapsed_ms())
+        log_event(
+            logger, "request_completed",
+            pipeline=trace.name,
+            cache=result.get("cache", "miss"),
+            expansion=(result.get("expansion") or {}).get("mode"),
+            queries=len(result.get("queries_used", [])),
+            num_documents=result["num_documents"],
+            num_reranked=result["num_reranked"],
+            tokens=result.get("tokens"),
+            timings=timings
+        )
+        return dict(result, timings=timings)
+
+    def _empty_result(self, query: str) -> Dict:
+        return {
+            "query": query,
+            "answer": "Xin lỗi, tôi không tìm thấy thông tin liên quan đến câu hỏi của bạn. Bạn có thể diễn đạt lại câu hỏi hoặc liên hệ bác sĩ để được tư vấn trực tiếp.",
+            "documents": [],
+            "context": "",
+            "num_documents": 0,
+            "num_reranked": 0
+        }
+
+    def _cache_key(self, query: str, **params):
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.make_key(query, **params)
+
+    def _cache_lookup(self, key, query: str) -> Tuple[Optional[Dict], Optional[List[float]]]:
+        if key is None:
+            return None, None
+
+        cached = self.answer_cache.get_exact(key)
+        query_vector = None
+        if cached is None and self.answer_cache.semantic_enabled:
+            with span("embed"):
+                query_vector = self.vector_search.encode_query(query)
+            cached = self.answer_cache.get_semantic(key, query_vector)
+        if cached is None:
+            self.answer_cache.record_miss()
+        return cached, query_vector
+
+    async def _cache_lookup_async(self, key, query: str) -> Tuple[Optional[Dict], Optional[List[float]]]:
+        if key is None:
+            return None, None
+
+        cached = self.answer_cache.get_exact(key)
+        query_vector = None
+        if cached is None and self.answer_cache.semantic_enabled:
+            query_vector = await self.vector_search.encode_query_async(query)
+            cached = self.answer_cache.get_semantic(key, query_vector)
+        if cached is None:
+            self.answer_cache.record_miss()
+        return cached, query_vector
+
+    def _cache_store(self, key, result: Dict, query_vector: Optional[List[float]]):
+        # don't keep empty results or LLM failures around
+        if key is None or not result["documents"] or result["answer"].startswith(ANSWER_ERROR_PREFIX):
+            return
+        self.answer_cache.set(key, result, query_vector)
+
+    def coalescing_stats(self) -> Dict:
+        return {
+            "answer": self.flights.stats(),
+            "expansion": self.llm.flights.stats(),
+            "search": self.vector_search.flights.stats(),
+            "rerank": self.reranker.flights.stats(),
+        }
+
+    def invalidate_cache(self):
+        # call after the Qdrant collection has been re-indexed; blocking while indexes reload.
+        # Answers go last, so none computed from the old indexes outlives the call.
+        self.vector_search.invalidate_results()
+        self.reranker.clear_cache()
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate()
+
+    async def _resolve_query_async(
+        self,
+        query: str,
+        conversation_id: Optional[str]
+    ) -> Tuple[str, List[Dict], Optional[Dict]]:
+        # (standalone query, previous turns, conversation info for the response)
+        if self.conversations is None or not conversation_id:
+            return query, [], None
+
+        history = await self.conversations.get_async(conversation_id)
+        info = {"turns": len(history), "rewritten": False, "reused_documents": False}
+        standalone = query
+        if history and settings.CONVERSATION_REWRITE and looks_like_followup(query):
+            standalone = await self.llm.rewrite_followup_async(
+                query, history[-settings.CONVERSATION_HISTORY_TURNS:]
+            )
+            if standalone != query:
+                info.update(rewritten=True, standalone_query=standalone)
+        return standalone, history, info
+
+    def _reusable_documents(self, history: List[Dict], query_vector: List[float]) -> Optional[List[Dict]]:
+        # the previous turn's candidates, if the question is still about the same thing
+        last = history[-1] if history else None
+        if not last or not last.get("documents") or last.get("vector") is None:
+            return None
+        if float(np.dot(last["vector"], query_vector)) < settings.CONVERSATION_REUSE_SIMILARITY:
+            return None
+        return [dict(doc) for doc in last["documents"]]
+
+    async def _gather_documents_async(
+        self,
+        query: str,
+        history: List[Dict],
+        top_k: int,
+        score_threshold: float,
+        use_query_expansion: bool,
+        query_vector: Optional[List[float]]
+    ) -> Tuple[List[str], List[Dict], Dict, Optional[List[float]]]:
+        if history:
+            if query_vector is None:
+                query_vector = await self.vector_search.encode_query_async(query)
+            reused = self._reusable_documents(history, query_vector)
+            if reused is not None:
+                # same topic: one plain search (no expansion) for whatever the follow-up adds
+                documents = await self.vector_search.search_async(
+                    query, top_k, score_threshold, query_vector=query_vector
+                )
+                documents = self.vector_search.merge_results([documents, reused])
+                saved = self.llm.expansion_latency_ms if use_query_expansion else 0.0
+                return [query], documents, {"mode": "reused", "latency_ms": 0.0, "time_saved_ms": round(saved, 1)}, query_vector
+
+        queries, documents, expansion = await self._retrieve_async(
+            query, top_k, score_threshold, use_query_expansion, query_vector
+        )
+        return queries, documents, expansion, query_vector
+
+    async def _remember_async(
+        self,
+        conversation_id: Optional[str],
+        query: str,
+        standalone: str,
+        result: Dict,
+        query_vector: Optional[List[float]]
+    ):
+        if self.conversations is None or not conversation_id or result["answer"].startswith(ANSWER_ERROR_PREFIX):
+            return
+        if query_vector is None:
+            query_vector = await self.vector_search.encode_query_async(standalone)
+        await self.conversations.append_async(
+            conversation_id,
+            query,
+            standalone,
+            result["answer"],
+            result.get("all_documents") or result["documents"],
+            query_vector
+        )
+
     def ask(
         self,
         query: str,
@@ -41,51 +230,163 @@ Nội dung:
         use_query_expansion: bool = True,
         rerank_top_n: int = 5
     ) -> Dict:
+        with start_trace("ask") as trace:
+            result = self._ask(query, top_k, score_threshold, use_query_expansion, rerank_top_n)
+            return self._finish(trace, result)
+
+    def _ask(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        use_query_expansion: bool,
+        rerank_top_n: int
+    ) -> Dict:
+        cache_key = self._cache_key(
+            query,
+            top_k=top_k,
+            score_threshold=score_threshold,
+            use_query_expansion=use_query_expansion,
+            rerank_top_n=rerank_top_n
+        )
+        cached, query_vector = self._cache_lookup(cache_key, query)
+        if cached is not None:
+            return cached
+
         if use_query_expansion:
             queries = self.llm.generate_similar_queries(query, num_queries=3)
-            print(f"Generated {len(queries)} queries:")
-            for i, q in enumerate(queries, 1):
-                print(f"   {i}. {q}")
+            logger.debug("Generated queries", extra={"fields": {"queries": queries}})
         else:
             queries = [query]
         
-        print(f"\nSearching with {len(queries)} queries (top_k={top_k})...")
         if len(queries) > 1:
             documents = self.vector_search.search_with_multiple_queries(
                 queries, top_k, score_threshold
             )
         else:
             documents = self.vector_search.search(
-                query, top_k, score_threshold
+                query, top_k, score_threshold, query_vector=query_vector
             )
         
-        print(f"Found {len(documents)} unique documents")
-        
         if not documents:
-            return {
-                "query": query,
-                "answer": "Xin lỗi, tôi không tìm thấy thông tin liên quan đến câu hỏi của bạn. Bạn có thể diễn đạt lại câu hỏi hoặc liên hệ bác sĩ để được tư vấn trực tiếp.",
-                "documents": [],
-                "context": "",
-                "num_documents": 0,
-                "num_reranked": 0
-            }
+            return self._empty_result(query)
         
-        print(f"\nReranking to top {rerank_top_n}...")
         reranked_documents = self.reranker.rerank_with_fallback(
             query, documents, top_n=rerank_top_n
         )
         
-        print(f"Reranked to {len(reranked_documents)} documents")
-        
-        context = self.format_context(reranked_documents)
+        context, context_stats = self.build_context(query, reranked_documents)
         
-        print(f"\nGenerating answer...")
-        answer = self.llm.generate_answer(query, context)
+        usage = {}
+        answer = self.llm.generate_answer(query, context, usage=usage)
+
+        result = {
+            "query": query,
+            "answer": answer,
+            "documents": reranked_documents,
+            "all_documents": documents,
+            "context": context,
+            "num_documents": len(documents),
+            "num_reranked": len(reranked_documents),
+            "queries_used": queries,
+            "tokens": dict(usage, **context_stats)
+        }
+        self._cache_store(cache_key, result, query_vector)
+        return result
 
-        print(f"Answer generated!\n")
+    async def ask_async(
+        self,
+        query: str,
+        top_k: int = 20,
+        score_threshold: float = 0.5,
+        use_query_expansion: bool = True,
+        rerank_top_n: int = 5,
+        conversation_id: Optional[str] = None,
+        use_rerank: bool = True
+    ) -> Dict:
+        # use_rerank=False keeps the search order, e.g. when admission control sheds load
+        with start_trace("ask") as trace:
+            result = await self._ask_async(
+                query, top_k, score_threshold, use_query_expansion, rerank_top_n, conversation_id, use_rerank
+            )
+            return self._finish(trace, result)
 
-        return {
+    async def _ask_async(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        use_query_expansion: bool,
+        rerank_top_n: int,
+        conversation_id: Optional[str],
+        use_rerank: bool = True
+    ) -> Dict:
+        original_query = query
+        query, history, conversation = await self._resolve_query_async(query, conversation_id)
+
+        cache_key = self._cache_key(
+            query,
+            top_k=top_k,
+            score_threshold=score_threshold,
+            use_query_expansion=use_query_expansion,
+            rerank_top_n=rerank_top_n,
+            use_rerank=use_rerank
+        )
+        cached, query_vector = await self._cache_lookup_async(cache_key, query)
+        if cached is not None:
+            await self._remember_async(conversation_id, original_query, query, cached, query_vector)
+            return dict(cached, conversation=conversation)
+
+        answer = lambda: self._answer_async(
+            query, history, top_k, score_threshold, use_query_expansion, rerank_top_n, use_rerank,
+            cache_key, query_vector
+        )
+        if history:
+            # follow-ups depend on this conversation's earlier turns: nothing to share
+            result, query_vector = await answer()
+        else:
+            flight_key = (
+                normalize_query(query), top_k, score_threshold, use_query_expansion, rerank_top_n, use_rerank
+            )
+            coalesced = self.flights.in_flight(flight_key)
+            result, query_vector = await self.flights.do(flight_key, answer, copy=copy.deepcopy)
+            if coalesced:
+                result["cache"] = "coalesced"
+
+        if conversation is not None:
+            conversation["reused_documents"] = result["expansion"]["mode"] == "reused"
+        result = dict(result, query=query, conversation=conversation)
+        if result["num_documents"]:
+            await self._remember_async(conversation_id, original_query, query, result, query_vector)
+        return result
+
+    async def _answer_async(
+        self,
+        query: str,
+        history: List[Dict],
+        top_k: int,
+        score_threshold: float,
+        use_query_expansion: bool,
+        rerank_top_n: int,
+        use_rerank: bool,
+        cache_key,
+        query_vector: Optional[List[float]]
+    ) -> Tuple[Dict, Optional[List[float]]]:
+        # everything except per-caller conversation bookkeeping; may be shared by coalesced requests
+        async with self._request_semaphore:
+            queries, documents, expansion, query_vector = await self._gather_documents_async(
+                query, history, top_k, score_threshold, use_query_expansion, query_vector
+            )
+            if not documents:
+                return dict(self._empty_result(query), expansion=expansion), query_vector
+
+            reranked_documents = await self._rerank_async(query, documents, rerank_top_n, use_rerank)
+
+            context, context_stats = self.build_context(query, reranked_documents)
+            usage = {}
+            answer = await self.llm.generate_answer_async(query, context, usage=usage)
+
+        result = {
             "query": query,
             "answer": answer,
             "documents": reranked_documents,
@@ -93,18 +394,203 @@ Nội dung:
             "context": context,
             "num_documents": len(documents),
             "num_reranked": len(reranked_documents),
-            "queries_used": queries
+            "queries_used": queries,
+            "expansion": expansion,
+            "tokens": dict(usage, **context_stats)
         }
-    
+        self._cache_store(cache_key, result, query_vector)
+        return result, query_vector
+
+    async def ask_stream(
+        self,
+        query: str,
+        top_k: int = 20,
+        score_threshold: float = 0.5,
+        use_query_expansion: bool = True,
+        rerank_top_n: int = 5,
+        conversation_id: Optional[str] = None,
+        use_rerank: bool = True
+    ) -> AsyncIterator[Dict]:
+        # yields {"event": ..., "data": ...}: progress events, answer tokens, then "done"
+        with start_trace("ask_stream") as trace:
+            async for item in self._ask_stream(
+                query, top_k, score_threshold, use_query_expansion, rerank_top_n, conversation_id, use_rerank
+            ):
+                if item["event"] == "done":
+                    item["data"]["result"] = self._finish(trace, item["data"]["result"])
+                yield item
+
+    async def _ask_stream(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        use_query_expansion: bool,
+        rerank_top_n: int,
+        conversation_id: Optional[str],
+        use_rerank: bool = True
+    ) -> AsyncIterator[Dict]:
+        start = time.perf_counter()
+        elapsed_ms = lambda: round((time.perf_counter() - start) * 1000, 1)
+
+        original_query = query
+        query, history, conversation = await self._resolve_query_async(query, conversation_id)
+
+        cache_key = self._cache_key(
+            query,
+            top_k=top_k,
+            score_threshold=score_threshold,
+            use_query_expansion=use_query_expansion,
+            rerank_top_n=rerank_top_n,
+            use_rerank=use_rerank
+        )
+        cached, query_vector = await self._cache_lookup_async(cache_key, query)
+        if cached is not None:
+            cached = dict(cached, conversation=conversation)
+            yield {"event": "token", "data": {"text": cached["answer"]}}
+            ttft_ms = elapsed_ms()
+            record_stage("ttft", ttft_ms / 1000)
+            await self._remember_async(conversation_id, original_query, query, cached, query_vector)
+            yield {"event": "done", "data": {"result": cached, "ttft_ms": ttft_ms, "total_ms": ttft_ms}}
+            return
+
+        # the request slot covers retrieval only: nothing is yielded while it is held,
+        # so a slow SSE reader can't keep it from non-streaming /chat traffic
+        async with self._request_semaphore:
+            queries, documents, expansion, query_vector = await self._gather_documents_async(
+                query, history, top_k, score_threshold, use_query_expansion, query_vector
+            )
+        if conversation is not None:
+            conversation["reused_documents"] = expansion["mode"] == "reused"
+        yield {"event": "expansion", "data": dict(expansion, queries=queries, elapsed_ms=elapsed_ms())}
+        yield {"event": "retrieved", "data": {"num_documents": len(documents), "elapsed_ms": elapsed_ms()}}
+
+        if not documents:
+            result = dict(self._empty_result(query), expansion=expansion, conversation=conversation)
+            yield {"event": "token", "data": {"text": result["answer"]}}
+            ttft_ms = elapsed_ms()
+            record_stage("ttft", ttft_ms / 1000)
+            yield {"event": "done", "data": {"result": result, "ttft_ms": ttft_ms, "total_ms": ttft_ms}}
+            return
+
+        reranked_documents = await self._rerank_async(query, documents, rerank_top_n, use_rerank)
+        yield {"event": "reranked", "data": {"num_documents": len(reranked_documents), "elapsed_ms": elapsed_ms()}}
+
+        context, context_stats = self.build_context(query, reranked_documents)
+
+        usage = {}
+        answer_parts = []
+        ttft_ms = None
+        failed = False
+        async for chunk in self.llm.generate_answer_stream_async(query, context, usage=usage):
+            if ttft_ms is None:
+                ttft_ms = elapsed_ms()
+                record_stage("ttft", ttft_ms / 1000)
+            failed = failed or chunk.startswith(ANSWER_ERROR_PREFIX)
+            answer_parts.append(chunk)
+            yield {"event": "token", "data": {"text": chunk}}
+
+        result = {
+            "query": query,
+            "answer": "".join(answer_parts),
+            "documents": reranked_documents,
+            "all_documents": documents,
+            "context": context,
+            "num_documents": len(documents),
+            "num_reranked": len(reranked_documents),
+            "queries_used": queries,
+            "expansion": expansion,
+            "tokens": dict(usage, **context_stats),
+            "conversation": conversation
+        }
+        if not failed:
+            self._cache_store(cache_key, result, query_vector)
+            await self._remember_async(conversation_id, original_query, query, result, query_vector)
+
+        total_ms = elapsed_ms()
+        yield {"event": "done", "data": {"result": result, "ttft_ms": ttft_ms if ttft_ms is not None else total_ms, "total_ms": total_ms}}
+
+    async def _retrieve_async(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        use_query_expansion: bool,
+        query_vector: Optional[List[float]] = None
+    ) -> Tuple[List[str], List[Dict], Dict]:
+        if not use_query_expansion:
+            documents = await self.vector_search.search_async(
+                query, top_k, score_threshold, query_vector=query_vector
+            )
+            return [query], documents, {"mode": "disabled", "latency_ms": 0.0, "time_saved_ms": 0.0}
+
+        cached_queries = self.llm.cached_similar_queries(query, num_queries=3)
+        if cached_queries is not None:
+            documents = await self.vector_search.search_with_multiple_queries_async(
+                cached_queries, top_k, score_threshold
+            )
+            saved = self.llm.expansion_latency_ms
+            return cached_queries, documents, {"mode": "cached", "latency_ms": 0.0, "time_saved_ms": round(saved, 1)}
+
+        start = time.perf_counter()
+        if not settings.ADAPTIVE_EXPANSION:
+            queries = await self.llm.generate_similar_queries_async(query, num_queries=3)
+            latency = (time.perf_counter() - start) * 1000
+            documents = await self.vector_search.search_with_multiple_queries_async(
+                queries, top_k, score_threshold
+            )
+            return queries, documents, {"mode": "llm", "latency_ms": round(latency, 1), "time_saved_ms": 0.0}
+
+        # adaptive: search with the plain query while the LLM expands it
+        expansion_task = asyncio.create_task(
+            self.llm.generate_similar_queries_async(query, num_queries=3)
+        )
+        try:
+            plain_documents = await self.vector_search.search_async(
+                query, top_k, score_threshold, query_vector=query_vector
+            )
+        except BaseException:
+            expansion_task.cancel()
+            raise
+        plain_ms = (time.perf_counter() - start) * 1000
+
+        strong_hits = [
+            doc for doc in plain_documents
+            if doc['score'] >= settings.ADAPTIVE_EXPANSION_MIN_SCORE
+        ]
+        if len(strong_hits) >= settings.ADAPTIVE_EXPANSION_MIN_HITS:
+            expansion_task.cancel()
+            saved = self.llm.expansion_latency_ms
+            return [query], plain_documents, {"mode": "skipped", "latency_ms": 0.0, "time_saved_ms": round(saved, 1)}
+
+        queries = await expansion_task
+        expansion_ms = (time.perf_counter() - start) * 1000
+
+        extra_queries = queries[1:]
+        results_per_query = [plain_documents]
+        if extra_queries:
+            results_per_query += await self.vector_search.search_many_async(
+                extra_queries, top_k, score_threshold
+            )
+        documents = self.vector_search.merge_results(results_per_query)
+
+        # the plain search overlapped with expansion instead of following it
+        return queries, documents, {
+            "mode": "llm",
+            "latency_ms": round(max(0.0, expansion_ms - plain_ms), 1),
+            "time_saved_ms": round(min(plain_ms, expansion_ms), 1)
+        }
+
     def search_only(
         self,
         query: str,
         top_k: int = 20,
         score_threshold: float = 0.5,
         use_rerank: bool = True,
-        rerank_top_n: int = 5
+        rerank_top_n: int = 5,
+        fields: Sequence[str] = PAYLOAD_FIELDS
     ) -> List[Dict]:
-        documents = self.vector_search.search(query, top_k, score_threshold)
+        documents = self.vector_search.search(query, top_k, score_threshold, fields=fields)
         
         if use_rerank and documents:
             documents = self.reranker.rerank_with_fallback(
@@ -113,4 +599,22 @@ Nội dung:
         
         return documents
 
-rag_generator = MedicalRAGGenerator()
\ No newline at end of file
+    async def search_only_async(
+        self,
+        query: str,
+        top_k: int = 20,
+        score_threshold: float = 0.5,
+        use_rerank: bool = True,
+        rerank_top_n: int = 5,
+        fields: Sequence[str] = PAYLOAD_FIELDS
+    ) -> List[Dict]:
+        # `fields`: payload fields to fetch; reranking needs "text"
+        async with self._request_semaphore:
+            documents = await self.vector_search.search_async(query, top_k, score_threshold, fields=fields)
+
+            if use_rerank and documents:
+                documents = await self.reranker.rerank_with_fallback_async(
+                    query, documents, top_n=rerank_top_n
+                )
+
+        return documents
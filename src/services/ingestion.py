@@ -0,0 +1,399 @@
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from qdrant_client import QdrantClient, models
+from src.core.observability import get_logger, log_event
+
+logger = get_logger("ingestion")
+
+PAYLOAD_FIELDS = ("title", "category", "header", "text", "article_id", "paragraph_id")
+
+_MARKDOWN_HEADER = re.compile(r"^\s*#{1,6}\s+(.+?)\s*$")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def iter_records(path: str, start: int = 0) -> Iterator[Tuple[int, Dict]]:
+    """Stream (index, record) pairs from a JSONL or Parquet file, skipping the first `start`."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading Parquet needs pyarrow: pip install pyarrow") from e
+
+        index = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=1024):
+            rows = batch.to_pylist()
+            if index + len(rows) <= start:
+                index += len(rows)
+                continue
+            for row in rows:
+                if index >= start:
+                    yield index, row
+                index += 1
+        return
+
+    with open(path, encoding="utf-8") as f:
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            if index >= start:
+                yield index, json.loads(line)
+            index += 1
+
+
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+    if len(paragraph) <= max_chars:
+        return [paragraph]
+
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _pack_paragraphs(text: str, max_chars: int) -> List[str]:
+    # group consecutive paragraphs up to max_chars, splitting oversized ones by sentence
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n|\n", text) if p.strip()]
+
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        for piece in _split_long(paragraph, max_chars):
+            if current and len(current) + len(piece) + 1 > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _sections(record: Dict) -> List[Tuple[str, str]]:
+    sections = record.get("sections")
+    if isinstance(sections, list):
+        return [
+            (s.get("header") or s.get("title") or "", s.get("text") or s.get("content") or "")
+            for s in sections if isinstance(s, dict)
+        ]
+
+    text = record.get("content") or record.get("text") or ""
+    result, header, lines = [], record.get("header", ""), []
+    for line in text.splitlines():
+        match = _MARKDOWN_HEADER.match(line)
+        if match:
+            if lines:
+                result.append((header, "\n".join(lines)))
+            header, lines = match.group(1), []
+        else:
+            lines.append(line)
+    if lines:
+        result.append((header, "\n".join(lines)))
+    return result
+
+
+def is_prechunked(record: Dict) -> bool:
+    return "paragraph_id" in record and bool(record.get("text"))
+
+
+def chunk_record(record: Dict, max_chars: int = 1200) -> List[Dict]:
+    """Turn one article into search payloads (the fields `VectorSearchService` reads).
+
+    Records that already carry a `paragraph_id` are treated as pre-chunked.
+    Otherwise the article is split into sections (a `sections` list, or markdown
+    headers in `content`/`text`) and each section into paragraph-packed chunks.
+    """
+    title = record.get("title", "")
+    category = record.get("category", "")
+    article_id = next(
+        (record[field] for field in ("article_id", "id", "url") if record.get(field) not in (None, "")),
+        hashlib.sha1(title.encode("utf-8")).hexdigest()[:16]
+    )
+
+    if is_prechunked(record):
+        return [{
+            "title": title,
+            "category": category,
+            "header": record.get("header", ""),
+            "text": record["text"],
+            "article_id": article_id,
+            "paragraph_id": record["paragraph_id"],
+        }]
+
+    chunks = []
+    for header, text in _sections(record):
+        for piece in _pack_paragraphs(text, max_chars):
+            chunks.append({
+                "title": title,
+                "category": category,
+                "header": header,
+                "text": piece,
+                "article_id": article_id,
+                "paragraph_id": len(chunks),
+            })
+    return chunks
+
+
+def content_hash(payload: Dict, model_name: str) -> str:
+    # the model is part of the hash so switching embedders re-embeds everything
+    raw = json.dumps([model_name] + [payload.get(field) for field in PAYLOAD_FIELDS], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def point_id(payload: Dict) -> str:
+    # stable across runs, so re-ingesting overwrites instead of duplicating
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{payload['article_id']}#{payload['paragraph_id']}"))
+
+
+class IngestionStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = 0
+        self.chunks = 0
+        self.unchanged = 0
+        self.embedded = 0
+        self.upserted = 0
+        self.deleted = 0
+        self.embed_seconds = 0.0
+
+    def to_dict(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "records": self.records,
+            "chunks": self.chunks,
+            "unchanged": self.unchanged,
+            "embedded": self.embedded,
+            "upserted": self.upserted,
+            "deleted": self.deleted,
+            "elapsed_s": round(elapsed, 2),
+            "embed_s": round(self.embed_seconds, 2),
+            "docs_per_sec": round(self.records / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_sec": round(self.chunks / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class QdrantIngestor:
+    """Chunk, embed and upsert a document stream into a Qdrant collection.
+
+    Embedding runs on the calling thread (or a sentence-transformers process
+    pool) while upserts go out on a thread pool, so the two overlap. Each chunk
+    stores a content hash; chunks whose point already carries the same hash are
+    neither re-embedded nor re-uploaded. With `state_path` the number of fully
+    uploaded input records is checkpointed, so an interrupted run can resume.
+    An article that now splits into fewer chunks loses its old trailing points.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection_name: str,
+        embedder,
+        model_name: str,
+        batch_size: int = 256,
+        upload_batch_size: int = 128,
+        upload_workers: int = 4,
+        processes: int = 1,
+        max_chars: int = 1200,
+        report_every_seconds: float = 10.0
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.embedder = embedder
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.upload_batch_size = upload_batch_size
+        self.max_chars = max_chars
+        self.report_every_seconds = report_every_seconds
+
+        # the local (path / :memory:) client is not meant for concurrent writers
+        local = getattr(client, "_client", None).__class__.__name__ == "QdrantLocal"
+        workers = 1 if local else max(1, upload_workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qdrant-upsert")
+        self.max_inflight = 2 * workers
+
+        self.processes = processes
+        self._pool = None
+        self._fresh_collection = False
+        self.stats = IngestionStats()
+
+    def ensure_collection(self, recreate: bool = False):
+        exists = self.client.collection_exists(self.collection_name)
+        if exists and not recreate:
+            return
+
+        if exists:
+            self.client.delete_collection(self.collection_name)
+        dim = self.embedder.get_sentence_embedding_dimension()
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE),
+        )
+        self._fresh_collection = True
+
+    def _unchanged_ids(self, ids: List[str], hashes: Dict[str, str]) -> set:
+        if self._fresh_collection:
+            return set()
+        existing = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=ids,
+            with_payload=["content_hash"],
+            with_vectors=False
+        )
+        return {
+            str(point.id) for point in existing
+            if (point.payload or {}).get("content_hash") == hashes[str(point.id)]
+        }
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        if self.processes > 1:
+            if self._pool is None:
+                self._pool = self.embedder.start_multi_process_pool(["cpu"] * self.processes)
+            vectors = self.embedder.encode_multi_process(
+                texts, self._pool, batch_size=64, normalize_embeddings=True
+            )
+        else:
+            vectors = self.embedder.encode(
+                texts, batch_size=64, convert_to_numpy=True,
+                normalize_embeddings=True, show_progress_bar=False
+            )
+        self.stats.embed_seconds += time.perf_counter() - start
+        return vectors.tolist()
+
+    def _upsert(self, points: List[models.PointStruct]):
+        self.client.upsert(collection_name=self.collection_name, points=points, wait=True)
+        self.stats.upserted += len(points)
+
+    def _delete_stale(self, article_chunks: Dict):
+        # points past an article's last chunk, left from a longer earlier version of it
+        stale = models.Filter(should=[
+            models.Filter(must=[
+                models.FieldCondition(key="article_id", match=models.MatchValue(value=article_id)),
+                models.FieldCondition(key="paragraph_id", range=models.Range(gte=count)),
+            ])
+            for article_id, count in article_chunks.items()
+        ])
+        count = self.client.count(collection_name=self.collection_name, count_filter=stale, exact=True).count
+        if count:
+            self.client.delete(
+                collection_name=self.collection_name, points_selector=models.FilterSelector(filter=stale), wait=True
+            )
+            self.stats.deleted += count
+
+    def _flush(self, chunks: List[Dict], article_chunks: Dict) -> list:
+        # article_chunks: article_id -> chunk count, for the articles chunked here (not pre-chunked records)
+        ids = [point_id(chunk) for chunk in chunks]
+        hashes = {pid: content_hash(chunk, self.model_name) for pid, chunk in zip(ids, chunks)}
+
+        futures = []
+        if article_chunks and not self._fresh_collection:
+            # also when every remaining chunk is unchanged: the article may only have lost its tail
+            futures.append(self.executor.submit(self._delete_stale, article_chunks))
+
+        unchanged = self._unchanged_ids(ids, hashes)
+        self.stats.unchanged += len(unchanged)
+        todo = [(pid, chunk) for pid, chunk in zip(ids, chunks) if pid not in unchanged]
+        if not todo:
+            return futures
+
+        vectors = self._embed([chunk["text"] for _, chunk in todo])
+        self.stats.embedded += len(todo)
+        points = [
+            models.PointStruct(id=pid, vector=vector, payload=dict(chunk, content_hash=hashes[pid]))
+            for (pid, chunk), vector in zip(todo, vectors)
+        ]
+        return futures + [
+            self.executor.submit(self._upsert, points[i:i + self.upload_batch_size])
+            for i in range(0, len(points), self.upload_batch_size)
+        ]
+
+    def _load_state(self, state_path: Optional[str], input_path: str) -> int:
+        if not state_path or not os.path.exists(state_path):
+            return 0
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("input") != os.path.abspath(input_path) or state.get("collection") != self.collection_name:
+            return 0
+        return int(state.get("records_done", 0))
+
+    def _save_state(self, state_path: Optional[str], input_path: str, records_done: int):
+        if not state_path:
+            return
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "input": os.path.abspath(input_path),
+                "collection": self.collection_name,
+                "records_done": records_done,
+            }, f)
+        os.replace(tmp_path, state_path)
+
+    def run(self, input_path: str, state_path: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+        start_index = self._load_state(state_path, input_path)
+        if start_index:
+            logger.info(f"Resuming after {start_index} records")
+
+        # (upload futures, records done once they finish), oldest first
+        inflight = deque()
+        batch: List[Dict] = []
+        article_chunks: Dict = {}
+        records_done = start_index
+        last_report = time.perf_counter()
+
+        def settle(block: bool):
+            nonlocal records_done
+            while inflight and (block or len(inflight) > self.max_inflight or all(f.done() for f in inflight[0][0])):
+                futures, done_at = inflight.popleft()
+                for future in futures:
+                    future.result()
+                records_done = done_at
+                self._save_state(state_path, input_path, records_done)
+
+        try:
+            for index, record in iter_records(input_path, start_index):
+                if limit is not None and index - start_index >= limit:
+                    break
+
+                chunks = chunk_record(record, self.max_chars)
+                batch.extend(chunks)
+                if chunks and not is_prechunked(record):
+                    article_chunks[chunks[0]["article_id"]] = len(chunks)
+                self.stats.records += 1
+                self.stats.chunks += len(chunks)
+
+                # flush only on record boundaries so the checkpoint never splits an article
+                if len(batch) >= self.batch_size:
+                    inflight.append((self._flush(batch, article_chunks), index + 1))
+                    batch, article_chunks = [], {}
+                    settle(block=False)
+
+                if time.perf_counter() - last_report >= self.report_every_seconds:
+                    last_report = time.perf_counter()
+                    log_event(logger, "ingestion_progress", **self.stats.to_dict())
+
+            if batch:
+                inflight.append((self._flush(batch, article_chunks), start_index + self.stats.records))
+            settle(block=True)
+
+        finally:
+            self.executor.shutdown(wait=True)
+            if self._pool is not None:
+                self.embedder.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+        return self.stats.to_dict()
@@ -1,14 +1,106 @@
+import asyncio
+import atexit
+import threading
+import time
 import google.generativeai as genai
-from typing import List
+from google.ai import generativelanguage as glm
+from typing import AsyncIterator, Dict, List, Optional
+from src.core.cache import TTLCache
+from src.core.client_pool import build_pool
 from src.core.config import settings, gemini_key_manager
+from src.core.observability import get_logger, span
+from src.core.singleflight import SingleFlight
+from src.core.text import ANSWER_ERROR_PREFIX, normalize_query
+
+
+logger = get_logger("llm")
+
+def _gemini_model(api_key: str, use_async: bool = False) -> genai.GenerativeModel:
+    # GenerativeModel normally uses the process-wide client from genai.configure;
+    # give each key its own long-lived client instead
+    model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    client_options = {"api_key": api_key}
+    if use_async:
+        model._async_client = glm.GenerativeServiceAsyncClient(client_options=client_options)
+    else:
+        model._client = glm.GenerativeServiceClient(client_options=client_options)
+    return model
+
+def _read_usage(response, usage: Optional[Dict]):
+    metadata = getattr(response, "usage_metadata", None)
+    if usage is None or not metadata:
+        return
+    usage.update(
+        prompt_tokens=metadata.prompt_token_count,
+        output_tokens=metadata.candidates_token_count,
+        total_tokens=metadata.total_token_count
+    )
 
 class LLMService:
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    def __init__(self, pool=None):
+        # `pool` replaces the Gemini clients, e.g. with stand-ins for offline benchmarks
+        if pool is None:
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            pool = build_pool(
+                "gemini",
+                [settings.GEMINI_API_KEY] + gemini_key_manager.get_all_keys(),
+                _gemini_model,
+                lambda api_key: _gemini_model(api_key, use_async=True),
+                hedge_delay_ms=settings.GEMINI_HEDGE_DELAY_MS
+            )
+        self.pool = pool
+        self._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
 
-    def generate_similar_queries(self, original_query: str, num_queries: int = 3) -> List[str]:
-        prompt = f"""Bạn là một chuyên gia y tế. Hãy tạo ra {num_queries-1} câu hỏi tương tự với câu hỏi sau, 
+        self.expansion_cache = TTLCache(
+            max_entries=settings.EXPANSION_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.EXPANSION_CACHE_TTL_SECONDS
+        )
+        # moving average of real expansion calls, used to estimate time saved
+        self.expansion_latency_ms = 0.0
+        self._unsaved_expansions = 0
+        self._save_lock = threading.Lock()
+        self.flights = SingleFlight(settings.REQUEST_COALESCING)
+        if settings.EXPANSION_CACHE_PATH:
+            try:
+                loaded = self.expansion_cache.load(settings.EXPANSION_CACHE_PATH)
+                logger.info(f"Loaded {loaded} cached query expansions")
+            except Exception as e:
+                logger.warning(f"Error loading expansion cache: {e}")
+            atexit.register(self.save_expansion_cache)
+
+    def _expansion_key(self, original_query: str, num_queries: int) -> str:
+        return f"{num_queries}|{normalize_query(original_query)}"
+
+    def cached_similar_queries(self, original_query: str, num_queries: int = 3) -> Optional[List[str]]:
+        generated_queries = self.expansion_cache.get(self._expansion_key(original_query, num_queries))
+        if generated_queries is None:
+            return None
+        return [original_query] + generated_queries
+
+    def _store_expansion(self, original_query: str, num_queries: int, all_queries: List[str], latency_ms: float):
+        self.expansion_cache.set(self._expansion_key(original_query, num_queries), all_queries[1:])
+
+        if self.expansion_latency_ms:
+            self.expansion_latency_ms = 0.9 * self.expansion_latency_ms + 0.1 * latency_ms
+        else:
+            self.expansion_latency_ms = latency_ms
+
+        self._unsaved_expansions += 1
+        if settings.EXPANSION_CACHE_PATH and self._unsaved_expansions >= settings.EXPANSION_CACHE_SAVE_EVERY:
+            self.save_expansion_cache()
+
+    def save_expansion_cache(self):
+        if not settings.EXPANSION_CACHE_PATH:
+            return
+        with self._save_lock:
+            try:
+                self.expansion_cache.dump(settings.EXPANSION_CACHE_PATH)
+                self._unsaved_expansions = 0
+            except Exception as e:
+                logger.warning(f"Error saving expansion cache: {e}")
+
+    def _build_expansion_prompt(self, original_query: str, num_queries: int) -> str:
+        return f"""Bạn là một chuyên gia y tế. Hãy tạo ra {num_queries-1} câu hỏi tương tự với câu hỏi sau, 
 nhưng diễn đạt khác đi để có thể tìm kiếm được nhiều thông tin liên quan hơn.
 
 Câu hỏi gốc: {original_query}
@@ -26,50 +118,181 @@ Ví dụ:
 
 Các câu hỏi tương tự:"""
 
+    def _parse_queries(self, original_query: str, text: str, num_queries: int) -> List[str]:
+        generated_queries = [q.strip() for q in text.strip().split('\n') if q.strip()]
+
+        # add original to list
+        return [original_query] + generated_queries[:num_queries-1]
+
+    def generate_similar_queries(self, original_query: str, num_queries: int = 3) -> List[str]:
+        cached = self.cached_similar_queries(original_query, num_queries)
+        if cached is not None:
+            return cached
+
+        prompt = self._build_expansion_prompt(original_query, num_queries)
+
         try:
-            response = self.model.generate_content(prompt)
-            generated_queries = [q.strip() for q in response.text.strip().split('\n') if q.strip()]
-            
-            # add original to list
-            all_queries = [original_query] + generated_queries[:num_queries-1]
+            start = time.perf_counter()
+            with span("expansion"):
+                response = self.pool.call(lambda model: model.generate_content(prompt))
+            all_queries = self._parse_queries(original_query, response.text, num_queries)
+            self._store_expansion(original_query, num_queries, all_queries, (time.perf_counter() - start) * 1000)
             return all_queries
         except Exception as e:
-            print(f"Error generating similar queries: {e}")
+            logger.warning(f"Error generating similar queries: {e}")
             return [original_query]
-        
-    def generate_answer(self, query: str, context: str) -> str:
-        prompt = f"""Bạn là ViMedBot — trợ lý sức khỏe gia đình trả lời ngắn gọn, dễ hiểu. 
-Chỉ sử dụng thông tin có trong {context}. Không thêm thông tin ngoài {context}. Không chẩn đoán, không kê đơn hay chỉ định điều trị. 
-Nếu {context} không đủ để trả lời, viết nguyên văn: "Xin lỗi, tôi chưa có đủ thông tin để trả lời câu hỏi này".
+
+    async def generate_similar_queries_async(self, original_query: str, num_queries: int = 3) -> List[str]:
+        cached = self.cached_similar_queries(original_query, num_queries)
+        if cached is not None:
+            return cached
+
+        # the same question asked concurrently waits for one LLM call
+        all_queries = await self.flights.do(
+            self._expansion_key(original_query, num_queries),
+            lambda: self._expand_async(original_query, num_queries)
+        )
+        return [original_query] + all_queries[1:]
+
+    async def _expand_async(self, original_query: str, num_queries: int) -> List[str]:
+        prompt = self._build_expansion_prompt(original_query, num_queries)
+
+        try:
+            async with self._semaphore, span("expansion"):
+                start = time.perf_counter()
+                response = await self.pool.call_async(lambda model: model.generate_content_async(prompt))
+            all_queries = self._parse_queries(original_query, response.text, num_queries)
+            self._store_expansion(original_query, num_queries, all_queries, (time.perf_counter() - start) * 1000)
+            return all_queries
+        except Exception as e:
+            logger.warning(f"Error generating similar queries: {e}")
+            return [original_query]
+
+    def _build_rewrite_prompt(self, query: str, history: List[Dict]) -> str:
+        turns = "\n".join(
+            f"Người dùng: {turn['standalone_query']}\nTrợ lý: {turn['answer']}"
+            for turn in history
+        )
+        return f"""Dựa vào đoạn hội thoại, viết lại câu hỏi mới nhất thành một câu hỏi đầy đủ, 
+có thể hiểu được mà không cần đọc hội thoại (nêu rõ bệnh, thuốc, đối tượng được nhắc đến trước đó).
+Nếu câu hỏi đã đầy đủ, giữ nguyên. Chỉ trả về đúng một câu hỏi, không giải thích.
+
+HỘI THOẠI:
+{turns}
+
+CÂU HỎI MỚI: {query}
+
+CÂU HỎI ĐẦY ĐỦ:"""
+
+    async def rewrite_followup_async(self, query: str, history: List[Dict]) -> str:
+        prompt = self._build_rewrite_prompt(query, history)
+        try:
+            async with self._semaphore, span("rewrite"):
+                response = await self.pool.call_async(lambda model: model.generate_content_async(prompt))
+            lines = [line.strip() for line in response.text.strip().splitlines() if line.strip()]
+            return lines[0] if lines else query
+        except Exception as e:
+            logger.warning(f"Error rewriting follow-up query: {e}")
+            return query
+
+    def _build_answer_prompt(self, query: str, context: str) -> str:
+        # the context appears once; the rules below refer to it by name
+        return f"""Bạn là ViMedBot — trợ lý sức khỏe gia đình trả lời ngắn gọn, dễ hiểu. 
+
+TÀI LIỆU:
+<<<
+{context}
+>>>
+
+Chỉ sử dụng thông tin có trong TÀI LIỆU. Không thêm thông tin ngoài TÀI LIỆU. Không chẩn đoán, không kê đơn hay chỉ định điều trị. 
+Nếu TÀI LIỆU không đủ để trả lời, viết nguyên văn: "Xin lỗi, tôi chưa có đủ thông tin để trả lời câu hỏi này".
 
 PHONG CÁCH & MỞ BÀI
 - Viết một câu dẫn nhập tự nhiên, phù hợp ngữ cảnh câu hỏi, không dùng các cụm khuôn mẫu như “Về [chủ đề]…”, “Những điểm bạn nên biết…”, “Tóm tắt nhanh…”, “Nếu bạn đang tìm hiểu…”, “Dưới đây là…”, “Trao đổi ngắn gọn…”.
 - Câu dẫn nhập nhắc lại trọng tâm câu hỏi bằng ngôn ngữ đời thường, 1–2 câu, không dùng ngoặc vuông, không dùng từ “chủ đề”.
 
 KẾT CẤU NỘI DUNG
-- Tóm tắt ngắn: 1–2 câu nêu cốt lõi theo {context}.
+- Tóm tắt ngắn: 1–2 câu nêu cốt lõi theo TÀI LIỆU.
 - Các điểm chính: 
   - Sử dụng gạch đầu dòng Markdown (`- `) cho các ý chính, tối đa 3–5 ý.
   - Nếu ý chính có chi tiết phụ, sử dụng bullet con với thụt đầu dòng (2 khoảng trắng trước `- `, ví dụ: `  - `).
   - Đảm bảo mỗi bullet con liên quan trực tiếp đến bullet cha, không để bullet con đứng độc lập.
-- Khi nào nên đi khám: Chỉ liệt kê nếu {context} có nêu dấu hiệu/nguy cơ/cảnh báo, dùng gạch đầu dòng (`- `).
+- Khi nào nên đi khám: Chỉ liệt kê nếu TÀI LIỆU có nêu dấu hiệu/nguy cơ/cảnh báo, dùng gạch đầu dòng (`- `).
 - Lưu ý:
   - Thông tin chỉ mang tính tham khảo chung.
   - Khi có triệu chứng bất thường, đang mang thai, có bệnh nền, hoặc đang dùng thuốc, hãy tham khảo bác sĩ chuyên khoa.
 
 QUY TẮC
-- Ngắn gọn, rõ ràng, tránh thuật ngữ khó; nếu dùng thuật ngữ từ {context}, giải thích ngắn gọn.
+- Ngắn gọn, rõ ràng, tránh thuật ngữ khó; nếu dùng thuật ngữ từ TÀI LIỆU, giải thích ngắn gọn.
 - Sử dụng ký tự Markdown chuẩn: `- ` cho bullet, `**text**` cho in đậm, `*text*` cho nghiêng.
 - Không nêu nguồn, không viết “theo tài liệu/nguồn/tham khảo”.
-- Không suy diễn ngoài {context}, không kết luận điều trị.
+- Không suy diễn ngoài TÀI LIỆU, không kết luận điều trị.
 - Đảm bảo định dạng Markdown rõ ràng, dễ đọc, với các bullet lồng nhau đúng cú pháp, không bold text.
-- Nếu câu hỏi vượt ngoài phạm vi {context}, trả lời: "Xin lỗi, tôi chưa có đủ thông tin để trả lời câu hỏi này".
+- Nếu câu hỏi vượt ngoài phạm vi TÀI LIỆU, trả lời: "Xin lỗi, tôi chưa có đủ thông tin để trả lời câu hỏi này".
 
 CÂU HỎI: {query}
 
 TRẢ LỜI:"""
+
+    def generate_answer(self, query: str, context: str, usage: Optional[Dict] = None) -> str:
+        # `usage`, if given, is filled with Gemini's token counts for the call
+        prompt = self._build_answer_prompt(query, context)
+        try:
+            with span("generation"):
+                response = self.pool.call(lambda model: model.generate_content(prompt))
+            _read_usage(response, usage)
+            return response.text
+        except Exception as e:
+            logger.warning(f"Error generating answer: {e}")
+            return f"{ANSWER_ERROR_PREFIX}: {str(e)}"
+
+    async def generate_answer_async(self, query: str, context: str, usage: Optional[Dict] = None) -> str:
+        prompt = self._build_answer_prompt(query, context)
         try:
-            response = self.model.generate_content(prompt)
+            async with self._semaphore, span("generation"):
+                response = await self.pool.call_async(lambda model: model.generate_content_async(prompt))
+            _read_usage(response, usage)
             return response.text
         except Exception as e:
-            return f"Xin lỗi, có lỗi xảy ra khi tạo câu trả lời: {str(e)}"
\ No newline at end of file
+            logger.warning(f"Error generating answer: {e}")
+            return f"{ANSWER_ERROR_PREFIX}: {str(e)}"
+
+    async def generate_answer_stream_async(
+        self,
+        query: str,
+        context: str,
+        usage: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        # the upstream is read by its own task into a bounded buffer: the LLM slot is
+        # released when Gemini is done, not when the client has read the last token
+        buffer: asyncio.Queue = asyncio.Queue(maxsize=settings.LLM_STREAM_BUFFER_CHUNKS)
+        reader = asyncio.create_task(self._read_answer_stream(self._build_answer_prompt(query, context), usage, buffer))
+        try:
+            while (text := await buffer.get()) is not None:
+                yield text
+        finally:
+            # the client went away: stop reading the upstream
+            reader.cancel()
+
+    async def _read_answer_stream(self, prompt: str, usage: Optional[Dict], buffer: asyncio.Queue):
+        try:
+            async with self._semaphore, span("generation"):
+                # only the opening request is retried; a stream can't be hedged
+                response = await self.pool.call_async(
+                    lambda model: model.generate_content_async(prompt, stream=True),
+                    hedge=False
+                )
+                async for chunk in response:
+                    # the last chunk carries the totals
+                    _read_usage(chunk, usage)
+                    # chunks without text (e.g. safety metadata) raise on .text
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue
+                    if text:
+                        await buffer.put(text)
+        except Exception as e:
+            logger.warning(f"Error generating answer: {e}")
+            await buffer.put(f"{ANSWER_ERROR_PREFIX}: {str(e)}")
+        await buffer.put(None)
@@ -0,0 +1,545 @@
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from qdrant_client.http import models
+from src.core.config import settings
+from src.core.observability import get_logger, log_event
+
+logger = get_logger("local_index")
+
+FORMAT_VERSION = 1
+VECTOR_DTYPES = ("float16", "int8")
+CURRENT_FILE = "CURRENT"
+# rows per matmul when scanning: bounds the float32 working copy of the matrix
+SCAN_ROWS = 32768
+# rows quantized at a time while building
+BUILD_BATCH = 4096
+# float16 -> float32 by table lookup: about twice as fast as numpy's own conversion
+_HALF_TO_FLOAT = np.arange(65536, dtype=np.uint32).astype(np.uint16).view(np.float16).astype(np.float32)
+
+
+def _as_float32(block: np.ndarray) -> np.ndarray:
+    if block.dtype == np.float16:
+        return np.take(_HALF_TO_FLOAT, block.view(np.uint16))
+    return block.astype(np.float32)
+
+
+def _quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms > 0, norms, 1.0)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    # symmetric, one scale per vector: v ~ scale * q
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[part], scores[part]
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
+
+
+def _train_ivf(sample: np.ndarray, lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    # spherical k-means: vectors and centroids are unit length, assignment by dot product
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(labels, kind="stable")
+        present, starts = np.unique(labels[order], return_index=True)
+        centroids[present] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = np.setdiff1d(np.arange(lists), present)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def resolve_snapshot(path: str) -> str:
+    """The snapshot directory `path` points at: itself, or the one named in its CURRENT file."""
+    if os.path.exists(os.path.join(path, "manifest.json")):
+        return path
+    current = os.path.join(path, CURRENT_FILE)
+    if not os.path.exists(current):
+        raise FileNotFoundError(f"No local index snapshot at {path}")
+    with open(current, encoding="utf-8") as f:
+        return os.path.join(path, f.read().strip())
+
+
+def _snapshot_names(path: str) -> List[str]:
+    names = [name for name in os.listdir(path) if name.startswith("v") and name[1:].isdigit()] if os.path.isdir(path) else []
+    return sorted(names, key=lambda name: int(name[1:]))
+
+
+class _Snapshot:
+    """One immutable snapshot directory, memory-mapped.
+
+    vectors.npy    unit vectors, float16 or int8 (with per-row scales.npy)
+    ids.json       point id per row
+    payloads.jsonl one JSON payload per row, located via payload_offsets.npy
+    centroids.npy, list_offsets.npy
+                   IVF lists, when built: rows are stored grouped by list,
+                   so each list is one contiguous slice of the matrix
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Local index {path} has format version {manifest.get('format_version')}, expected {FORMAT_VERSION}"
+            )
+
+        self.path = path
+        self.manifest = manifest
+        self.collection_name = manifest["collection"]
+        self.count = manifest["count"]
+        self.dim = manifest["dim"]
+
+        file = lambda name: os.path.join(path, name)
+        self.vectors = np.load(file("vectors.npy"), mmap_mode="r")
+        self.scales = np.load(file("scales.npy"), mmap_mode="r") if manifest["dtype"] == "int8" else None
+        with open(file("ids.json"), encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+        self.payload_offsets = np.load(file("payload_offsets.npy"))
+        self._payload_file = open(file("payloads.jsonl"), "rb")
+        self.payloads = mmap.mmap(self._payload_file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+
+        self.centroids = None
+        self.list_offsets = None
+        if manifest.get("ivf_lists"):
+            self.centroids = np.load(file("centroids.npy"))
+            self.list_offsets = np.load(file("list_offsets.npy"))
+
+        # searches reading this snapshot; once retired, the last one to finish closes it
+        self._users = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            done = self._retired and not self._users
+        if done:
+            self.close()
+
+    def retire(self):
+        with self._lock:
+            self._retired = True
+            done = not self._users
+        if done:
+            self.close()
+
+    def _scores(self, start: int, stop: int, queries: np.ndarray) -> np.ndarray:
+        # (stop - start) x n_queries cosine scores for a contiguous slice of rows
+        scores = _as_float32(self.vectors[start:stop]) @ queries
+        if self.scales is not None:
+            scores *= self.scales[start:stop, None]
+        return scores
+
+    def scan(self, queries: np.ndarray, limit: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        # exact search, one pass over the matrix for the whole batch of queries
+        best = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))] * len(queries)
+        transposed = np.ascontiguousarray(queries.T)
+        for start in range(0, self.count, SCAN_ROWS):
+            stop = min(start + SCAN_ROWS, self.count)
+            scores = self._scores(start, stop, transposed)
+            k = min(limit, stop - start)
+            top = np.argpartition(-scores, k - 1, axis=0)[:k] if stop - start > k else None
+            for j, (rows, values) in enumerate(best):
+                block_rows = top[:, j] if top is not None else np.arange(stop - start)
+                best[j] = _top_k(
+                    np.concatenate([rows, block_rows + start]),
+                    np.concatenate([values, scores[block_rows, j]]),
+                    limit
+                )
+        return best
+
+    def probe(self, query: np.ndarray, limit: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        # IVF: score only the rows of the `nprobe` lists whose centroids are closest
+        centroid_scores = self.centroids @ query
+        nprobe = min(nprobe, len(centroid_scores))
+        lists = np.sort(np.argpartition(-centroid_scores, nprobe - 1)[:nprobe])
+        rows, scores = [], []
+        for i in lists:
+            start, stop = int(self.list_offsets[i]), int(self.list_offsets[i + 1])
+            if stop > start:
+                rows.append(np.arange(start, stop))
+                scores.append(self._scores(start, stop, query[:, None])[:, 0])
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return _top_k(np.concatenate(rows), np.concatenate(scores), limit)
+
+    def score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        scores = _as_float32(self.vectors[rows]) @ query
+        if self.scales is not None:
+            scores *= self.scales[rows]
+        return scores
+
+    def payload(self, row: int, with_payload) -> Optional[Dict]:
+        if not with_payload:
+            return None
+        start, stop = int(self.payload_offsets[row]), int(self.payload_offsets[row + 1])
+        payload = json.loads(self.payloads[start:stop])
+        if with_payload is True:
+            return payload
+        return {field: payload[field] for field in with_payload if field in payload}
+
+    def vector(self, row: int) -> List[float]:
+        vector = _as_float32(self.vectors[row])
+        if self.scales is not None:
+            vector = vector * self.scales[row]
+        return vector.tolist()
+
+    def close(self):
+        # drop the memmaps so their mappings and descriptors go with them
+        self.vectors = self.scales = None
+        if isinstance(self.payloads, mmap.mmap):
+            self.payloads.close()
+        self._payload_file.close()
+
+
+class LocalVectorIndex:
+    """Read-only, memory-mapped vector index for edge and offline deployments.
+
+    Stands in for the QdrantClient in `VectorSearchService`: it answers the
+    calls the search path makes (query_points, query_batch_points with id
+    filters for hybrid search, scroll for the BM25 index) from a snapshot
+    written by scripts/build_local_index.py, so hits come back in the same
+    format as from Qdrant. Small corpora are searched exactly with NumPy;
+    snapshots built with IVF lists probe the LOCAL_INDEX_NPROBE closest lists.
+
+    `path` holds versioned snapshots (v1, v2, ...) and a CURRENT file naming
+    the live one. `refresh()` switches to a newer snapshot; searches already
+    running finish on the old one, which is closed when the last of them ends.
+    """
+
+    def __init__(self, path: str, nprobe: int = None):
+        self.path = path
+        self.nprobe = nprobe or settings.LOCAL_INDEX_NPROBE
+        self.snapshot = _Snapshot(resolve_snapshot(path))
+        log_event(
+            logger, "local_index_loaded",
+            snapshot=self.snapshot.path, points=self.snapshot.count, dtype=self.snapshot.manifest["dtype"],
+            ivf_lists=self.snapshot.manifest.get("ivf_lists", 0)
+        )
+
+    def refresh(self) -> bool:
+        path = resolve_snapshot(self.path)
+        if path == self.snapshot.path:
+            return False
+        old, self.snapshot = self.snapshot, _Snapshot(path)
+        old.retire()
+        log_event(logger, "local_index_switched", snapshot=path, points=self.snapshot.count)
+        return True
+
+    def stats(self) -> Dict:
+        return dict(self.snapshot.manifest, snapshot=os.path.basename(self.snapshot.path), nprobe=self.nprobe)
+
+    @contextmanager
+    def _snapshot_for(self, collection_name: str):
+        # pin the live snapshot for the duration of one call; a refresh racing
+        # the pin retires it first, so read whichever is live next
+        while True:
+            snapshot = self.snapshot
+            if snapshot.acquire():
+                break
+        try:
+            if collection_name != snapshot.collection_name:
+                raise ValueError(f"Collection {collection_name} not found in local index {self.path}")
+            yield snapshot
+        finally:
+            snapshot.release()
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return collection_name == self.snapshot.collection_name
+
+    def _query_vectors(self, snapshot: _Snapshot, queries: Sequence) -> np.ndarray:
+        vectors = np.asarray(queries, dtype=np.float32).reshape(len(queries), -1)
+        if vectors.shape[1] != snapshot.dim:
+            raise ValueError(f"Query has dimension {vectors.shape[1]}, the local index has {snapshot.dim}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def _check_filter(self, query_filter: Optional[models.Filter]):
+        # only the filter the hybrid search path sends: must=[HasIdCondition, ...]
+        if query_filter is None:
+            return
+        conditions = query_filter.must if isinstance(query_filter.must, list) else [query_filter.must]
+        if query_filter.should or query_filter.must_not or query_filter.min_should or not conditions or not all(
+            isinstance(c, models.HasIdCondition) for c in conditions
+        ):
+            raise ValueError(
+                f"The local index ({self.path}) only supports has_id filters; "
+                "use Qdrant (QDRANT_URL or QDRANT_PATH) for payload filters"
+            )
+
+    def _filtered_rows(self, snapshot: _Snapshot, query_filter: models.Filter) -> np.ndarray:
+        conditions = query_filter.must if isinstance(query_filter.must, list) else [query_filter.must]
+        ids = set.intersection(*(set(c.has_id) for c in conditions))
+        return np.array(sorted(snapshot.rows[i] for i in ids if i in snapshot.rows), dtype=np.int64)
+
+    def _points(
+        self,
+        snapshot: _Snapshot,
+        rows: np.ndarray,
+        scores: np.ndarray,
+        score_threshold: Optional[float],
+        with_payload,
+        with_vectors: bool
+    ) -> models.QueryResponse:
+        points = []
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            if score_threshold is not None and score < score_threshold:
+                break
+            points.append(models.ScoredPoint(
+                id=snapshot.ids[row],
+                version=0,
+                score=score,
+                payload=snapshot.payload(row, with_payload),
+                vector=snapshot.vector(row) if with_vectors else None
+            ))
+        return models.QueryResponse(points=points)
+
+    def _search(self, snapshot: _Snapshot, queries: np.ndarray, limit: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if not snapshot.count:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))] * len(queries)
+        if snapshot.centroids is not None and self.nprobe < len(snapshot.centroids):
+            return [snapshot.probe(query, limit, self.nprobe) for query in queries]
+        return snapshot.scan(queries, limit)
+
+    def query_points(
+        self,
+        collection_name: str,
+        query,
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        with_payload=True,
+        with_vectors: bool = False,
+        query_filter: Optional[models.Filter] = None,
+        **kwargs
+    ) -> models.QueryResponse:
+        request = models.QueryRequest(
+            query=query, limit=limit, score_threshold=score_threshold,
+            with_payload=with_payload, with_vector=with_vectors, filter=query_filter
+        )
+        return self.query_batch_points(collection_name, [request])[0]
+
+    def query_batch_points(self, collection_name: str, requests: Sequence[models.QueryRequest], **kwargs) -> List[models.QueryResponse]:
+        for request in requests:
+            self._check_filter(request.filter)
+        with self._snapshot_for(collection_name) as snapshot:
+            return self._query_batch(snapshot, requests)
+
+    def _query_batch(self, snapshot: _Snapshot, requests: Sequence[models.QueryRequest]) -> List[models.QueryResponse]:
+        queries = self._query_vectors(snapshot, [request.query for request in requests])
+        responses: List[Optional[models.QueryResponse]] = [None] * len(requests)
+
+        # unfiltered requests with the same limit share one pass over the matrix
+        by_limit: Dict[int, List[int]] = {}
+        for i, request in enumerate(requests):
+            if request.filter is not None:
+                rows = self._filtered_rows(snapshot, request.filter)
+                found = _top_k(rows, snapshot.score_rows(queries[i], rows), request.limit) if len(rows) else (rows, rows)
+                responses[i] = self._points(snapshot, *found, request.score_threshold, request.with_payload, request.with_vector)
+            else:
+                by_limit.setdefault(request.limit, []).append(i)
+
+        for limit, indexes in by_limit.items():
+            for i, found in zip(indexes, self._search(snapshot, queries[indexes], limit)):
+                request = requests[i]
+                responses[i] = self._points(snapshot, *found, request.score_threshold, request.with_payload, request.with_vector)
+        return responses
+
+    def scroll(
+        self,
+        collection_name: str,
+        limit: int = 10,
+        offset: Optional[int] = None,
+        with_payload=True,
+        with_vectors: bool = False,
+        **kwargs
+    ) -> Tuple[List[models.Record], Optional[int]]:
+        # offsets are row numbers, opaque to callers as in Qdrant
+        with self._snapshot_for(collection_name) as snapshot:
+            start = offset or 0
+            stop = min(start + limit, snapshot.count)
+            records = [
+                models.Record(
+                    id=snapshot.ids[row],
+                    payload=snapshot.payload(row, with_payload),
+                    vector=snapshot.vector(row) if with_vectors else None
+                )
+                for row in range(start, stop)
+            ]
+            return records, stop if stop < snapshot.count else None
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        records: Iterable[Tuple[object, Sequence[float], Dict]],
+        collection_name: str,
+        dtype: str = "float16",
+        ivf_lists: Optional[int] = None,
+        keep: int = 3,
+        source: str = ""
+    ) -> str:
+        """Write (id, vector, payload) records as a new snapshot under `path` and make it current.
+
+        `ivf_lists`: None picks 4 * sqrt(points) lists from LOCAL_INDEX_IVF_MIN_POINTS
+        points up, and exact search below; 0 never builds lists. Returns the
+        snapshot directory.
+        """
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown local index dtype: {dtype}")
+
+        start = time.perf_counter()
+        os.makedirs(path, exist_ok=True)
+        existing = _snapshot_names(path)
+        name = f"v{int(existing[-1][1:]) + 1 if existing else 1}"
+        tmp_dir = os.path.join(path, f".{name}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        file = lambda name: os.path.join(tmp_dir, name)
+
+        # payloads stream to disk; vectors are kept quantized, not as float32
+        ids, offsets, blocks, scale_blocks, batch = [], [0], [], [], []
+        with open(file("payloads.unordered.jsonl"), "wb") as payload_file:
+            for doc_id, vector, payload in records:
+                line = json.dumps(payload or {}, ensure_ascii=False).encode("utf-8") + b"\n"
+                payload_file.write(line)
+                offsets.append(offsets[-1] + len(line))
+                ids.append(doc_id)
+                batch.append(vector)
+                if len(batch) >= BUILD_BATCH:
+                    block, scales = _quantize(batch, dtype)
+                    blocks.append(block)
+                    scale_blocks.append(scales)
+                    batch = []
+        if batch:
+            block, scales = _quantize(batch, dtype)
+            blocks.append(block)
+            scale_blocks.append(scales)
+        if not blocks:
+            raise ValueError(f"No points to index in {collection_name}")
+
+        matrix = np.concatenate(blocks)
+        scales = np.concatenate(scale_blocks) if dtype == "int8" else None
+        offsets = np.asarray(offsets, dtype=np.int64)
+        count, dim = matrix.shape
+        dequantize = lambda rows: (
+            _as_float32(matrix[rows]) * scales[rows, None] if scales is not None else _as_float32(matrix[rows])
+        )
+
+        if ivf_lists is None:
+            ivf_lists = int(4 * np.sqrt(count)) if count >= settings.LOCAL_INDEX_IVF_MIN_POINTS else 0
+        ivf_lists = min(ivf_lists, count)
+        order = None
+        if ivf_lists:
+            rng = np.random.default_rng(0)
+            sample_size = min(count, max(ivf_lists * 64, 20000))
+            sample = dequantize(np.sort(rng.choice(count, sample_size, replace=False)))
+            centroids = _train_ivf(sample, ivf_lists)
+            labels = np.concatenate([
+                np.argmax(dequantize(np.arange(i, min(i + SCAN_ROWS, count))) @ centroids.T, axis=1)
+                for i in range(0, count, SCAN_ROWS)
+            ])
+            order = np.argsort(labels, kind="stable")
+            list_offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=ivf_lists))]).astype(np.int64)
+            np.save(file("centroids.npy"), centroids)
+            np.save(file("list_offsets.npy"), list_offsets)
+
+        if order is None:
+            os.replace(file("payloads.unordered.jsonl"), file("payloads.jsonl"))
+        else:
+            # rows of one list become one contiguous slice: reorder everything to match
+            matrix = matrix[order]
+            scales = scales[order] if scales is not None else None
+            ids = [ids[i] for i in order]
+            new_offsets = [0]
+            with open(file("payloads.unordered.jsonl"), "rb") as source_file, open(file("payloads.jsonl"), "wb") as out:
+                unordered = mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ)
+                for row in order:
+                    line = unordered[offsets[row]:offsets[row + 1]]
+                    out.write(line)
+                    new_offsets.append(new_offsets[-1] + len(line))
+                unordered.close()
+            os.remove(file("payloads.unordered.jsonl"))
+            offsets = np.asarray(new_offsets, dtype=np.int64)
+
+        np.save(file("vectors.npy"), matrix)
+        if scales is not None:
+            np.save(file("scales.npy"), scales)
+        np.save(file("payload_offsets.npy"), offsets)
+        with open(file("ids.json"), "w", encoding="utf-8") as f:
+            json.dump(ids, f)
+        with open(file("manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "version": int(name[1:]),
+                "collection": collection_name,
+                "count": count,
+                "dim": dim,
+                "dtype": dtype,
+                "metric": "cosine",
+                "ivf_lists": ivf_lists,
+                "source": source,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }, f, indent=2)
+
+        # publish: the snapshot appears complete, then CURRENT moves to it
+        snapshot_dir = os.path.join(path, name)
+        os.rename(tmp_dir, snapshot_dir)
+        with open(os.path.join(path, f"{CURRENT_FILE}.tmp"), "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(os.path.join(path, f"{CURRENT_FILE}.tmp"), os.path.join(path, CURRENT_FILE))
+
+        for old in _snapshot_names(path)[:-keep] if keep else []:
+            shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+
+        log_event(
+            logger, "local_index_built",
+            snapshot=snapshot_dir, points=count, dim=dim, dtype=dtype, ivf_lists=ivf_lists,
+            seconds=round(time.perf_counter() - start, 1)
+        )
+        return snapshot_dir
+
+    @classmethod
+    def build_from_qdrant(cls, client, collection_name: str, path: str, page_size: int = 1000, **kwargs) -> str:
+        def records():
+            offset = None
+            while True:
+                points, offset = client.scroll(
+                    collection_name=collection_name,
+                    limit=page_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True
+                )
+                for point in points:
+                    yield point.id, point.vector, point.payload
+                if offset is None:
+                    break
+
+        return cls.build(path, records(), collection_name, **kwargs)
@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from src.core.config import settings
+from src.core.observability import get_logger, log_event
+from src.services.embedding_batcher import EmbeddingBatcher
+
+logger = get_logger("model_server")
+
+# frame: header length, body length (big-endian uint32), JSON header, raw body
+_FRAME = struct.Struct(">II")
+
+
+def _pack(header: Dict, body: bytes = b"") -> bytes:
+    raw = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return _FRAME.pack(len(raw), len(body)) + raw + body
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[Dict, bytes]:
+    header_len, body_len = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    header = json.loads(await reader.readexactly(header_len))
+    body = await reader.readexactly(body_len) if body_len else b""
+    return header, body
+
+
+class ModelServer:
+    """Serves the embedding model (and optionally the cross-encoder) on a Unix socket.
+
+    Run one per host with `python -m scripts.model_server` and point the API
+    workers at it with MODEL_SERVER_SOCKET: they then load no model weights.
+    Encode requests from all connections go through one `EmbeddingBatcher`, so
+    queries from different workers share forward passes.
+    """
+
+    def __init__(self, embedder, reranker=None, model_name: str = ""):
+        self.embedder = embedder
+        self.reranker = reranker
+        self.model_name = model_name
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.EMBEDDING_WORKERS,
+            thread_name_prefix="model-server"
+        )
+        self.batcher = EmbeddingBatcher(
+            self._encode,
+            self.executor,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+            max_inflight=settings.EMBEDDING_WORKERS
+        )
+        self.connections = 0
+        self.requests = 0
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+
+    async def _handle_request(self, header: Dict) -> Tuple[Dict, bytes]:
+        op = header.get("op")
+        if op == "encode":
+            vectors = np.asarray(await self.batcher.encode_many(header["texts"]), dtype=np.float32)
+            return {"ok": True, "shape": list(vectors.shape)}, vectors.tobytes()
+        if op == "rank":
+            if self.reranker is None:
+                raise ValueError("this model server has no reranker loaded")
+            ranking = await self.reranker.rank_async(header["query"], header["documents"], header["top_n"])
+            return {"ok": True, "ranking": [[int(i), float(score)] for i, score in ranking]}, b""
+        if op == "info":
+            return {
+                "ok": True,
+                "model": self.model_name,
+                "dimension": self.embedder.get_sentence_embedding_dimension(),
+                "reranker": self.reranker is not None,
+            }, b""
+        if op == "stats":
+            return {"ok": True, "stats": self.stats()}, b""
+        raise ValueError(f"unknown op: {op}")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # each client connection is used by one thread at a time: request, response, repeat
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    header, _ = await _read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                self.requests += 1
+                try:
+                    response, body = await self._handle_request(header)
+                except Exception as e:
+                    response, body = {"ok": False, "error": f"{type(e).__name__}: {e}"}, b""
+                writer.write(_pack(response, body))
+                await writer.drain()
+        finally:
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, path: str):
+        if os.path.exists(path):
+            os.unlink(path)  # left over from a previous run
+        server = await asyncio.start_unix_server(self._handle_connection, path=path)
+        os.chmod(path, 0o660)
+        inode = os.stat(path).st_ino
+
+        # SIGTERM (docker stop, systemd) and Ctrl-C both stop the server and remove the
+        # socket: a stale one would leave clients retrying until their connect_timeout
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        log_event(logger, "model_server_listening", socket=path, model=self.model_name, reranker=self.reranker is not None)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(sig)
+            # unless a newer server has already bound the same path
+            if os.path.exists(path) and os.stat(path).st_ino == inode:
+                os.unlink(path)
+            log_event(logger, "model_server_stopped", socket=path, requests=self.requests)
+
+    def stats(self) -> Dict:
+        return {
+            "connections": self.connections,
+            "requests": self.requests,
+            "batcher": self.batcher.stats.to_dict(),
+        }
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+class ModelServerClient:
+    """Blocking client for `ModelServer`, with one connection per calling thread.
+
+    The embedder is called from executor threads, so a plain socket per thread
+    is enough. Until the server has been reached once (startup, while it may
+    still be loading its models) connecting waits up to `connect_timeout` for
+    it to come up; after that a missing or refused socket fails right away.
+    A dropped connection (server restart) is retried once.
+    """
+
+    def __init__(self, path: str = None, timeout: float = None, connect_timeout: float = None):
+        self.path = path or settings.MODEL_SERVER_SOCKET
+        self.timeout = settings.MODEL_SERVER_TIMEOUT if timeout is None else timeout
+        self.connect_timeout = settings.MODEL_SERVER_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+        self._local = threading.local()
+        self._reached = False
+
+    def _connect(self) -> socket.socket:
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+                self._reached = True
+                return sock
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                sock.close()
+                # a request must not pin an executor thread waiting for a server that went away
+                if self._reached or time.monotonic() >= deadline:
+                    raise ModelServerError(f"model server not reachable at {self.path}") from e
+                time.sleep(0.5)
+
+    def _recv_exactly(self, sock: socket.socket, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionResetError("model server closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def _round_trip(self, sock: socket.socket, header: Dict) -> Tuple[Dict, bytes]:
+        sock.sendall(_pack(header))
+        header_len, body_len = _FRAME.unpack(self._recv_exactly(sock, _FRAME.size))
+        response = json.loads(self._recv_exactly(sock, header_len))
+        body = self._recv_exactly(sock, body_len) if body_len else b""
+        return response, body
+
+    def call(self, header: Dict) -> Tuple[Dict, bytes]:
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            if sock is None:
+                sock = self._local.sock = self._connect()
+            try:
+                response, body = self._round_trip(sock, header)
+                break
+            except (ConnectionError, BrokenPipeError, socket.timeout) as e:
+                # the stream may be mid-frame: never reuse it
+                sock.close()
+                self._local.sock = None
+                if attempt or isinstance(e, socket.timeout):
+                    raise ModelServerError(f"model server call failed: {e}") from e
+
+        if not response.get("ok"):
+            raise ModelServerError(response.get("error", "model server error"))
+        return response, body
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        response, body = self.call({"op": "encode", "texts": texts})
+        return np.frombuffer(body, dtype=np.float32).reshape(response["shape"])
+
+    def rank(self, query: str, documents: List[Dict], top_n: int) -> List[Tuple[int, float]]:
+        # only what the cross-encoder reads: the text, and the id for its score cache
+        documents = [{"id": doc.get("id"), "text": doc.get("text", "")} for doc in documents]
+        response, _ = self.call({"op": "rank", "query": query, "documents": documents, "top_n": top_n})
+        return [(index, score) for index, score in response["ranking"]]
+
+    def info(self) -> Dict:
+        return self.call({"op": "info"})[0]
+
+    def stats(self) -> Dict:
+        return self.call({"op": "stats"})[0]["stats"]
+
+
+class RemoteEmbedder:
+    """Stands in for the SentenceTransformer in an API worker when MODEL_SERVER_SOCKET is set."""
+
+    def __init__(self, client: Optional[ModelServerClient] = None):
+        self.client = client or ModelServerClient()
+        self._dimension = None
+        self._tokenizer = None
+
+    def encode(self, sentences, convert_to_numpy: bool = True, normalize_embeddings: bool = True, **kwargs):
+        # the server always returns normalized float32 vectors, which is all this repo asks for
+        single = isinstance(sentences, str)
+        vectors = self.client.encode([sentences] if single else list(sentences))
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self.client.info()["dimension"]
+        return self._dimension
+
+    @property
+    def tokenizer(self):
+        # only the tokenizer (for context token counts), not the weights
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(
+                settings.EMBEDDING_MODEL,
+                trust_remote_code=True,
+                cache_dir=settings.MODEL_CACHE_DIR or None
+            )
+        return self._tokenizer
+
+
+class RemoteReranker:
+    """Cross-encoder reranker backend served by the model server."""
+
+    name = "cross-encoder"
+
+    def __init__(self, client: Optional[ModelServerClient] = None):
+        self.client = client or ModelServerClient()
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.RERANK_MAX_CONCURRENCY,
+            thread_name_prefix="reranker"
+        )
+
+    def rank(self, query: str, documents: List[Dict], top_n: int):
+        return self.client.rank(query, documents, top_n)
+
+    async def rank_async(self, query: str, documents: List[Dict], top_n: int):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.rank, query, documents, top_n)
@@ -1,74 +1,261 @@
+import asyncio
 import cohere
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple
+from src.core.cache import TTLCache
+from src.core.client_pool import build_pool
 from src.core.config import settings, cohere_key_manager
+from src.core.observability import get_logger, span
+from src.core.singleflight import SingleFlight
+from src.core.text import normalize_query
+
+logger = get_logger("reranker")
+
+# (index into the candidate list, relevance score), best first
+Ranking = List[Tuple[int, float]]
+
+class CohereReranker:
+    name = "cohere"
 
-class RerankerService:
     def __init__(self):
         self.model_name = settings.RERANKER_MODEL
+        # one persistent, connection-reusing client per key
+        self.pool = build_pool(
+            "cohere",
+            cohere_key_manager.get_all_keys(),
+            cohere.ClientV2,
+            cohere.AsyncClientV2,
+            hedge_delay_ms=settings.COHERE_HEDGE_DELAY_MS
+        )
+
+    def rank(self, query: str, documents: List[Dict], top_n: int) -> Ranking:
+        doc_texts = [doc.get('text', '') for doc in documents]
+        response = self.pool.call(lambda co: co.rerank(
+            model=self.model_name,
+            query=query,
+            documents=doc_texts,
+            top_n=top_n,
+        ))
+        return [(result.index, result.relevance_score) for result in response.results]
+
+    async def rank_async(self, query: str, documents: List[Dict], top_n: int) -> Ranking:
+        doc_texts = [doc.get('text', '') for doc in documents]
+        response = await self.pool.call_async(lambda co: co.rerank(
+            model=self.model_name,
+            query=query,
+            documents=doc_texts,
+            top_n=top_n,
+        ))
+        return [(result.index, result.relevance_score) for result in response.results]
+
+class CrossEncoderReranker:
+    name = "cross-encoder"
+
+    def __init__(self):
+        # imported here so the cohere-only setup doesn't pay for it
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = settings.CROSS_ENCODER_MODEL
+        self.batch_size = settings.CROSS_ENCODER_BATCH_SIZE
+
+        model_kwargs = {}
+        if settings.CROSS_ENCODER_RUNTIME == "onnx" and settings.CROSS_ENCODER_ONNX_FILE:
+            # e.g. "onnx/model_qint8_avx512_vnni.onnx" for an int8 export
+            model_kwargs["file_name"] = settings.CROSS_ENCODER_ONNX_FILE
+
+        kwargs = dict(max_length=settings.CROSS_ENCODER_MAX_LENGTH, device="cpu")
+        if settings.CROSS_ENCODER_RUNTIME == "onnx":
+            kwargs.update(backend="onnx", model_kwargs=model_kwargs)
+        self.model = CrossEncoder(self.model_name, **kwargs)
+
+        if settings.CROSS_ENCODER_RUNTIME == "torch" and settings.CROSS_ENCODER_QUANTIZE:
+            import torch
+            self.model.model = torch.quantization.quantize_dynamic(
+                self.model.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+        self.score_cache = TTLCache(
+            max_entries=settings.RERANK_SCORE_CACHE_SIZE,
+            ttl_seconds=settings.RERANK_SCORE_CACHE_TTL_SECONDS
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.CROSS_ENCODER_WORKERS,
+            thread_name_prefix="reranker"
+        )
+
+    def _score(self, query: str, documents: List[Dict]) -> List[float]:
+        normalized = normalize_query(query)
+        scores = [self.score_cache.get((normalized, doc.get('id'))) for doc in documents]
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            pairs = [(query, documents[i].get('text', '')) for i in missing]
+            predicted = self.model.predict(
+                pairs,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                if documents[i].get('id') is not None:
+                    self.score_cache.set((normalized, documents[i]['id']), scores[i])
+
+        return scores
+
+    def rank(self, query: str, documents: List[Dict], top_n: int) -> Ranking:
+        scores = self._score(query, documents)
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [(i, scores[i]) for i in order[:top_n]]
+
+    async def rank_async(self, query: str, documents: List[Dict], top_n: int) -> Ranking:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.rank, query, documents, top_n)
+
+RERANKER_BACKENDS = {
+    CohereReranker.name: CohereReranker,
+    CrossEncoderReranker.name: CrossEncoderReranker,
+}
+
+def create_reranker_backend(name: str = None):
+    name = name or settings.RERANKER_BACKEND
+    if name not in RERANKER_BACKENDS:
+        raise ValueError(f"Unknown reranker backend: {name}")
+    if name == CrossEncoderReranker.name and settings.MODEL_SERVER_SOCKET:
+        from src.services.model_server import RemoteReranker
+        return RemoteReranker()
+    return RERANKER_BACKENDS[name]()
+
+class RerankerService:
+    def __init__(self, backend=None):
+        self.backend = backend or create_reranker_backend()
         self.top_n = settings.RERANK_TOP_N
-        self.key_manager = cohere_key_manager
-    
+        self._semaphore = asyncio.Semaphore(settings.RERANK_MAX_CONCURRENCY)
+        # concurrent reranks of the same candidates share one backend call
+        self.flights = SingleFlight(settings.REQUEST_COALESCING)
+
+        self.calls = 0
+        self.failures = 0
+
+    def _apply_results(self, documents: List[Dict], ranking: Ranking) -> List[Dict]:
+        reranked_documents = []
+        for index, relevance_score in ranking:
+            original_doc = documents[index].copy()
+            # add rerank score to document
+            original_doc['rerank_score'] = relevance_score
+            original_doc['original_score'] = original_doc.get('score', 0)
+            reranked_documents.append(original_doc)
+
+        return reranked_documents
+
     def rerank(
-        self, 
-        query: str, 
+        self,
+        query: str,
         documents: List[Dict],
         top_n: int = None
     ) -> List[Dict]:
         if not documents:
             return []
-        
+
         if top_n is None:
             top_n = self.top_n
         top_n = min(top_n, len(documents))
 
-        doc_texts = [doc.get('text', '') for doc in documents]
-        
+        self.calls += 1
         try:
-            api_key = self.key_manager.get_next_key()
-            co = cohere.ClientV2(api_key)
-            
-            response = co.rerank(
-                model=self.model_name,
-                query=query,
-                documents=doc_texts,
-                top_n=top_n,
-            )
-            
-            reranked_documents = []
-            for result in response.results:
-                original_doc = documents[result.index].copy()
-                # add rerank score to document
-                original_doc['rerank_score'] = result.relevance_score
-                original_doc['original_score'] = original_doc.get('score', 0)
-                reranked_documents.append(original_doc)
-            
-            return reranked_documents
-            
+            with span("rerank", backend=self.backend.name, documents=len(documents)):
+                ranking = self.backend.rank(query, documents, top_n)
+            return self._apply_results(documents, ranking)
+
         except Exception as e:
-            print(f"Error in reranking: {e}")
+            self.failures += 1
+            logger.warning(f"Error in reranking ({self.backend.name}): {e}")
             # if fail, return original documents sorted by original score
             return documents[:top_n]
-    
-    def rerank_with_fallback(
+
+    async def rerank_async(
         self,
         query: str,
         documents: List[Dict],
+        top_n: int = None
+    ) -> List[Dict]:
+        if not documents:
+            return []
+
+        if top_n is None:
+            top_n = self.top_n
+        top_n = min(top_n, len(documents))
+
+        self.calls += 1
+        try:
+            # the ranking is shared, each caller applies it to its own copies of the documents
+            key = (normalize_query(query), tuple(doc.get('id') for doc in documents), top_n)
+            ranking = await self.flights.do(key, lambda: self._rank_async(query, documents, top_n))
+            return self._apply_results(documents, ranking)
+
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Error in reranking ({self.backend.name}): {e}")
+            return documents[:top_n]
+
+    async def _rank_async(self, query: str, documents: List[Dict], top_n: int) -> Ranking:
+        async with self._semaphore:
+            with span("rerank", backend=self.backend.name, documents=len(documents)):
+                return await self.backend.rank_async(query, documents, top_n)
+
+    def clear_cache(self):
+        score_cache = getattr(self.backend, 'score_cache', None)
+        if score_cache is not None:
+            score_cache.clear()
+
+    def stats(self) -> Dict:
+        score_cache = getattr(self.backend, 'score_cache', None)
+        return {
+            "backend": self.backend.name,
+            "calls": self.calls,
+            "failures": self.failures,
+            "score_cache": score_cache.stats() if score_cache else None,
+            "clients": self.backend.pool.stats() if hasattr(self.backend, 'pool') else None,
+        }
+
+    def _fallback(
+        self,
+        reranked: List[Dict],
+        documents: List[Dict],
         top_n: int = None,
         use_original_score: bool = True
     ) -> List[Dict]:
-        reranked = self.rerank(query, documents, top_n)
-        
         # successful -> return reranked
         if reranked and 'rerank_score' in reranked[0]:
             return reranked
-        
+
         # fallback to original score sorting
         if use_original_score:
             sorted_docs = sorted(
-                documents, 
-                key=lambda x: x.get('score', 0), 
+                documents,
+                key=lambda x: x.get('score', 0),
                 reverse=True
             )
             return sorted_docs[:top_n] if top_n else sorted_docs
-        
-        return documents[:top_n] if top_n else documents
\ No newline at end of file
+
+        return documents[:top_n] if top_n else documents
+
+    def rerank_with_fallback(
+        self,
+        query: str,
+        documents: List[Dict],
+        top_n: int = None,
+        use_original_score: bool = True
+    ) -> List[Dict]:
+        reranked = self.rerank(query, documents, top_n)
+        return self._fallback(reranked, documents, top_n, use_original_score)
+
+    async def rerank_with_fallback_async(
+        self,
+        query: str,
+        documents: List[Dict],
+        top_n: int = None,
+        use_original_score: bool = True
+    ) -> List[Dict]:
+        reranked = await self.rerank_async(query, documents, top_n)
+        return self._fallback(reranked, documents, top_n, use_original_score)
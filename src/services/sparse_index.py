@@ -0,0 +1,140 @@
+import os
+import pickle
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from src.core.observability import get_logger, log_event
+from src.core.text import tokenize
+
+logger = get_logger("sparse_index")
+
+INDEX_VERSION = 1
+INDEXED_FIELDS = ("title", "header", "text")
+
+
+class SparseIndex:
+    """In-process BM25 inverted index over the Qdrant collection.
+
+    Only point ids and per-term BM25 weights are kept; payloads stay in Qdrant.
+    Weights are precomputed at build time, so a query is a scatter-add over the
+    postings of its terms plus a partial sort.
+    """
+
+    def __init__(self, ids: List, postings: Dict[str, Tuple[np.ndarray, np.ndarray]], collection_name: str = ""):
+        self.ids = ids
+        self.postings = postings
+        self.collection_name = collection_name
+
+    @classmethod
+    def build(
+        cls,
+        documents: Iterable[Tuple[object, str]],
+        collection_name: str = "",
+        k1: float = 1.2,
+        b: float = 0.75
+    ) -> "SparseIndex":
+        ids = []
+        lengths = []
+        raw_postings = defaultdict(list)
+        for doc_index, (doc_id, text) in enumerate(documents):
+            counts = Counter(tokenize(text))
+            ids.append(doc_id)
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                raw_postings[term].append((doc_index, tf))
+
+        n_docs = len(ids)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        avg_length = float(lengths.mean()) if n_docs else 0.0
+
+        postings = {}
+        for term, entries in raw_postings.items():
+            doc_indices = np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries))
+            tf = np.fromiter((t for _, t in entries), dtype=np.float32, count=len(entries))
+            idf = np.log(1 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            norm = k1 * (1 - b + b * lengths[doc_indices] / avg_length)
+            postings[term] = (doc_indices, (idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+
+        return cls(ids, postings, collection_name)
+
+    @classmethod
+    def build_from_qdrant(cls, client, collection_name: str, page_size: int = 1000) -> "SparseIndex":
+        def documents():
+            offset = None
+            while True:
+                points, offset = client.scroll(
+                    collection_name=collection_name,
+                    limit=page_size,
+                    offset=offset,
+                    with_payload=list(INDEXED_FIELDS),
+                    with_vectors=False
+                )
+                for point in points:
+                    payload = point.payload or {}
+                    yield point.id, "\n".join(str(payload.get(field) or "") for field in INDEXED_FIELDS)
+                if offset is None:
+                    break
+
+        start = time.perf_counter()
+        index = cls.build(documents(), collection_name)
+        log_event(
+            logger, "sparse_index_built",
+            documents=len(index.ids), terms=len(index.postings), seconds=round(time.perf_counter() - start, 1)
+        )
+        return index
+
+    def save(self, path: str):
+        if not path:
+            # would write a stray ".tmp" into the working directory
+            raise ValueError("Sparse index path is empty")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "version": INDEX_VERSION,
+                "collection": self.collection_name,
+                "ids": self.ids,
+                "postings": self.postings,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SparseIndex":
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Sparse index {path} has version {data.get('version')}, expected {INDEX_VERSION}")
+        return cls(data["ids"], data["postings"], data.get("collection", ""))
+
+    @classmethod
+    def load_or_build(cls, client, collection_name: str, path: str = "") -> "SparseIndex":
+        if path and os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.collection_name == collection_name:
+                    return index
+            except Exception as e:
+                logger.warning(f"Error loading sparse index, rebuilding: {e}")
+
+        index = cls.build_from_qdrant(client, collection_name)
+        if path:
+            index.save(path)
+        return index
+
+    def search(self, query: str, top_k: int) -> List[Tuple[object, float]]:
+        if not self.ids:
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+
+        top_k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(self.ids[i], float(scores[i])) for i in candidates if scores[i] > 0]
+
+    def __len__(self) -> int:
+        return len(self.ids)
@@ -1,22 +1,123 @@
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Optional
+import asyncio
+import hashlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from qdrant_client import QdrantClient, AsyncQdrantClient, models
+from typing import List, Dict, Optional, Sequence, Tuple
+from src.core.cache import TTLCache
 from src.core.config import settings
+from src.core.observability import get_logger, span
+from src.core.singleflight import SingleFlight
+from src.core.text import normalize_query
+from src.services.embedder import create_embedder
+from src.services.embedding_batcher import EmbeddingBatcher
+from src.services.ingestion import PAYLOAD_FIELDS
+from src.services.sparse_index import SparseIndex
 
-class VectorSearchService:
-    def __init__(self):
-        self.client = QdrantClient(
-            url=settings.QDRANT_URL if settings.QDRANT_URL else ":memory:",
+logger = get_logger("vector_search")
+
+_MISSING = object()
+
+
+def _copy_documents(documents: List[Dict]) -> List[Dict]:
+    return [dict(doc) for doc in documents]
+
+
+class Hit:
+    """Compact copy of one search hit, as kept in the result cache.
+
+    Callers mutate the documents they get (rerank and fusion scores), so the
+    cache stores these and hands out a fresh dict per lookup.
+    """
+
+    __slots__ = ("id", "score", "sparse_score", "hybrid_score") + PAYLOAD_FIELDS
+
+    def __init__(self, doc: Dict):
+        for name in self.__slots__:
+            setattr(self, name, doc.get(name, _MISSING))
+
+    def to_dict(self) -> Dict:
+        return {
+            name: value for name in self.__slots__
+            if (value := getattr(self, name)) is not _MISSING
+        }
+
+
+def create_qdrant_client(url: str = None, path: str = None, local_index: str = None) -> QdrantClient:
+    # server if a URL is configured, else the memory-mapped local index,
+    # else a local on-disk store, else in-memory
+    url = settings.QDRANT_URL if url is None else url
+    path = settings.QDRANT_PATH if path is None else path
+    local_index = settings.LOCAL_INDEX_PATH if local_index is None else local_index
+    if url:
+        return QdrantClient(
+            url=url,
             api_key=settings.QDRANT_API_KEY if settings.QDRANT_API_KEY else None,
         )
-        
-        self.embedder = SentenceTransformer(
-            settings.EMBEDDING_MODEL,
-            trust_remote_code=True
-        )
-        
+    if local_index:
+        from src.services.local_index import LocalVectorIndex
+        return LocalVectorIndex(local_index)
+    if path:
+        return QdrantClient(path=path)
+    return QdrantClient(location=":memory:")
+
+class VectorSearchService:
+    def __init__(self, client: QdrantClient = None, embedder=None):
+        # a passed-in client (e.g. a seeded in-memory one) is used for sync and async calls
+        self.client = client if client is not None else create_qdrant_client()
+
+        # an in-memory async client would be a second, separate store,
+        # so only use it against a real Qdrant server
+        self.async_client = AsyncQdrantClient(
+            url=settings.QDRANT_URL,
+            api_key=settings.QDRANT_API_KEY if settings.QDRANT_API_KEY else None,
+        ) if settings.QDRANT_URL and client is None else None
+
+        # EMBEDDING_RUNTIME picks torch or ONNX Runtime (optionally int8) for the query model;
+        # with MODEL_SERVER_SOCKET the model lives in the shared model server instead
+        if embedder is None and settings.MODEL_SERVER_SOCKET:
+            from src.services.model_server import RemoteEmbedder
+            embedder = RemoteEmbedder()
+        self.embedder = embedder if embedder is not None else create_embedder()
+
         self.collection_name = settings.COLLECTION_NAME
 
+        # bounded pool for CPU-bound encoding, keeps the event loop free
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.EMBEDDING_WORKERS,
+            thread_name_prefix="embedder"
+        )
+        self._qdrant_semaphore = asyncio.Semaphore(settings.QDRANT_MAX_CONCURRENCY)
+
+        self.batcher = EmbeddingBatcher(
+            self.encode_queries,
+            self.executor,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+            max_inflight=settings.EMBEDDING_WORKERS
+        ) if settings.EMBEDDING_BATCHING else None
+
+        # BM25 side of hybrid retrieval; None means dense-only
+        self.sparse_index = None
+        if settings.HYBRID_SEARCH:
+            try:
+                self.sparse_index = SparseIndex.load_or_build(
+                    self.client, self.collection_name, settings.SPARSE_INDEX_PATH
+                )
+            except Exception as e:
+                logger.warning(f"Error loading sparse index, using dense-only search: {e}")
+        self.dense_weight = settings.HYBRID_DENSE_WEIGHT
+        self.sparse_weight = settings.HYBRID_SPARSE_WEIGHT
+
+        # hits per (query vector, top_k, threshold, fields); bump collection_version after re-indexing
+        self.result_cache = TTLCache(
+            max_entries=settings.RETRIEVAL_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.RETRIEVAL_CACHE_TTL_SECONDS
+        ) if settings.RETRIEVAL_CACHE_ENABLED else None
+        self.collection_version = 0
+        # concurrent searches for the same question share one embed + Qdrant round trip
+        self.flights = SingleFlight(settings.REQUEST_COALESCING)
+
     def encode_query(self, query: str) -> List[float]:
         query_vector = self.embedder.encode(
             [query],
@@ -24,66 +125,448 @@ class VectorSearchService:
             normalize_embeddings=True
         )[0].tolist()
         return query_vector
-    
+
+    async def encode_query_async(self, query: str) -> List[float]:
+        with span("embed"):
+            if self.batcher is not None:
+                return await self.batcher.encode(query)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.encode_query, query)
+
+    def _format_hits(self, search_result, fields: Sequence[str] = PAYLOAD_FIELDS) -> List[Dict]:
+        documents = []
+        for hit in search_result:
+            payload = hit.payload or {}
+            doc = {"id": hit.id, "score": hit.score}
+            for field in fields:
+                doc[field] = payload.get(field, "")
+            documents.append(doc)
+
+        return documents
+
+    def _result_key(
+        self,
+        query: str,
+        query_vector: List[float],
+        top_k: int,
+        score_threshold: float,
+        fields: Tuple[str, ...]
+    ) -> Optional[Tuple]:
+        if self.result_cache is None:
+            return None
+        digest = hashlib.blake2b(np.asarray(query_vector, dtype=np.float32).tobytes(), digest_size=16).digest()
+        # BM25 candidates depend on the text, not only on its vector
+        text = query if self.sparse_index is not None else None
+        return digest, top_k, score_threshold, self.collection_version, fields, text
+
+    def _cached_results(self, key) -> Optional[List[Dict]]:
+        if key is None:
+            return None
+        hits = self.result_cache.get(key)
+        return None if hits is None else [hit.to_dict() for hit in hits]
+
+    def _store_results(self, key, documents: List[Dict]):
+        if key is not None:
+            self.result_cache.set(key, tuple(Hit(doc) for doc in documents))
+
+    def _reload_sparse_index(self):
+        # picks up the BM25 index that scripts/ingest.py rebuilt, or rebuilds it from the collection
+        try:
+            sparse_index = SparseIndex.load_or_build(self.client, self.collection_name, settings.SPARSE_INDEX_PATH)
+        except Exception as e:
+            logger.warning(f"Error reloading sparse index, keeping the previous one: {e}")
+            return
+        # one assignment: searches in flight finish on the index they started with
+        self.sparse_index = sparse_index
+
+    def invalidate_results(self):
+        # call after the collection has been re-indexed; a local index also switches to its newest snapshot.
+        # Blocking (index loads), so run it off the event loop.
+        if hasattr(self.client, "refresh"):
+            self.client.refresh()
+        if settings.HYBRID_SEARCH:
+            self._reload_sparse_index()
+        # only now: results cached in the meantime were keyed by the old version
+        self.collection_version += 1
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "collection_version": self.collection_version,
+            "result_cache": self.result_cache.stats() if self.result_cache is not None else None,
+            "local_index": self.client.stats() if hasattr(self.client, "refresh") else None,
+        }
+
     def search(
-        self, 
-        query: str, 
+        self,
+        query: str,
         top_k: int = None,
-        score_threshold: float = None
+        score_threshold: float = None,
+        query_vector: Optional[List[float]] = None,
+        fields: Sequence[str] = PAYLOAD_FIELDS
     ) -> List[Dict]:
         if top_k is None:
             top_k = settings.DEFAULT_TOP_K
         if score_threshold is None:
             score_threshold = settings.DEFAULT_SCORE_THRESHOLD # default: 0.5
+        fields = tuple(fields)
+
+        if query_vector is None:
+            with span("embed"):
+                query_vector = self.encode_query(query)
+
+        if self.sparse_index is not None:
+            return self._query_batch([query], [query_vector], top_k, score_threshold, fields)[0]
+
+        key = self._result_key(query, query_vector, top_k, score_threshold, fields)
+        cached = self._cached_results(key)
+        if cached is not None:
+            return cached
 
-        query_vector = self.encode_query(query)
+        # search in Qdrant, fetching only the payload fields the caller uses
+        with span("search"):
+            search_result = self.client.query_points(
+                collection_name=self.collection_name,
+                query=query_vector,
+                limit=top_k,
+                score_threshold=score_threshold,
+                with_payload=list(fields),
+                with_vectors=False
+            )
 
-        # search in Qdrant
-        search_result = self.client.search(
+        documents = self._format_hits(search_result.points, fields)
+        self._store_results(key, documents)
+        return documents
+
+    async def search_async(
+        self,
+        query: str,
+        top_k: int = None,
+        score_threshold: float = None,
+        query_vector: Optional[List[float]] = None,
+        fields: Sequence[str] = PAYLOAD_FIELDS
+    ) -> List[Dict]:
+        if top_k is None:
+            top_k = settings.DEFAULT_TOP_K
+        if score_threshold is None:
+            score_threshold = settings.DEFAULT_SCORE_THRESHOLD
+        fields = tuple(fields)
+
+        key = (normalize_query(query), top_k, score_threshold, fields, self.collection_version)
+        return await self.flights.do(
+            key,
+            lambda: self._search_async(query, top_k, score_threshold, query_vector, fields),
+            copy=_copy_documents
+        )
+
+    async def _search_async(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        query_vector: Optional[List[float]],
+        fields: Tuple[str, ...]
+    ) -> List[Dict]:
+        if query_vector is None:
+            query_vector = await self.encode_query_async(query)
+
+        if self.sparse_index is not None:
+            return (await self._query_batch_async([query], [query_vector], top_k, score_threshold, fields))[0]
+
+        key = self._result_key(query, query_vector, top_k, score_threshold, fields)
+        cached = self._cached_results(key)
+        if cached is not None:
+            return cached
+
+        search_kwargs = dict(
             collection_name=self.collection_name,
-            query_vector=query_vector,
+            query=query_vector,
             limit=top_k,
             score_threshold=score_threshold,
-            with_payload=True,
+            with_payload=list(fields),
             with_vectors=False
         )
+        async with self._qdrant_semaphore, span("search"):
+            if self.async_client is not None:
+                search_result = await self.async_client.query_points(**search_kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                search_result = await loop.run_in_executor(
+                    None, lambda: self.client.query_points(**search_kwargs)
+                )
 
-        # format results
-        documents = []
-        for hit in search_result:
-            doc = {
-                "id": hit.id,
-                "score": hit.score,
-                "text": hit.payload.get("text", ""),
-                "title": hit.payload.get("title", ""),
-                "category": hit.payload.get("category", ""),
-                "header": hit.payload.get("header", ""),
-                "article_id": hit.payload.get("article_id", ""),
-                "paragraph_id": hit.payload.get("paragraph_id", ""),
-                "metadata": hit.payload
-            }
-            documents.append(doc)
-        
+        documents = self._format_hits(search_result.points, fields)
+        self._store_results(key, documents)
         return documents
-    
+
+    def encode_queries(self, queries: List[str]) -> List[List[float]]:
+        # one forward pass for the whole batch
+        return self.embedder.encode(
+            queries,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).tolist()
+
+    async def encode_queries_async(self, queries: List[str]) -> List[List[float]]:
+        with span("embed", queries=len(queries)):
+            if self.batcher is not None:
+                return await self.batcher.encode_many(queries)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.encode_queries, queries)
+
+    def _sparse_hits(self, queries: List[str], top_k: int) -> Optional[List[List[Tuple]]]:
+        sparse_index = self.sparse_index
+        if sparse_index is None:
+            return None
+        sparse_top_k = settings.HYBRID_SPARSE_TOP_K or top_k
+        with span("sparse_search"):
+            return [sparse_index.search(query, sparse_top_k) for query in queries]
+
+    def _build_batch_requests(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int,
+        score_threshold: float,
+        sparse_hits: Optional[List[List[Tuple]]] = None,
+        fields: Sequence[str] = PAYLOAD_FIELDS
+    ) -> List[models.QueryRequest]:
+        requests = []
+        for i, vector in enumerate(query_vectors):
+            requests.append(models.QueryRequest(
+                query=vector,
+                limit=top_k,
+                score_threshold=score_threshold,
+                with_payload=list(fields),
+                with_vector=False
+            ))
+            if sparse_hits is not None:
+                # payloads and cosine scores of the BM25 hits, below the threshold too
+                ids = [doc_id for doc_id, _ in sparse_hits[i]]
+                requests.append(models.QueryRequest(
+                    query=vector,
+                    filter=models.Filter(must=[models.HasIdCondition(has_id=ids)]),
+                    limit=max(1, len(ids)),
+                    with_payload=list(fields),
+                    with_vector=False
+                ))
+        return requests
+
+    def fuse_hybrid(
+        self,
+        dense_docs: List[Dict],
+        sparse_docs: List[Dict],
+        sparse_hits: List[Tuple],
+        top_k: int
+    ) -> List[Dict]:
+        sparse_scores = dict(sparse_hits)
+        sparse_ranks = {doc_id: rank for rank, (doc_id, _) in enumerate(sparse_hits, 1)}
+        dense_ranks = {doc['id']: rank for rank, doc in enumerate(dense_docs, 1)}
+
+        docs = {doc['id']: doc for doc in sparse_docs}
+        docs.update({doc['id']: doc for doc in dense_docs})
+
+        max_sparse = max(sparse_scores.values(), default=0.0) or 1.0
+        for doc_id, doc in docs.items():
+            doc['sparse_score'] = sparse_scores.get(doc_id, 0.0)
+            if settings.HYBRID_FUSION == "linear":
+                doc['hybrid_score'] = (
+                    self.dense_weight * doc['score']
+                    + self.sparse_weight * doc['sparse_score'] / max_sparse
+                )
+            else:
+                doc['hybrid_score'] = (
+                    (self.dense_weight / (settings.RRF_K + dense_ranks[doc_id]) if doc_id in dense_ranks else 0.0)
+                    + (self.sparse_weight / (settings.RRF_K + sparse_ranks[doc_id]) if doc_id in sparse_ranks else 0.0)
+                )
+
+        return sorted(docs.values(), key=lambda x: x['hybrid_score'], reverse=True)[:top_k]
+
+    def _collect(
+        self,
+        batch_result,
+        top_k: int,
+        sparse_hits: Optional[List[List[Tuple]]],
+        fields: Sequence[str] = PAYLOAD_FIELDS
+    ) -> List[List[Dict]]:
+        if sparse_hits is None:
+            return [self._format_hits(response.points, fields) for response in batch_result]
+        return [
+            self.fuse_hybrid(
+                self._format_hits(batch_result[2 * i].points, fields),
+                self._format_hits(batch_result[2 * i + 1].points, fields),
+                hits,
+                top_k
+            )
+            for i, hits in enumerate(sparse_hits)
+        ]
+
+    def _split_cached(
+        self,
+        queries: List[str],
+        query_vectors: List[List[float]],
+        top_k: int,
+        score_threshold: float,
+        fields: Tuple[str, ...]
+    ) -> Tuple[List, List[Optional[List[Dict]]], List[int]]:
+        # (cache keys, cached results or None, indexes that still need Qdrant)
+        keys = [
+            self._result_key(query, vector, top_k, score_threshold, fields)
+            for query, vector in zip(queries, query_vectors)
+        ]
+        results = [self._cached_results(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        return keys, results, missing
+
+    def _fill_missing(self, keys: List, results: List, missing: List[int], fetched: List[List[Dict]]) -> List[List[Dict]]:
+        for i, documents in zip(missing, fetched):
+            self._store_results(keys[i], documents)
+            results[i] = documents
+        return results
+
+    def _query_batch(
+        self,
+        queries: List[str],
+        query_vectors: List[List[float]],
+        top_k: int,
+        score_threshold: float,
+        fields: Sequence[str] = PAYLOAD_FIELDS
+    ) -> List[List[Dict]]:
+        fields = tuple(fields)
+        keys, results, missing = self._split_cached(queries, query_vectors, top_k, score_threshold, fields)
+        if not missing:
+            return results
+
+        queries = [queries[i] for i in missing]
+        query_vectors = [query_vectors[i] for i in missing]
+        sparse_hits = self._sparse_hits(queries, top_k)
+        # single round trip for all uncached queries (and their sparse candidates)
+        with span("search", queries=len(queries)):
+            batch_result = self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=self._build_batch_requests(query_vectors, top_k, score_threshold, sparse_hits, fields)
+            )
+        return self._fill_missing(keys, results, missing, self._collect(batch_result, top_k, sparse_hits, fields))
+
+    async def _query_batch_async(
+        self,
+        queries: List[str],
+        query_vectors: List[List[float]],
+        top_k: int,
+        score_threshold: float,
+        fields: Sequence[str] = PAYLOAD_FIELDS
+    ) -> List[List[Dict]]:
+        fields = tuple(fields)
+        keys, results, missing = self._split_cached(queries, query_vectors, top_k, score_threshold, fields)
+        if not missing:
+            return results
+
+        queries = [queries[i] for i in missing]
+        query_vectors = [query_vectors[i] for i in missing]
+        sparse_hits = self._sparse_hits(queries, top_k)
+        requests = self._build_batch_requests(query_vectors, top_k, score_threshold, sparse_hits, fields)
+
+        async with self._qdrant_semaphore, span("search", queries=len(queries)):
+            if self.async_client is not None:
+                batch_result = await self.async_client.query_batch_points(
+                    collection_name=self.collection_name,
+                    requests=requests
+                )
+            else:
+                loop = asyncio.get_running_loop()
+                batch_result = await loop.run_in_executor(
+                    None,
+                    lambda: self.client.query_batch_points(
+                        collection_name=self.collection_name,
+                        requests=requests
+                    )
+                )
+
+        return self._fill_missing(keys, results, missing, self._collect(batch_result, top_k, sparse_hits, fields))
+
+    def merge_results(self, results_per_query: List[List[Dict]]) -> List[Dict]:
+        # dedupe by point id; "score" always keeps the best cosine score
+        unique_results = {}
+        fusion_scores = {}
+        for results in results_per_query:
+            for rank, doc in enumerate(results, 1):
+                doc_id = doc['id']
+                if doc_id not in unique_results or doc['score'] > unique_results[doc_id]['score']:
+                    unique_results[doc_id] = doc
+                fusion_scores[doc_id] = fusion_scores.get(doc_id, 0.0) + 1.0 / (settings.RRF_K + rank)
+
+        if settings.MULTI_QUERY_FUSION == "rrf":
+            for doc_id, doc in unique_results.items():
+                doc['fusion_score'] = fusion_scores[doc_id]
+            key = lambda x: x['fusion_score']
+        else:
+            key = lambda x: x['score']
+
+        return sorted(unique_results.values(), key=key, reverse=True)
+
     def search_with_multiple_queries(
-        self, 
+        self,
         queries: List[str],
         top_k: int = None,
         score_threshold: float = None
     ) -> List[Dict]:
-        all_results = []
-        for query in queries:
-            results = self.search(query, top_k, score_threshold)
-            all_results.extend(results)
+        if top_k is None:
+            top_k = settings.DEFAULT_TOP_K
+        if score_threshold is None:
+            score_threshold = settings.DEFAULT_SCORE_THRESHOLD
 
-        unique_results = {}
-        for doc in all_results:
-            doc_text = doc['text']
-            if doc_text in unique_results:
-                if doc['score'] > unique_results[doc_text]['score']:
-                    unique_results[doc_text] = doc
-            else:
-                unique_results[doc_text] = doc
-        
-        return list(unique_results.values())
\ No newline at end of file
+        with span("embed", queries=len(queries)):
+            query_vectors = self.encode_queries(queries)
+        return self.merge_results(self._query_batch(queries, query_vectors, top_k, score_threshold))
+
+    async def search_many_async(
+        self,
+        queries: List[str],
+        top_k: int = None,
+        score_threshold: float = None
+    ) -> List[List[Dict]]:
+        # one result list per query, in the same order
+        if top_k is None:
+            top_k = settings.DEFAULT_TOP_K
+        if score_threshold is None:
+            score_threshold = settings.DEFAULT_SCORE_THRESHOLD
+
+        key = (tuple(normalize_query(query) for query in queries), top_k, score_threshold, self.collection_version)
+        return await self.flights.do(
+            key,
+            lambda: self._search_many_async(queries, top_k, score_threshold),
+            copy=lambda results: [_copy_documents(documents) for documents in results]
+        )
+
+    async def _search_many_async(self, queries: List[str], top_k: int, score_threshold: float) -> List[List[Dict]]:
+        query_vectors = await self.encode_queries_async(queries)
+        return await self._query_batch_async(queries, query_vectors, top_k, score_threshold)
+
+    async def search_vectors_async(
+        self,
+        queries: List[str],
+        query_vectors: List[List[float]],
+        top_k: int = None,
+        score_threshold: float = None,
+        batch_size: int = 64
+    ) -> List[List[Dict]]:
+        # already-encoded queries, e.g. a whole batch job's; one round trip per `batch_size`
+        if top_k is None:
+            top_k = settings.DEFAULT_TOP_K
+        if score_threshold is None:
+            score_threshold = settings.DEFAULT_SCORE_THRESHOLD
+
+        results = []
+        for i in range(0, len(queries), batch_size):
+            results += await self._query_batch_async(
+                queries[i:i + batch_size], query_vectors[i:i + batch_size], top_k, score_threshold
+            )
+        return results
+
+    async def search_with_multiple_queries_async(
+        self,
+        queries: List[str],
+        top_k: int = None,
+        score_threshold: float = None
+    ) -> List[Dict]:
+        return self.merge_results(await self.search_many_async(queries, top_k, score_threshold))
@@ -26,6 +26,14 @@ function loadState() {
     const parsed = JSON.parse(data);
     conversations = parsed.conversations || [];
     activeConvId = parsed.activeConvId;
+    // older versions used short random ids, which the server no longer accepts
+    for (const conv of conversations) {
+      if (!CONVERSATION_ID.test(conv.id)) {
+        const id = conversationId();
+        if (activeConvId === conv.id) activeConvId = id;
+        conv.id = id;
+      }
+    }
     if (conversations.length > 0 && !activeConvId) {
       activeConvId = conversations[0].id;
     }
@@ -137,8 +145,25 @@ const nowLabel = () => {
   return `${hours}:${minutes}`;
 };
 const gid = () => Math.floor(Math.random()*1e9).toString();
+// Conversation ids key the server's conversation memory: they must not collide between users
+const conversationId = () => crypto.randomUUID
+  ? crypto.randomUUID()
+  : Array.from(crypto.getRandomValues(new Uint8Array(16)), b => b.toString(16).padStart(2, '0')).join('');
+// the shapes the server accepts (see CONVERSATION_ID_PATTERN in src/api/routes.py)
+const CONVERSATION_ID = /^(conv_)?[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}$/;
 
 // ---- API Calls ----
+// Error for a failed response; 429s (rate limited / overloaded) keep the server's message for the user
+async function apiError(response) {
+  const error = new Error(`API Error: ${response.status}`);
+  error.status = response.status;
+  if (response.status === 429) {
+    const body = await response.json().catch(() => ({}));
+    error.userMessage = body.detail;
+  }
+  return error;
+}
+
 async function callChatAPI(message, conversationId) {
   const response = await fetch(`${API_BASE_URL}/chat`, {
     method: 'POST',
@@ -152,11 +177,56 @@ async function callChatAPI(message, conversationId) {
     })
   });
   if (!response.ok) {
-    throw new Error(`API Error: ${response.status}`);
+    throw await apiError(response);
   }
   return await response.json();
 }
 
+// Stream SSE events from /chat/stream, calling onEvent(event, data) for each one
+async function streamChatAPI(message, conversationId, onEvent) {
+  const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+    body: JSON.stringify({
+      message: message,
+      conversation_id: conversationId,
+      use_query_expansion: true,
+      top_k: 12,
+      rerank_top_n: 5
+    })
+  });
+  if (!response.ok) {
+    throw await apiError(response);
+  }
+  if (!response.body) {
+    throw new Error('API Error: empty body');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = 'message';
+      let data = '';
+      raw.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      });
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
 // ---- Render Functions ----
 function renderConversations() {
   convList.innerHTML = '';
@@ -276,6 +346,27 @@ function renderConversations() {
   lucide.createIcons();
 }
 
+function bubbleHTML(m) {
+  if (m.isLoading) {
+    const status = m.status ? `<div class="typing-status">${escapeHTML(m.status)}</div>` : '';
+    return '<div class="typing-indicator"><span></span><span></span><span></span></div>' + status;
+  }
+  return m.role === 'assistant' ? renderMarkdownLite(m.content) : escapeHTML(m.content);
+}
+
+// Re-render a single bubble (used while streaming, instead of the whole list)
+let pendingBubbleUpdate = null;
+function updateMessageBubble(m) {
+  if (pendingBubbleUpdate) return;
+  pendingBubbleUpdate = requestAnimationFrame(() => {
+    pendingBubbleUpdate = null;
+    const bubble = messagesEl.querySelector(`[data-id="${m.id}"] .msg__bubble`);
+    if (!bubble) return;
+    bubble.innerHTML = bubbleHTML(m);
+    messagesEl.scrollTop = messagesEl.scrollHeight;
+  });
+}
+
 function renderMessages() {
   messagesEl.innerHTML = '';
   const conv = conversations.find(c => c.id === activeConvId);
@@ -284,6 +375,7 @@ function renderMessages() {
   conv.messages.forEach(m => {
     const row = document.createElement('div');
     row.className = 'msg ' + (m.role === 'user' ? 'msg--right' : 'msg--left') + ' msg--' + m.role;
+    row.dataset.id = m.id;
 
     if (m.role === 'assistant') {
       const av = document.createElement('div');
@@ -295,11 +387,7 @@ function renderMessages() {
     const bubble = document.createElement('div');
     bubble.className = 'msg__bubble';
 
-    if (m.isLoading) {
-      bubble.innerHTML = '<div class="typing-indicator"><span></span><span></span><span></span></div>';
-    } else {
-      bubble.innerHTML = m.role === 'assistant' ? renderMarkdownLite(m.content) : escapeHTML(m.content);
-    }
+    bubble.innerHTML = bubbleHTML(m);
 
     row.appendChild(bubble);
 
@@ -322,7 +410,7 @@ function renderMessages() {
 // ---- Actions ----
 function ensureActiveConv() {
   if (activeConvId) return;
-  const id = gid();
+  const id = conversationId();
   conversations.unshift({
     id,
     title: 'Cuộc trò chuyện mới',
@@ -353,22 +441,45 @@ async function sendMessage() {
   btnSend.disabled = true;
   inputBox.disabled = true;
 
-  // Loading message
+  // Loading message, filled in place as the answer streams
   const loadingId = gid();
-  conv.messages.push({ id: loadingId, role: 'assistant', isLoading: true });
+  const reply = { id: loadingId, role: 'assistant', isLoading: true, content: '' };
+  conv.messages.push(reply);
 
   renderConversations();
   renderMessages();
 
   try {
-    const response = await callChatAPI(text, conv.id);
-
-    // Remove loading
-    conv.messages = conv.messages.filter(m => m.id !== loadingId);
+    const statusLabels = {
+      expansion: 'Đang tìm kiếm tài liệu...',
+      retrieved: 'Đang chọn lọc tài liệu phù hợp...',
+      reranked: 'Đang soạn câu trả lời...'
+    };
+
+    try {
+      await streamChatAPI(text, conv.id, (event, data) => {
+        if (statusLabels[event]) {
+          reply.status = statusLabels[event];
+        } else if (event === 'token') {
+          reply.isLoading = false;
+          reply.content += data.text;
+        } else if (event === 'error') {
+          throw new Error(data.detail);
+        } else if (event === 'done') {
+          console.debug('ViMedBot timing', { ttft: data.ttft, total: data.processing_time });
+        }
+        updateMessageBubble(reply);
+      });
+    } catch (streamError) {
+      // Fall back to the non-streaming endpoint if nothing was received (not when turned away: it would be too)
+      if (reply.content || streamError.status === 429) throw streamError;
+      const response = await callChatAPI(text, conv.id);
+      reply.content = response.answer_html ?? response.answer ?? '';
+    }
 
-    // Add real response (frontend will format)
-    const content = response.answer_html ?? response.answer ?? '';
-    conv.messages.push({ id: gid(), role: 'assistant', content });
+    if (!reply.content) throw new Error('Empty answer');
+    reply.isLoading = false;
+    delete reply.status;
 
     // Auto title
     if (conv.title === 'Cuộc trò chuyện mới' && conv.messages.length <= 4) {
@@ -380,7 +491,7 @@ async function sendMessage() {
     conv.messages.push({
       id: gid(),
       role: 'assistant',
-      content: 'Xin lỗi, có lỗi xảy ra khi xử lý câu hỏi của bạn. Vui lòng thử lại sau.'
+      content: error.userMessage || 'Xin lỗi, có lỗi xảy ra khi xử lý câu hỏi của bạn. Vui lòng thử lại sau.'
     });
     console.error('API Error:', error);
   } finally {
@@ -396,7 +507,7 @@ async function sendMessage() {
 
 // ---- Events ----
 btnNewChat.addEventListener('click', () => {
-  const id = gid();
+  const id = conversationId();
   conversations.unshift({
     id,
     title: 'Cuộc trò chuyện mới',
@@ -436,7 +547,7 @@ infoModal.addEventListener('click', (e) => {
 // ---- Init ----
 loadState();
 if (conversations.length === 0) {
-  const id = gid();
+  const id = conversationId();
   conversations.unshift({
     id,
     title: 'Cuộc trò chuyện mới',